@@ -226,6 +226,81 @@ ACCOUNT_EMAIL_VERIFICATION = 'optional'  # Set to 'mandatory' if preferred
 LOGIN_REDIRECT_URL = '/api/auth/google/callback/'  # Redirect to backend callback to handle JWT
 LOGOUT_REDIRECT_URL = config('FRONTEND_URL', default='http://127.0.0.1:5173')
 
+# AI features
+GROQ_MODEL = config('GROQ_MODEL', default='openai/gpt-oss-20b')
+GROQ_API_KEY = config('GROQ_API_KEY', default='')
+
+# LLM gateway (see api/llm_gateway.py): one pooled client per process
+LLM_BASE_URL = config('LLM_BASE_URL', default='https://api.groq.com/openai/v1')
+LLM_CONNECT_TIMEOUT = config('LLM_CONNECT_TIMEOUT', default=5.0, cast=float)
+LLM_READ_TIMEOUT = config('LLM_READ_TIMEOUT', default=60.0, cast=float)
+LLM_POOL_SIZE = config('LLM_POOL_SIZE', default=20, cast=int)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=2, cast=int)
+LLM_BACKOFF_BASE = config('LLM_BACKOFF_BASE', default=0.5, cast=float)
+LLM_BACKOFF_MAX = config('LLM_BACKOFF_MAX', default=8.0, cast=float)
+# Max in-flight LLM calls per process; further callers wait up to LLM_QUEUE_TIMEOUT seconds
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', default=8, cast=int)
+LLM_QUEUE_TIMEOUT = config('LLM_QUEUE_TIMEOUT', default=30.0, cast=float)
+# Same cap for the async views (ASGI); awaiting a provider call does not hold a worker
+LLM_ASYNC_MAX_CONCURRENCY = config('LLM_ASYNC_MAX_CONCURRENCY', default=200, cast=int)
+LLM_STRUCTURED_OUTPUTS = config('LLM_STRUCTURED_OUTPUTS', default=False, cast=bool) # JSON-schema response_format (falls back to JSON mode if the model rejects it)
+
+# Content-addressed LLM result cache (see api/ai_cache.py). LocMemCache is per worker;
+# set AI_CACHE_BACKEND/AI_CACHE_LOCATION to e.g. Redis to share results across workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ai_results': {
+        'BACKEND': config('AI_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('AI_CACHE_LOCATION', default='ai-results'),
+        'TIMEOUT': config('AI_CACHE_TTL', default=60 * 60 * 24, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('AI_CACHE_MAX_ENTRIES', default=5000, cast=int),
+        },
+    },
+}
+
+# Background jobs (api/jobs.py, run by `python manage.py run_jobs`)
+JOB_COALESCE_SECONDS = config('JOB_COALESCE_SECONDS', default=10, cast=int) # Debounce window for repeated enqueues
+JOB_COALESCE_MAX_SECONDS = config('JOB_COALESCE_MAX_SECONDS', default=60, cast=int) # ...but never delay a job longer than this
+JOB_VISIBILITY_TIMEOUT = config('JOB_VISIBILITY_TIMEOUT', default=300, cast=int)
+JOB_RETRY_DELAY = config('JOB_RETRY_DELAY', default=30, cast=int)
+# Run jobs inside the request instead (no worker needed, e.g. for local development)
+JOBS_RUN_INLINE = config('JOBS_RUN_INLINE', default=False, cast=bool)
+
+# Dream/Target/Safe come from the local fit scorer (api/fit_scoring.py); set to True to have the LLM write the reason/risks text
+RECOMMENDATION_LLM_REASONS = config('RECOMMENDATION_LLM_REASONS', default=False, cast=bool)
+
+# Recommendation pool; LLM prompts over it go in chunks of RECOMMENDATION_CHUNK_SIZE, up to RECOMMENDATION_CHUNK_WORKERS at a time
+RECOMMENDATION_POOL_SIZE = config('RECOMMENDATION_POOL_SIZE', default=100, cast=int)
+RECOMMENDATION_CHUNK_SIZE = config('RECOMMENDATION_CHUNK_SIZE', default=25, cast=int) # Keeps each prompt well under the token limit
+RECOMMENDATION_CHUNK_WORKERS = config('RECOMMENDATION_CHUNK_WORKERS', default=4, cast=int)
+
+# Single-flight recommendation generation (api/single_flight.py)
+RECOMMENDATION_LEASE_SECONDS = config('RECOMMENDATION_LEASE_SECONDS', default=120, cast=int) # Longer than a full graph run
+RECOMMENDATION_WAIT_SECONDS = config('RECOMMENDATION_WAIT_SECONDS', default=5, cast=float) # Then answer 202 and let the client poll
+
+# Chat prompt assembly (api/prompt_budget.py): context beyond the budget is dropped, shortlist first
+CHAT_PROMPT_TOKEN_BUDGET = config('CHAT_PROMPT_TOKEN_BUDGET', default=3000, cast=int)
+CHAT_HISTORY_ITEM_TOKENS = config('CHAT_HISTORY_ITEM_TOKENS', default=400, cast=int) # Longer past messages are cut
+# Rolling session summaries (api/chat_summary.py): the prompt is the summary plus the messages since,
+# refreshed in the background once CHAT_SUMMARY_EVERY messages are older than the last CHAT_RECENT_MESSAGES
+CHAT_RECENT_MESSAGES = config('CHAT_RECENT_MESSAGES', default=6, cast=int)
+CHAT_SUMMARY_EVERY = config('CHAT_SUMMARY_EVERY', default=10, cast=int)
+CHAT_SUMMARY_MAX_WORDS = config('CHAT_SUMMARY_MAX_WORDS', default=150, cast=int)
+# Chat history pages (api/chat_history.py): messages per page by default, and the most a client may ask for
+CHAT_HISTORY_PAGE_SIZE = config('CHAT_HISTORY_PAGE_SIZE', default=50, cast=int)
+CHAT_HISTORY_MAX_PAGE_SIZE = config('CHAT_HISTORY_MAX_PAGE_SIZE', default=200, cast=int)
+
+# AI task generation: the prompt lists at most TASK_PROMPT_HISTORY existing tasks (active first);
+# generated titles this similar (difflib ratio, api/task_titles.py) to any existing task are dropped
+TASK_PROMPT_HISTORY = config('TASK_PROMPT_HISTORY', default=15, cast=int)
+TASK_DUPLICATE_CUTOFF = config('TASK_DUPLICATE_CUTOFF', default=0.85, cast=float)
+
+# Profile strength is computed locally from the onboarding rules; set to True to ask the LLM instead
+PROFILE_STRENGTH_USE_LLM = config('PROFILE_STRENGTH_USE_LLM', default=False, cast=bool)
+
 # Social account providers
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
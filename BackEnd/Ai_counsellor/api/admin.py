@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, ProfileAICache, ShortlistedUniversity, Task
+from .models import User, ProfileAICache, ShortlistedUniversity, Task, University, BackgroundJob
 
 # class CustomUserAdmin(UserAdmin):
 #     model = User
@@ -9,8 +9,14 @@ from .models import User, ProfileAICache, ShortlistedUniversity, Task
 #     ordering = ('email',)
 #     search_fields = ('email', 'first_name', 'last_name')
 
+class UserOwnedAdmin(admin.ModelAdmin):
+    # __str__ of these models shows the user's email: join it instead of one query per row
+    list_select_related = ('user',)
+
 #admin.site.register(User, CustomUserAdmin)
 admin.site.register(User)
-admin.site.register(ProfileAICache)
-admin.site.register(ShortlistedUniversity)
-admin.site.register(Task)
+admin.site.register(ProfileAICache, UserOwnedAdmin)
+admin.site.register(ShortlistedUniversity, UserOwnedAdmin)
+admin.site.register(Task, UserOwnedAdmin)
+admin.site.register(University)
+admin.site.register(BackgroundJob, UserOwnedAdmin)
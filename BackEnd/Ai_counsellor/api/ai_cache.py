@@ -0,0 +1,82 @@
+"""
+Content-addressed cache for LLM results, shared by every user.
+
+The key is a SHA-256 over the exact inputs a prompt consumes plus the model,
+temperature and prompt version, so two users with identical inputs share one
+result and any prompt change produces new keys. Storage is the `ai_results`
+Django cache alias (TTL + LRU eviction with LocMemCache by default); point
+AI_CACHE_BACKEND at a shared backend to share results across workers.
+"""
+import hashlib
+import json
+
+from django.core.cache import caches
+
+AI_CACHE_ALIAS = 'ai_results'
+
+_MISSING = object()
+
+
+def make_key(namespace, inputs, model, temperature, prompt_version):
+    canonical = json.dumps(
+        {
+            'inputs': inputs,
+            'model': model,
+            'temperature': temperature,
+            'prompt_version': prompt_version,
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"ai:{namespace}:{digest}"
+
+
+def get(key, default=None):
+    return caches[AI_CACHE_ALIAS].get(key, default)
+
+
+def set(key, value, timeout=None):
+    cache = caches[AI_CACHE_ALIAS]
+    if timeout is None:
+        cache.set(key, value)
+    else:
+        cache.set(key, value, timeout)
+
+
+def get_or_compute(key, compute, timeout=None):
+    """
+    Returns the cached value for `key`, or stores and returns `compute()`.
+    Exceptions from `compute` propagate and nothing is cached, so callers'
+    fallbacks are never served to other users.
+    """
+    value = get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    value = compute()
+    set(key, value, timeout)
+    return value
+
+
+async def aget(key, default=None):
+    return await caches[AI_CACHE_ALIAS].aget(key, default)
+
+
+async def aset(key, value, timeout=None):
+    cache = caches[AI_CACHE_ALIAS]
+    if timeout is None:
+        await cache.aset(key, value)
+    else:
+        await cache.aset(key, value, timeout)
+
+
+async def aget_or_compute(key, compute, timeout=None):
+    """Async variant of get_or_compute; `compute` is a coroutine function."""
+    value = await aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    value = await compute()
+    await aset(key, value, timeout)
+    return value
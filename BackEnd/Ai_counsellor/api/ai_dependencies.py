@@ -0,0 +1,111 @@
+"""
+Which profile fields each cached AI artifact on ProfileAICache depends on.
+
+For every artifact the cache row keeps a fingerprint of those fields
+(`<artifact>_inputs`). Views call `record_profile_write` after a profile or
+onboarding write; it recomputes the fingerprints and clears only the artifacts
+whose inputs actually changed, bumping `profile_version` when it does. Renaming
+yourself, re-saving an unchanged form or ticking off a task keeps the
+(expensive) recommendations.
+
+Artifacts are stored together with the fingerprint of the profile they were
+computed from, and only while that fingerprint and the `profile_version` read
+before computing still match the row. A result computed from a profile that
+changed mid-generation is dropped, even if the edit was later undone.
+"""
+import hashlib
+import json
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ProfileAICache, User
+from .serializers import ProfileSerializer
+from .single_flight import get_ai_cache
+
+# artifact -> {profile section: fields}. Keep in sync with the prompts and scorers that read them.
+ARTIFACT_DEPENDENCIES = {
+    # fit_scoring.py, the recommendation prompt and the candidate pool (preferred countries)
+    'recommendations': {
+        'academic_background': ('education_level', 'gpa'),
+        'study_goal': ('intended_degree', 'field_of_study', 'preferred_countries'),
+        'budget': ('budget_range',),
+        'exams_readiness': ('ielts_toefl_status', 'ielts_toefl_score', 'gre_gmat_status', 'gre_gmat_score'),
+    },
+    # strength_request / compute_profile_strength
+    'strength_data': {
+        'academic_background': ('education_level', 'degree_major', 'gpa'),
+        'study_goal': ('preferred_countries',),
+        'exams_readiness': ('ielts_toefl_status', 'gre_gmat_status', 'sop_status'),
+    },
+}
+
+INPUTS_FIELDS = {
+    'recommendations': 'recommendations_inputs',
+    'strength_data': 'strength_inputs',
+}
+
+# What clearing an artifact resets; an in-flight recommendation run is orphaned too (single_flight.py)
+ARTIFACT_RESETS = {
+    'recommendations': {'recommendations': None, 'recommendations_lease_token': '', 'recommendations_lease_until': None},
+    'strength_data': {'strength_data': None},
+}
+
+
+def inputs_fingerprint(profile_data, artifact):
+    """Hash of the profile fields `artifact` depends on (ProfileSerializer data)."""
+    values = {
+        section: {field: (profile_data.get(section) or {}).get(field) for field in fields}
+        for section, fields in ARTIFACT_DEPENDENCIES[artifact].items()
+    }
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def current_profile(user):
+    """Profile data as saved, ignoring related objects cached on `user` earlier in the request."""
+    fresh = User.objects.select_related(*ARTIFACT_DEPENDENCIES['recommendations']).get(pk=user.pk)
+    return ProfileSerializer(fresh).data
+
+
+def record_profile_write(user):
+    """Clears the artifacts whose inputs changed. Returns their names."""
+    profile_data = current_profile(user)
+    cache_obj = get_ai_cache(user)
+
+    changes, stale = {}, []
+    for artifact, inputs_field in INPUTS_FIELDS.items():
+        fingerprint = inputs_fingerprint(profile_data, artifact)
+        if getattr(cache_obj, inputs_field) != fingerprint:
+            stale.append(artifact)
+            changes[inputs_field] = fingerprint
+            changes.update(ARTIFACT_RESETS[artifact])
+
+    if changes:
+        ProfileAICache.objects.filter(pk=cache_obj.pk).update(
+            profile_version=F('profile_version') + 1, updated_at=timezone.now(), **changes
+        )
+    return stale
+
+
+def _unchanged_since(artifact, fingerprint, version):
+    inputs_field = INPUTS_FIELDS[artifact]
+    # Empty: no write recorded since the row was created
+    return (Q(**{inputs_field: fingerprint}) | Q(**{inputs_field: ''})) & Q(profile_version=version)
+
+
+def store_artifact(user, artifact, profile_data, value, version):
+    """
+    Saves `value` computed from `profile_data` unless the profile changed meanwhile.
+    `version` is the cache row's profile_version read before computing.
+    """
+    fingerprint = inputs_fingerprint(profile_data, artifact)
+    return bool(ProfileAICache.objects.filter(_unchanged_since(artifact, fingerprint, version), user=user).update(
+        **{artifact: value, INPUTS_FIELDS[artifact]: fingerprint, 'updated_at': timezone.now()}
+    ))
+
+
+async def astore_artifact(user, artifact, profile_data, value, version):
+    fingerprint = inputs_fingerprint(profile_data, artifact)
+    return bool(await ProfileAICache.objects.filter(_unchanged_since(artifact, fingerprint, version), user=user).aupdate(
+        **{artifact: value, INPUTS_FIELDS[artifact]: fingerprint, 'updated_at': timezone.now()}
+    ))
@@ -1,18 +1,22 @@
+import asyncio
+import difflib
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, List, Dict, Any, Optional
 from langgraph.graph import StateGraph, END
-import os
-from openai import OpenAI
+import openai
 from django.conf import settings
-from dotenv import load_dotenv
+from . import ai_cache, llm_gateway
+from .chat_stream import ResponseFieldExtractor
+from .json_repair import loads_tolerant
+from .prompt_budget import Section, fit_sections, usage_report
+from .university_search import fold
 
-load_dotenv()
+# Bump when a prompt changes so cached results from the old prompt are not reused
+RECOMMENDATION_PROMPT_VERSION = 2
 
-# Configure Groq (For Recommendations)
-client = OpenAI(
-    base_url="https://api.groq.com/openai/v1",
-    api_key=os.environ.get("GROQ_API_KEY")
-)
+logger = logging.getLogger(__name__)
 
 # --- 1. Define State (Recommendations) ---
 class RecommendationState(TypedDict):
@@ -23,29 +27,68 @@ class RecommendationState(TypedDict):
     attempt_count: int
     error_message: Optional[str]
 
+CATEGORIES = ("Dream", "Target", "Safe")
+NAME_MATCH_CUTOFF = 0.85 # difflib ratio for mapping a misspelled university name onto the pool
+
+_RECOMMENDATION_ITEM = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "reason": {"type": "string"},
+        "risks": {"type": "string"},
+        "cost": {"type": "string", "enum": ["High", "Medium", "Low"]},
+        "acceptance_chance": {"type": "string", "enum": ["Low", "Medium", "High"]},
+    },
+    "required": ["name", "reason", "risks", "cost", "acceptance_chance"],
+    "additionalProperties": False,
+}
+RECOMMENDATION_SCHEMA = {
+    "type": "object",
+    "properties": {category: {"type": "array", "items": _RECOMMENDATION_ITEM} for category in CATEGORIES},
+    "required": list(CATEGORIES),
+    "additionalProperties": False,
+}
+
+def recommendation_response_format():
+    """JSON-schema structured output when enabled (LLM_STRUCTURED_OUTPUTS), plain JSON mode otherwise."""
+    if settings.LLM_STRUCTURED_OUTPUTS:
+        return {"type": "json_schema", "json_schema": {"name": "recommendations", "strict": True, "schema": RECOMMENDATION_SCHEMA}}
+    return {"type": "json_object"}
+
+def structured_output_rejected(error):
+    """The provider/model refused the json_schema response format (400), so JSON mode should be used."""
+    return settings.LLM_STRUCTURED_OUTPUTS and isinstance(error.__cause__, openai.BadRequestError)
+
 # --- 2. Define Nodes (Recommendations) ---
 
-def generate_recommendations_node(state: RecommendationState):
-    """
-    Generates recommendations using Groq (OpenAI Client).
-    """
+def prompt_universities(universities_list):
+    """What the prompt shows per university; `category` is set when fit_scoring already classified it."""
+    return [
+        {"name": u.get('name'), "rank": u.get('rank', 999), **({"category": u['category']} if u.get('category') else {})}
+        for u in universities_list
+    ]
+
+def build_recommendation_messages(state: RecommendationState):
     profile_data = state['profile_data']
     universities_list = state['universities_list']
-    attempt = state.get('attempt_count', 0)
     error_msg = state.get('error_message')
 
     # Prepare Prompt data
     academic = profile_data.get('academic_background') or {}
     exams = profile_data.get('exams_readiness') or {}
     study_goal = profile_data.get('study_goal') or {}
-    budget = profile_data.get('budget', {})
+    budget = profile_data.get('budget') or {}
     
     # Simplify list for prompt
-    simple_uni_list = [{"name": u.get('name'), "rank": u.get('rank', 999)} for u in universities_list]
+    simple_uni_list = prompt_universities(universities_list)
+    if any('category' in u for u in simple_uni_list):
+        task = "These universities are already classified (see \"category\"). Keep each one in its category and write its reason and risks for this student:"
+    else:
+        task = "Classify these universities into 'Dream', 'Target', 'Safe' based on:"
 
     base_prompt = f"""
     You are an University Admissions Expert.
-    Classify these universities into 'Dream', 'Target', 'Safe' based on:
+    {task}
     Profile: GPA {academic.get('gpa')}, {academic.get('education_level')}, IELTS {exams.get('ielts_toefl_score')}, Budget {budget.get('budget_range')}
     Target: {study_goal.get('intended_degree')} in {study_goal.get('field_of_study')}
 
@@ -62,27 +105,103 @@ def generate_recommendations_node(state: RecommendationState):
     if error_msg:
         base_prompt += f"\n\nPREVIOUS ATTEMPT FAILED. Error: {error_msg}. \nFIX THE JSON FORMATting."
 
+    return [
+        {"role": "system", "content": "You are a University Admissions Expert. Output ONLY valid JSON."},
+        {"role": "user", "content": base_prompt}
+    ]
+
+def generate_recommendations_node(state: RecommendationState):
+    """
+    Generates recommendations using Groq (OpenAI Client).
+    """
+    messages = build_recommendation_messages(state)
     try:
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b",
-            messages=[
-                {"role": "system", "content": "You are a University Admissions Expert. Output ONLY valid JSON."},
-                {"role": "user", "content": base_prompt}
-            ],
-            temperature=0.3, # Lower temperature for classification stability
-            response_format={"type": "json_object"}
-        )
-        response_text = completion.choices[0].message.content
+        try:
+            response_text = llm_gateway.chat_completion(
+                messages=messages,
+                temperature=0.3, # Lower temperature for classification stability
+                response_format=recommendation_response_format()
+            )
+        except llm_gateway.LLMError as e:
+            if not structured_output_rejected(e):
+                raise
+            response_text = llm_gateway.chat_completion(messages=messages, temperature=0.3, response_format={"type": "json_object"})
         # print("Accepted response, --------------------------------------", response_text)
     except Exception as e:
         response_text = "{}" # Fail safe
 
     return {
         "ai_response_text": response_text,
-        "attempt_count": attempt + 1,
+        "attempt_count": state.get('attempt_count', 0) + 1,
         "error_message": None # Reset error
     }
 
+async def agenerate_recommendations_node(state: RecommendationState):
+    """Async variant of generate_recommendations_node (used by arun_recommendation_graph)."""
+    messages = build_recommendation_messages(state)
+    try:
+        try:
+            response_text = await llm_gateway.achat_completion(
+                messages=messages,
+                temperature=0.3,
+                response_format=recommendation_response_format()
+            )
+        except llm_gateway.LLMError as e:
+            if not structured_output_rejected(e):
+                raise
+            response_text = await llm_gateway.achat_completion(messages=messages, temperature=0.3, response_format={"type": "json_object"})
+    except Exception as e:
+        response_text = "{}" # Fail safe
+
+    return {
+        "ai_response_text": response_text,
+        "attempt_count": state.get('attempt_count', 0) + 1,
+        "error_message": None
+    }
+
+def _folded(name):
+    return ' '.join(fold(name).split())
+
+def match_university_name(name, pool_names):
+    """The pool name `name` refers to (ignoring case/accents, tolerating typos), or None."""
+    by_folded = {_folded(pool_name): pool_name for pool_name in pool_names}
+    folded = _folded(name)
+    if folded in by_folded:
+        return by_folded[folded]
+    close = difflib.get_close_matches(folded, list(by_folded), n=1, cutoff=NAME_MATCH_CUTOFF)
+    return by_folded[close[0]] if close else None
+
+def coerce_recommendations(data, universities_list):
+    """
+    Fits parsed output to {Dream, Target, Safe}: bucket names are matched
+    case-insensitively, missing buckets become empty, malformed items and
+    names outside the pool are dropped, near-miss names are mapped onto the
+    pool and each university is kept once.
+    Returns None when nothing usable is left.
+    """
+    if not isinstance(data, dict):
+        return None
+    buckets = {str(key).strip().lower(): items for key, items in data.items()}
+    pool_names = [u.get('name') for u in universities_list if u.get('name')]
+
+    result, seen = {category: [] for category in CATEGORIES}, set()
+    for category in CATEGORIES:
+        items = buckets.get(category.lower())
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, str):
+                item = {"name": item}
+            if not isinstance(item, dict) or not isinstance(item.get('name'), str):
+                continue
+            name = match_university_name(item['name'], pool_names) if pool_names else item['name']
+            if name is None or name in seen:
+                continue
+            seen.add(name)
+            result[category].append({**item, "name": name})
+
+    if pool_names and not seen:
+        return None
+    return result
+
 def validate_json_node(state: RecommendationState):
     """
     Validates if the output is valid JSON and has the required keys.
@@ -92,14 +211,34 @@ def validate_json_node(state: RecommendationState):
         data = json.loads(text)
         
         # Basic Schema Check
-        if not all(key in data for key in ["Dream", "Target", "Safe"]):
+        if not isinstance(data, dict) or not all(key in data for key in CATEGORIES):
              raise ValueError("Missing required keys: Dream, Target, Safe")
-        
-        return {"final_json": data, "error_message": None}
+
+        final_json = coerce_recommendations(data, state['universities_list'])
+        if final_json is None:
+            raise ValueError("None of the listed universities were classified")
+        return {"final_json": final_json, "error_message": None}
     except Exception as e:
         return {"error_message": str(e), "final_json": None}
 
+def repair_json_node(state: RecommendationState):
+    """
+    Salvages output that failed validation (fences, trailing commas, truncation,
+    missing buckets, misspelled names) instead of asking the model again.
+    """
+    try:
+        final_json = coerce_recommendations(loads_tolerant(state['ai_response_text']), state['universities_list'])
+    except ValueError as e:
+        return {"error_message": f"{state.get('error_message')}; {e}", "final_json": None}
+    if final_json is None:
+        return {"error_message": f"{state.get('error_message')}; nothing salvageable", "final_json": None}
+    return {"final_json": final_json, "error_message": None}
+
 # --- 3. Define Conditional Logic ---
+def after_validate(state: RecommendationState):
+    """Valid output ends the run; anything else goes to repair before a costly retry."""
+    return "end" if state['final_json'] else "repair"
+
 def should_continue(state: RecommendationState):
     """
     Decides whether to retry or end.
@@ -108,20 +247,43 @@ def should_continue(state: RecommendationState):
         return "end" # Success
     if state['attempt_count'] >= 3:
         return "end" # Max retries reached
-    return "retry" # Generation failed, try again
+    return "retry" # Nothing salvageable, try again
 
 # --- 4. Build Graph (Recommendations) ---
-workflow = StateGraph(RecommendationState)
-workflow.add_node("generate", generate_recommendations_node)
-workflow.add_node("validate", validate_json_node)
-workflow.set_entry_point("generate")
-workflow.add_edge("generate", "validate")
-workflow.add_conditional_edges("validate", should_continue, {"end": END, "retry": "generate"})
-app = workflow.compile()
+def build_recommendation_graph(generate_node):
+    workflow = StateGraph(RecommendationState)
+    workflow.add_node("generate", generate_node)
+    workflow.add_node("validate", validate_json_node)
+    workflow.add_node("repair", repair_json_node)
+    workflow.set_entry_point("generate")
+    workflow.add_edge("generate", "validate")
+    workflow.add_conditional_edges("validate", after_validate, {"end": END, "repair": "repair"})
+    workflow.add_conditional_edges("repair", should_continue, {"end": END, "retry": "generate"})
+    return workflow.compile()
+
+app = build_recommendation_graph(generate_recommendations_node)
+async_app = build_recommendation_graph(agenerate_recommendations_node)
 
 # --- 5. Initializer Wrapper ---
-def run_recommendation_graph(profile_data, universities_list):
-    inputs = {
+def recommendation_cache_key(profile_data, universities_list):
+    """Key over exactly what generate_recommendations_node puts in the prompt."""
+    academic = profile_data.get('academic_background') or {}
+    exams = profile_data.get('exams_readiness') or {}
+    study_goal = profile_data.get('study_goal') or {}
+    budget = profile_data.get('budget') or {}
+    prompt_inputs = {
+        'gpa': academic.get('gpa'),
+        'education_level': academic.get('education_level'),
+        'ielts_toefl_score': exams.get('ielts_toefl_score'),
+        'budget_range': budget.get('budget_range'),
+        'intended_degree': study_goal.get('intended_degree'),
+        'field_of_study': study_goal.get('field_of_study'),
+        'universities': prompt_universities(universities_list),
+    }
+    return ai_cache.make_key('recommendations', prompt_inputs, settings.GROQ_MODEL, 0.3, RECOMMENDATION_PROMPT_VERSION)
+
+def recommendation_inputs(profile_data, universities_list):
+    return {
         "profile_data": profile_data,
         "universities_list": universities_list,
         "attempt_count": 0,
@@ -129,8 +291,73 @@ def run_recommendation_graph(profile_data, universities_list):
         "final_json": None,
         "error_message": None
     }
-    result = app.invoke(inputs)
+
+def recommendation_chunks(universities_list):
+    """Splits the pool into prompts of at most RECOMMENDATION_CHUNK_SIZE universities."""
+    size = max(1, settings.RECOMMENDATION_CHUNK_SIZE)
+    return [universities_list[i:i + size] for i in range(0, len(universities_list), size)] or [universities_list]
+
+def merge_chunk_results(universities_list, results):
+    """
+    Combines per-chunk classifications into one {Dream, Target, Safe} result.
+    Deterministic regardless of which chunk finished first: each university is
+    kept once (first chunk wins) and every bucket is in pool order.
+    """
+    position = {u.get('name'): i for i, u in enumerate(universities_list)}
+    merged = {"Dream": [], "Target": [], "Safe": []}
+    seen = set()
+    for result in results:
+        for category, items in merged.items():
+            for item in result.get(category) or []:
+                if not isinstance(item, dict) or item.get('name') in seen:
+                    continue
+                seen.add(item.get('name'))
+                items.append(item)
+    for items in merged.values():
+        items.sort(key=lambda item: position.get(item.get('name'), len(position)))
+    return merged
+
+def run_recommendation_graph(profile_data, universities_list):
+    """Classifies the pool chunk by chunk, in parallel, and merges the buckets."""
+    chunks = recommendation_chunks(universities_list)
+    if len(chunks) == 1:
+        results = [classify_chunk(profile_data, chunks[0])]
+    else:
+        workers = min(settings.RECOMMENDATION_CHUNK_WORKERS, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recommendations') as pool:
+            results = list(pool.map(lambda chunk: classify_chunk(profile_data, chunk), chunks))
+    return merge_chunk_results(universities_list, results)
+
+async def arun_recommendation_graph(profile_data, universities_list):
+    """Async variant of run_recommendation_graph (same graph, async LLM node)."""
+    chunks = recommendation_chunks(universities_list)
+    results = await asyncio.gather(*(aclassify_chunk(profile_data, chunk) for chunk in chunks))
+    return merge_chunk_results(universities_list, results)
+
+def classify_chunk(profile_data, universities_list):
+    """One graph run over one chunk. Validated results are cached per chunk."""
+    key = recommendation_cache_key(profile_data, universities_list)
+    cached = ai_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = app.invoke(recommendation_inputs(profile_data, universities_list))
     if result.get("final_json"):
+        # Only validated classifications are shared
+        ai_cache.set(key, result["final_json"])
+        return result["final_json"]
+    else:
+        return {"Dream": [], "Target": [], "Safe": []}
+
+async def aclassify_chunk(profile_data, universities_list):
+    key = recommendation_cache_key(profile_data, universities_list)
+    cached = await ai_cache.aget(key)
+    if cached is not None:
+        return cached
+
+    result = await async_app.ainvoke(recommendation_inputs(profile_data, universities_list))
+    if result.get("final_json"):
+        await ai_cache.aset(key, result["final_json"])
         return result["final_json"]
     else:
         return {"Dream": [], "Target": [], "Safe": []}
@@ -146,18 +373,19 @@ class ChatState(TypedDict):
     locked_unis: Optional[List[Dict[str, Any]]]
     shortlisted_unis: Optional[List[Dict[str, Any]]]
     tasks: Optional[List[Dict[str, Any]]]
+    summary: str
     error_message: Optional[str]
     task_action: Optional[Dict[str, Any]]
 
-def chat_node(state: ChatState):
-    profile_data = state['profile_data']
-    history = state['history']
-    user_msg = state['user_message']
-    stage = state.get('stage', 1)
-    locked_unis = state.get('locked_unis', [])
-    shortlisted_unis = state.get('shortlisted_unis', [])
-    tasks = state.get('tasks', [])
-    
+def build_chat_prompt(profile_data, history, user_msg, stage=1, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    """
+    System prompt + session summary + recent history + the new user message, in
+    OpenAI format, within CHAT_PROMPT_TOKEN_BUDGET. Returns (messages, tokens per section).
+    """
+    locked_unis = locked_unis or []
+    shortlisted_unis = shortlisted_unis or []
+    tasks = tasks or []
+
     # 1. Prepare Context
     academic = profile_data.get('academic_background') or {}
     study_goal = profile_data.get('study_goal') or {}
@@ -170,7 +398,8 @@ def chat_node(state: ChatState):
         3: "Finalizing Universities (Locked choices)"
     }
     
-    system_prompt = f"""
+    def system_prompt(locked_text, shortlisted_text, tasks_text, summary_text):
+        return f"""
     You are an AI Education Counsellor. Your goal is to guide the student to their dream university.
     
     Current Application Stage: Stage {stage} - {stage_map.get(stage, "Unknown")}
@@ -183,9 +412,10 @@ def chat_node(state: ChatState):
     - Exams: IELTS/TOEFL: {exams.get('ielts_toefl_score')}, GRE/GMAT: {exams.get('gre_gmat_score')}
     
     Contextual Data:
-    - Locked Universities: {json.dumps(locked_unis)}
-    - Other Shortlisted: {json.dumps(shortlisted_unis)}
-    - Current Active Tasks: {json.dumps(tasks)}
+    - Locked Universities: {locked_text}
+    - Other Shortlisted: {shortlisted_text}
+    - Current Active Tasks ({len(tasks)} in total): {tasks_text}
+    - Earlier in this conversation: {summary_text}
     
     Guidelines:
     - You have FULL ACCESS to the user's data. Use it to provide specific, data-driven answers.
@@ -214,28 +444,94 @@ def chat_node(state: ChatState):
         - {{"type": "create_task", "title": "..."}}
         - {{"type": "complete_task", "task_id": ...}}
     """
-    
-    # 2. Convert history to OpenAI format
-    messages = [{"role": "system", "content": system_prompt}]
-    for msg in history[-5:]: # Keep last 5 turns context
-        messages.append({"role": msg.get('role', 'user'), "content": msg.get('content', '')})
-    
+
+    # 2. Fit the variable-size context into the token budget, most important first
+    # The caller bounds history to the messages after the summary (chat_summary.py)
+    recent = [{"role": msg.get('role', 'user'), "content": msg.get('content', '')} for msg in history]
+    as_line = lambda msg: f"{msg['role']}: {msg['content']}"
+    fitted = fit_sections([
+        Section('instructions', [system_prompt('', '', '', '')], render=lambda kept, omitted: kept[0], required=True),
+        Section('user_message', [user_msg], render=lambda kept, omitted: kept[0], required=True),
+        Section('locked_universities', locked_unis, priority=1),
+        Section('tasks', tasks, priority=2),
+        Section(
+            'history', list(reversed(recent)), # Newest turns are kept first
+            render=lambda kept, omitted: '\n'.join(as_line(msg) for msg in kept),
+            render_item=as_line, priority=3, max_item_tokens=settings.CHAT_HISTORY_ITEM_TOKENS,
+        ),
+        Section(
+            'summary', [summary] if summary else [],
+            render=lambda kept, omitted: kept[0] if kept else 'None',
+            render_item=str, priority=4, max_item_tokens=settings.CHAT_HISTORY_ITEM_TOKENS,
+        ),
+        Section('shortlisted_universities', shortlisted_unis, priority=5),
+    ], settings.CHAT_PROMPT_TOKEN_BUDGET)
+
+    # 3. Convert history to OpenAI format
+    content = system_prompt(
+        fitted['locked_universities']['text'], fitted['shortlisted_universities']['text'],
+        fitted['tasks']['text'], fitted['summary']['text'],
+    )
+    messages = [{"role": "system", "content": content}]
+    messages.extend(reversed(fitted['history']['items']))
     messages.append({"role": "user", "content": user_msg})
-    
+
+    usage = usage_report(fitted)
+    logger.debug("Chat prompt tokens: %s", usage)
+    return messages, usage
+
+def build_chat_messages(profile_data, history, user_msg, stage=1, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    """build_chat_prompt without the usage report."""
+    return build_chat_prompt(profile_data, history, user_msg, stage, locked_unis, shortlisted_unis, tasks, summary)[0]
+
+def chat_result(data):
+    return {
+        "ai_response_text": data.get("response", "I'm sorry, I couldn't process that."),
+        "suggested_actions": data.get("suggested_actions", []),
+        "task_action": data.get("action")
+    }
+
+def chat_state_messages(state: ChatState):
+    return build_chat_messages(
+        state['profile_data'],
+        state['history'],
+        state['user_message'],
+        stage=state.get('stage', 1),
+        locked_unis=state.get('locked_unis'),
+        shortlisted_unis=state.get('shortlisted_unis'),
+        tasks=state.get('tasks'),
+        summary=state.get('summary', ''),
+    )
+
+def chat_node(state: ChatState):
+    # Not cached (ai_cache): resending a message should get a fresh reply
+    messages = chat_state_messages(state)
+
     try:
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b",
+        response_text = llm_gateway.chat_completion(
             messages=messages,
             temperature=0.7,
             response_format={"type": "json_object"}
         )
-        response_text = completion.choices[0].message.content
-        data = json.loads(response_text)
+        return chat_result(json.loads(response_text))
+    except Exception as e:
         return {
-            "ai_response_text": data.get("response", "I'm sorry, I couldn't process that."),
-            "suggested_actions": data.get("suggested_actions", []),
-            "task_action": data.get("action")
+            "ai_response_text": "I encountered an error. Please try again.",
+            "suggested_actions": [],
+            "error_message": str(e)
         }
+
+async def achat_node(state: ChatState):
+    """Async variant of chat_node."""
+    messages = chat_state_messages(state)
+
+    try:
+        response_text = await llm_gateway.achat_completion(
+            messages=messages,
+            temperature=0.7,
+            response_format={"type": "json_object"}
+        )
+        return chat_result(json.loads(response_text))
     except Exception as e:
         return {
             "ai_response_text": "I encountered an error. Please try again.",
@@ -243,14 +539,18 @@ def chat_node(state: ChatState):
             "error_message": str(e)
         }
 
-chat_workflow = StateGraph(ChatState)
-chat_workflow.add_node("chat", chat_node)
-chat_workflow.set_entry_point("chat")
-chat_workflow.add_edge("chat", END)
-chat_app = chat_workflow.compile()
+def build_chat_graph(node):
+    chat_workflow = StateGraph(ChatState)
+    chat_workflow.add_node("chat", node)
+    chat_workflow.set_entry_point("chat")
+    chat_workflow.add_edge("chat", END)
+    return chat_workflow.compile()
+
+chat_app = build_chat_graph(chat_node)
+async_chat_app = build_chat_graph(achat_node)
 
-def run_chat_graph(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None):
-    inputs = {
+def chat_inputs(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    return {
         "profile_data": profile_data,
         "history": history,
         "user_message": user_message,
@@ -258,14 +558,64 @@ def run_chat_graph(profile_data, history, user_message, stage=None, locked_unis=
         "locked_unis": locked_unis,
         "shortlisted_unis": shortlisted_unis,
         "tasks": tasks or [],
+        "summary": summary or '',
         "ai_response_text": "",
         "suggested_actions": [],
         "task_action": None,
         "error_message": None
     }
-    result = chat_app.invoke(inputs)
+
+def run_chat_graph(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    result = chat_app.invoke(chat_inputs(profile_data, history, user_message, stage, locked_unis, shortlisted_unis, tasks, summary))
+    return {
+        "response": result["ai_response_text"],
+        "suggested_actions": result["suggested_actions"],
+        "task_action": result.get("task_action")
+    }
+
+async def arun_chat_graph(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    result = await async_chat_app.ainvoke(chat_inputs(profile_data, history, user_message, stage, locked_unis, shortlisted_unis, tasks, summary))
     return {
         "response": result["ai_response_text"],
         "suggested_actions": result["suggested_actions"],
         "task_action": result.get("task_action")
     }
+
+def stream_chat(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    """
+    Streaming counterpart of run_chat_graph (same prompt).
+    Yields ("token", text) while the "response" field is generated, then exactly one
+    ("done", result) with the same keys as run_chat_graph. result["response"] is the
+    final text: on failure it replaces whatever was streamed.
+    """
+    messages = build_chat_messages(
+        profile_data, history, user_message,
+        stage=stage, locked_unis=locked_unis, shortlisted_unis=shortlisted_unis, tasks=tasks, summary=summary,
+    )
+    extractor = ResponseFieldExtractor('response')
+    chunks = []
+    try:
+        for delta in llm_gateway.stream_completion(
+            messages=messages,
+            temperature=0.7,
+            response_format={"type": "json_object"}
+        ):
+            chunks.append(delta)
+            text = extractor.feed(delta)
+            if text:
+                yield "token", text
+        data = json.loads(''.join(chunks))
+    except Exception as e:
+        yield "done", {
+            "response": "I encountered an error. Please try again.",
+            "suggested_actions": [],
+            "task_action": None
+        }
+        return
+
+    result = chat_result(data)
+    yield "done", {
+        "response": result["ai_response_text"],
+        "suggested_actions": result["suggested_actions"],
+        "task_action": result["task_action"]
+    }
@@ -1,142 +1,338 @@
-import os
+import re
 import json
 from django.conf import settings
-from dotenv import load_dotenv
-from openai import OpenAI
+from . import ai_cache, llm_gateway
 
-load_dotenv()
+# Bump when a prompt changes so cached results from the old prompt are not reused
+STRENGTH_PROMPT_VERSION = 1
+TASKS_PROMPT_VERSION = 2
+SUMMARY_PROMPT_VERSION = 1
 
-# Configure Groq for Recommendations
-client = OpenAI(
-    base_url="https://api.groq.com/openai/v1",
-    api_key=os.environ.get("GROQ_API_KEY")
-)
+SOP_STATUSES = ('Not started', 'Draft', 'Ready')
+EXAM_DONE_STATUSES = ('taken', 'completed', 'done')
+EXAM_PLANNED_STATUSES = ('planning to take', 'planning', 'scheduled', 'in progress', 'preparing')
+
+def parse_gpa(value):
+    """
+    Converts a free-text GPA ("3.8", "8.5/10", "85%") to the 4.0 scale.
+    Returns None when no number can be found.
+    """
+    text = str(value or '').strip()
+    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:/\s*(\d+(?:\.\d+)?))?', text)
+    if not match:
+        return None
+    score = float(match.group(1))
+    if match.group(2):
+        scale = float(match.group(2))
+    elif '%' in text or score > 10:
+        scale = 100.0
+    elif score > 5:
+        scale = 10.0
+    elif score > 4:
+        scale = 5.0
+    else:
+        scale = 4.0
+    if scale <= 0:
+        return None
+    return score / scale * 4.0
+
+def exam_state(status):
+    """Normalizes an IELTS/TOEFL or GRE/GMAT status to 'done', 'planned' or 'none'."""
+    status = (status or '').strip().lower()
+    if status in EXAM_DONE_STATUSES:
+        return 'done'
+    if status in EXAM_PLANNED_STATUSES:
+        return 'planned'
+    return 'none'
+
+def compute_profile_strength(profile_data):
+    """
+    Local, deterministic version of the rules spelled out in the
+    evaluate_profile_strength prompt. Same output shape, no network call.
+    """
+    academic = profile_data.get('academic_background') or {}
+    exams = profile_data.get('exams_readiness') or {}
+
+    # 1. Academics: 'Strong' if GPA > 3.5 or equivalent, 'Average' if > 3.0, 'Weak' otherwise
+    gpa = parse_gpa(academic.get('gpa'))
+    if gpa is None:
+        academics = 'Average' # Nothing to judge, same as the old fallback
+    elif gpa > 3.5:
+        academics = 'Strong'
+    elif gpa > 3.0:
+        academics = 'Average'
+    else:
+        academics = 'Weak'
+
+    # 2. Exams: 'Completed' if both taken, 'In Progress' if planning, 'Not Started' if neither
+    states = [exam_state(exams.get('ielts_toefl_status')), exam_state(exams.get('gre_gmat_status'))]
+    if all(state == 'done' for state in states):
+        exams_rating = 'Completed'
+    elif any(state != 'none' for state in states):
+        exams_rating = 'In Progress'
+    else:
+        exams_rating = 'Not Started'
+
+    # 3. SOP: Directly use the status provided
+    sop = exams.get('sop_status')
+    if sop not in SOP_STATUSES:
+        sop = 'Not started'
+
+    return {
+        "academics": academics,
+        "exams": exams_rating,
+        "sop": sop
+    }
+
+def strength_request(profile_data):
+    """Cache key and chat-completion arguments for the profile strength prompt."""
+    # safely get nested data
+    academic = profile_data.get('academic_background') or {}
+    exams = profile_data.get('exams_readiness') or {}
+    study_goal = profile_data.get('study_goal') or {}
+    preferred_countries = study_goal.get('preferred_countries')
+
+    # Exactly the fields the prompt below consumes (cache key)
+    inputs = {
+        'preferred_countries': preferred_countries,
+        'education_level': academic.get('education_level', 'N/A'),
+        'degree_major': academic.get('degree_major', 'N/A'),
+        'gpa': academic.get('gpa', 'N/A'),
+        'ielts_toefl_status': exams.get('ielts_toefl_status', 'N/A'),
+        'gre_gmat_status': exams.get('gre_gmat_status', 'N/A'),
+        'sop_status': exams.get('sop_status', 'Not started'),
+    }
+
+    prompt = f"""
+    Analyze the following student profile for {preferred_countries} university admissions and provide a strength assessment.
+
+    Profile Data:
+    - Education: {academic.get('education_level', 'N/A')} in {academic.get('degree_major', 'N/A')}
+    - GPA: {academic.get('gpa', 'N/A')}
+    - Exams: IELTS/TOEFL: {exams.get('ielts_toefl_status', 'N/A')}, GRE/GMAT: {exams.get('gre_gmat_status', 'N/A')}
+    - SOP Status: {exams.get('sop_status', 'Not started')}
+
+    Rules:
+    1. Academics: 'Strong' if GPA > 3.5 or equivalent, 'Average' if > 3.0, 'Weak' otherwise.
+    2. Exams: 'Completed' if both taken, 'In Progress' if planning, 'Not Started' if neither.
+    3. SOP: Directly use the status provided (Not started/Draft/Ready).
+
+    Return ONLY valid JSON in this format, no code blocks:
+    {{
+        "academics": "Strong|Average|Weak",
+        "exams": "Not Started|In Progress|Completed",
+        "sop": "Not started|Draft|Ready"
+    }}
+    """
+
+    key = ai_cache.make_key('profile_strength', inputs, settings.GROQ_MODEL, 0, STRENGTH_PROMPT_VERSION)
+    return key, {
+        "messages": [
+            {"role": "system", "content": "You are a helpful education counselor assistant that outputs only JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0,
+        "response_format": {"type": "json_object"}
+    }
 
 def evaluate_profile_strength(profile_data):
     """
     Evaluates the strength of the user's profile based on available data.
     Returns a JSON object with strength ratings for Academics, Exams, and SOP.
-    Uses Groq (OpenAI Client).
+    Uses Groq (OpenAI Client). Optional enrichment mode; the dashboard
+    uses compute_profile_strength by default.
     """
     try:
-        # safely get nested data
-        academic = profile_data.get('academic_background', {})
-        exams = profile_data.get('exams_readiness', {})
-        study_goal = profile_data.get('study_goal', {})
-        preferred_countries = study_goal.get('preferred_countries')
-        
-        prompt = f"""
-        Analyze the following student profile for {preferred_countries} university admissions and provide a strength assessment.
-        
-        Profile Data:
-        - Education: {academic.get('education_level', 'N/A')} in {academic.get('degree_major', 'N/A')}
-        - GPA: {academic.get('gpa', 'N/A')}
-        - Exams: IELTS/TOEFL: {exams.get('ielts_toefl_status', 'N/A')}, GRE/GMAT: {exams.get('gre_gmat_status', 'N/A')}
-        - SOP Status: {exams.get('sop_status', 'Not started')}
-        
-        Rules:
-        1. Academics: 'Strong' if GPA > 3.5 or equivalent, 'Average' if > 3.0, 'Weak' otherwise.
-        2. Exams: 'Completed' if both taken, 'In Progress' if planning, 'Not Started' if neither.
-        3. SOP: Directly use the status provided (Not started/Draft/Ready).
-        
-        Return ONLY valid JSON in this format, no code blocks:
-        {{
-            "academics": "Strong|Average|Weak",
-            "exams": "Not Started|In Progress|Completed",
-            "sop": "Not started|Draft|Ready"
-        }}
-        """
-        
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b", # Using Groq supported model
-            messages=[
-                {"role": "system", "content": "You are a helpful education counselor assistant that outputs only JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        
-        text = completion.choices[0].message.content
-        return json.loads(text)
-        
+        key, request = strength_request(profile_data)
+        return ai_cache.get_or_compute(key, lambda: json.loads(llm_gateway.chat_completion(**request)))
+    except Exception as e:
+        # Fallback to the local rules
+        return compute_profile_strength(profile_data)
+
+async def aevaluate_profile_strength(profile_data):
+    """Async variant of evaluate_profile_strength for the ASGI views."""
+    try:
+        key, request = strength_request(profile_data)
+
+        async def request_strength():
+            return json.loads(await llm_gateway.achat_completion(**request))
+
+        return await ai_cache.aget_or_compute(key, request_strength)
     except Exception as e:
-        # Fallback default
-        return {
-            "academics": "Average",
-            "exams": "Not Started",
-            "sop": "Not started"
-        }
+        # Fallback to the local rules
+        return compute_profile_strength(profile_data)
+
+def tasks_request(profile_data, current_stage, existing_tasks=None):
+    """Cache key and chat-completion arguments for the task suggestion prompt."""
+    # safely get nested data
+    academic = profile_data.get('academic_background') or {}
+    exams = profile_data.get('exams_readiness') or {}
+    study_goal = profile_data.get('study_goal') or {}
+    budget = profile_data.get('budget') or {}
+    preferred_countries = study_goal.get('preferred_countries', 'international')
 
-def generate_tasks_for_user(profile_data, current_stage, existing_tasks=None):
+    existing_tasks_str = ", ".join(existing_tasks) if existing_tasks else "None"
+
+    # Exactly the fields the prompt below consumes (cache key)
+    inputs = {
+        'education_level': academic.get('education_level', 'N/A'),
+        'degree_major': academic.get('degree_major', 'N/A'),
+        'gpa': academic.get('gpa', 'N/A'),
+        'intended_degree': study_goal.get('intended_degree', 'N/A'),
+        'field_of_study': study_goal.get('field_of_study', 'N/A'),
+        'preferred_countries': preferred_countries,
+        'ielts_toefl_status': exams.get('ielts_toefl_status', 'N/A'),
+        'gre_gmat_status': exams.get('gre_gmat_status', 'N/A'),
+        'sop_status': exams.get('sop_status', 'Not started'),
+        'budget_range': budget.get('budget_range', 'N/A'),
+        'funding_plan': budget.get('funding_plan', 'N/A'),
+        'current_stage': current_stage,
+        'existing_tasks': existing_tasks_str,
+    }
+
+    prompt = f"""
+    Act as an AI Education Counselor through a detailed analysis of the student's profile.
+
+    Student Profile:
+    - Education: {academic.get('education_level', 'N/A')} in {academic.get('degree_major', 'N/A')}
+    - GPA: {academic.get('gpa', 'N/A')}
+    - Target: {study_goal.get('intended_degree', 'N/A')} in {study_goal.get('field_of_study', 'N/A')}
+    - Countries: {preferred_countries}
+    - Exams: {exams.get('ielts_toefl_status', 'N/A')}, {exams.get('gre_gmat_status', 'N/A')}
+    - SOP: {exams.get('sop_status', 'Not started')}
+    - Budget: {budget.get('budget_range', 'N/A')} ({budget.get('funding_plan', 'N/A')})
+
+    Current Stage: {current_stage}
+    Allowed Tasks: {existing_tasks_str}
+
+    GOAL: Suggest 3-5 specific, high-priority, actionable tasks to INCREASE acceptance chances.
+
+    Rules:
+    - Do NOT suggest tasks from 'Allowed Tasks'.
+    - Focus on NEXT logical steps.
+    - Return ONLY a valid JSON array of strings.
+    Example: ["Draft SOP", "Register for IELTS"]
+    """
+
+    key = ai_cache.make_key('tasks', inputs, settings.GROQ_MODEL, 0.7, TASKS_PROMPT_VERSION)
+    return key, {
+        "messages": [
+            {"role": "system", "content": "You are a helpful education counselor assistant that outputs only JSON arrays."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7
+    }
+
+def parse_task_list(text):
+    text = text.strip()
+    # Clean response string if it contains markdown
+    if text.startswith("```json"):
+        text = text[7:-3]
+    elif text.startswith("```"):
+        text = text[3:-3]
+    return json.loads(text)
+
+def generate_tasks_for_user(profile_data, current_stage, existing_tasks=None, raise_errors=False):
     """
     Generates a list of recommended tasks based on the user's profile and current stage.
-    Uses Groq (OpenAI Client).
+    Uses Groq (OpenAI Client). With raise_errors, failures propagate instead of
+    returning the fallback task (the job queue retries them).
     """
     try:
-        # safely get nested data
-        academic = profile_data.get('academic_background', {})
-        exams = profile_data.get('exams_readiness', {})
-        study_goal = profile_data.get('study_goal', {})
-        budget = profile_data.get('budget', {})
-        preferred_countries = study_goal.get('preferred_countries', 'international')
-        
-        existing_tasks_str = ", ".join(existing_tasks) if existing_tasks else "None"
-
-        prompt = f"""
-        Act as an AI Education Counselor through a detailed analysis of the student's profile.
-        
-        Student Profile:
-        - Education: {academic.get('education_level', 'N/A')} in {academic.get('degree_major', 'N/A')}
-        - GPA: {academic.get('gpa', 'N/A')}
-        - Target: {study_goal.get('intended_degree', 'N/A')} in {study_goal.get('field_of_study', 'N/A')}
-        - Countries: {preferred_countries}
-        - Exams: {exams.get('ielts_toefl_status', 'N/A')}, {exams.get('gre_gmat_status', 'N/A')}
-        - SOP: {exams.get('sop_status', 'Not started')}
-        - Budget: {budget.get('budget_range', 'N/A')}
-
-        Current Stage: {current_stage}
-        Allowed Tasks: {existing_tasks_str}
-
-        GOAL: Suggest 3-5 specific, high-priority, actionable tasks to INCREASE acceptance chances.
-        
-        Rules:
-        - Do NOT suggest tasks from 'Allowed Tasks'.
-        - Focus on NEXT logical steps.
-        - Return ONLY a valid JSON array of strings.
-        Example: ["Draft SOP", "Register for IELTS"]
-        """
-        
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b", # Using Groq supported model
-            messages=[
-                {"role": "system", "content": "You are a helpful education counselor assistant that outputs only JSON arrays."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
-        text = completion.choices[0].message.content.strip()
-        # Clean response string if it contains markdown
-        if text.startswith("```json"):
-            text = text[7:-3]
-        elif text.startswith("```"):
-            text = text[3:-3]
-            
-        return json.loads(text)
-        
+        key, request = tasks_request(profile_data, current_stage, existing_tasks)
+        return ai_cache.get_or_compute(key, lambda: parse_task_list(llm_gateway.chat_completion(**request)))
+    except Exception as e:
+        if raise_errors:
+            raise
+        return ["Complete your profile information"]
+
+async def agenerate_tasks_for_user(profile_data, current_stage, existing_tasks=None):
+    """Async variant of generate_tasks_for_user for the ASGI views."""
+    try:
+        key, request = tasks_request(profile_data, current_stage, existing_tasks)
+
+        async def request_tasks():
+            return parse_task_list(await llm_gateway.achat_completion(**request))
+
+        return await ai_cache.aget_or_compute(key, request_tasks)
     except Exception as e:
         return ["Complete your profile information"]
 
+def summary_request(previous_summary, messages):
+    """Cache key and chat-completion arguments for folding `messages` into a conversation summary."""
+    from .prompt_budget import truncate_to_tokens
+    transcript = "\n".join(
+        f"{msg['role']}: {truncate_to_tokens(msg['content'], settings.CHAT_HISTORY_ITEM_TOKENS)}" for msg in messages
+    )
+
+    prompt = f"""
+    Update the running summary of a conversation between a student and their AI Education Counselor.
+
+    Summary so far:
+    {previous_summary or "None"}
+
+    New messages:
+    {transcript}
+
+    Rules:
+    - Keep facts, decisions, preferences and open questions the counselor will need later.
+    - Drop greetings and small talk.
+    - At most {settings.CHAT_SUMMARY_MAX_WORDS} words, plain text.
+    """
+
+    key = ai_cache.make_key('chat_summary', {'summary': previous_summary, 'messages': messages}, settings.GROQ_MODEL, 0, SUMMARY_PROMPT_VERSION)
+    return key, {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that writes concise conversation summaries."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0
+    }
+
+def summarize_conversation(previous_summary, messages):
+    """
+    The summary with `messages` ({role, content}) folded in. Failures propagate,
+    so the job queue retries them (chat_summary.py).
+    """
+    key, request = summary_request(previous_summary, messages)
+    return ai_cache.get_or_compute(key, lambda: llm_gateway.chat_completion(**request).strip())
+
+def categorized_pool(classified, universities_list):
+    """The pool in its original order, each entry tagged with its local category."""
+    category_of = {item['name']: category for category, items in classified.items() for item in items}
+    return [{**u, 'category': category_of.get(u.get('name'))} for u in universities_list]
+
+def with_llm_reasons(classified, llm_response):
+    """Takes only the reason/risks text from the LLM; categories and scores stay local."""
+    written = {
+        item.get('name'): item
+        for items in llm_response.values() if isinstance(items, list)
+        for item in items if isinstance(item, dict)
+    }
+    return {
+        category: [
+            {**item, **{field: written[item['name']][field] for field in ('reason', 'risks') if written.get(item['name'], {}).get(field)}}
+            for item in items
+        ]
+        for category, items in classified.items()
+    }
+
 def get_university_recommendations(profile_data, universities_list):
     """
     Classifies a list of universities into Dream, Target, and Safe based on the user's profile.
-    Uses LangGraph for robust handling (Logic inside ai_graph.py).
+    Categories come from the local fit scorer (fit_scoring.py). With
+    RECOMMENDATION_LLM_REASONS the LangGraph workflow (ai_graph.py) rewrites
+    the reason/risks text for those fixed categories.
     """
+    from .fit_scoring import classify_universities
+    classified = classify_universities(profile_data, universities_list)
+    if not settings.RECOMMENDATION_LLM_REASONS:
+        return classified
+
     from .ai_graph import run_recommendation_graph
-    return run_recommendation_graph(profile_data, universities_list)
+    return with_llm_reasons(classified, run_recommendation_graph(profile_data, categorized_pool(classified, universities_list)))
 
-def chat_with_counselor(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None):
+def chat_with_counselor(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
     """
     Handles chat interaction with the AI Counsellor using the LangGraph workflow.
     Provides full context including application stage and shortlisted universities.
@@ -149,5 +345,47 @@ def chat_with_counselor(profile_data, history, user_message, stage=None, locked_
         stage=stage, 
         locked_unis=locked_unis, 
         shortlisted_unis=shortlisted_unis,
-        tasks=tasks
+        tasks=tasks,
+        summary=summary
+    )
+
+def stream_chat_with_counselor(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    """
+    Streaming variant of chat_with_counselor.
+    Yields ("token", text) events followed by one ("done", result) event.
+    """
+    from .ai_graph import stream_chat
+    return stream_chat(
+        profile_data,
+        history,
+        user_message,
+        stage=stage,
+        locked_unis=locked_unis,
+        shortlisted_unis=shortlisted_unis,
+        tasks=tasks,
+        summary=summary
+    )
+
+async def aget_university_recommendations(profile_data, universities_list):
+    """Async variant of get_university_recommendations."""
+    from .fit_scoring import classify_universities
+    classified = classify_universities(profile_data, universities_list)
+    if not settings.RECOMMENDATION_LLM_REASONS:
+        return classified
+
+    from .ai_graph import arun_recommendation_graph
+    return with_llm_reasons(classified, await arun_recommendation_graph(profile_data, categorized_pool(classified, universities_list)))
+
+async def achat_with_counselor(profile_data, history, user_message, stage=None, locked_unis=None, shortlisted_unis=None, tasks=None, summary=''):
+    """Async variant of chat_with_counselor."""
+    from .ai_graph import arun_chat_graph
+    return await arun_chat_graph(
+        profile_data,
+        history,
+        user_message,
+        stage=stage,
+        locked_unis=locked_unis,
+        shortlisted_unis=shortlisted_unis,
+        tasks=tasks,
+        summary=summary
     )
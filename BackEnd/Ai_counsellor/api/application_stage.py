@@ -0,0 +1,57 @@
+"""
+The 1-4 application stage, stored on User.application_stage.
+
+    1 Building Profile         onboarding not completed
+    2 Discovering Universities onboarding completed
+    3 Finalizing Universities  ... and explore or shortlist visited
+    4 Preparing Applications   ... and at least one university locked
+
+Reads use the stored value (no query). The writes that can move it call
+`refresh_application_stage`: onboarding and profile saves, section visits and
+lock/unlock. It saves the stage with a conditional UPDATE and sends
+`stage_changed` only when the stage actually moved, so receivers (AI task
+generation, see signals.py) run once per real transition, even when two
+requests race.
+"""
+from django.dispatch import Signal
+
+from .models import ShortlistedUniversity, User
+
+STAGE_NAMES = {
+    1: "Building Profile",
+    2: "Discovering Universities",
+    3: "Finalizing Universities",
+    4: "Preparing Applications",
+}
+
+# Sent with sender=User and user, old_stage, new_stage
+stage_changed = Signal()
+
+
+def compute_stage(user, has_locked):
+    if user.onboarding_step != 'Completed':
+        return 1
+    if has_locked:
+        return 4
+    if user.has_visited_explore or user.has_visited_shortlist:
+        return 3
+    return 2
+
+
+def refresh_application_stage(user):
+    """Recomputes and stores the user's stage, sending stage_changed if it moved. Returns the stage."""
+    has_locked = (
+        user.onboarding_step == 'Completed'
+        and ShortlistedUniversity.objects.filter(user=user, is_locked=True).exists()
+    )
+    old_stage = user.application_stage
+    new_stage = compute_stage(user, has_locked)
+    if old_stage == new_stage:
+        return new_stage
+
+    # Only one of two racing requests moves the stage (and fires the event)
+    moved = User.objects.filter(pk=user.pk).exclude(application_stage=new_stage).update(application_stage=new_stage)
+    user.application_stage = new_stage
+    if moved:
+        stage_changed.send(sender=User, user=user, old_stage=old_stage, new_stage=new_stage)
+    return new_stage
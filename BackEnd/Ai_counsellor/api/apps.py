@@ -7,3 +7,10 @@ class ApiConfig(AppConfig):
 
     def ready(self):
         import api.signals
+
+        # Render the public top-20 pages at startup instead of on the first request
+        from .top_universities import get_top20_pages
+        try:
+            get_top20_pages()
+        except (OSError, ValueError):
+            pass
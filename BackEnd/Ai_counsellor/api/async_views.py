@@ -0,0 +1,219 @@
+"""
+Async (ASGI) versions of the LLM-bound endpoints, mounted under /api/async/.
+
+Under gunicorn every in-flight Groq call holds a worker thread for its whole
+duration. These views await the provider through `llm_gateway.achat_completion`
+instead, so a single ASGI worker (uvicorn) can keep hundreds of slow calls in
+flight. Responses have the same shape as their DRF counterparts in views.py.
+
+DRF function views are sync-only, so these are plain Django async views: the
+JWT bearer token is checked by `async_jwt_required` and JSON bodies are parsed
+by hand. Simple queries use the async ORM; helpers shared with views.py that
+walk relations through serializers run via `sync_to_async`.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .ai_graph import recommendation_cache_key
+from .ai_service import (
+    aevaluate_profile_strength,
+    agenerate_tasks_for_user,
+    aget_university_recommendations,
+    achat_with_counselor,
+    compute_profile_strength,
+)
+from .ai_dependencies import astore_artifact, inputs_fingerprint
+from .catalog import get_catalog
+from .models import ChatSession, ShortlistedUniversity, StudyGoal
+from .serializers import ProfileSerializer, TaskSerializer
+from .chat_context import load_chat_context, save_chat_turn
+from .views import (
+    get_chat_session,
+    merge_recommendations,
+    recommendation_pool,
+    recommendations_pending_response,
+    save_generated_tasks,
+    task_generation_context,
+)
+from .single_flight import (
+    aacquire_recommendations_lease,
+    acomplete_recommendations,
+    aget_ai_cache,
+    arelease_recommendations_lease,
+    await_recommendations,
+)
+
+
+def async_jwt_required(view):
+    """Authenticates `Authorization: Bearer <access token>` like DRF's JWTAuthentication."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': e.detail}, status=401)
+        if result is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    # Token auth only: no cookies, so no CSRF token (same as the DRF views)
+    return csrf_exempt(wrapper)
+
+
+def json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@sync_to_async
+def profile_payload(user):
+    return ProfileSerializer(user).data
+
+
+@require_GET
+@async_jwt_required
+async def profile_strength_view(request):
+    try:
+        enrich = request.GET.get('enrich', '').lower() in ('1', 'true') or settings.PROFILE_STRENGTH_USE_LLM
+        if not enrich:
+            profile_data = await profile_payload(request.user)
+            return JsonResponse({'status': 'success', 'data': compute_profile_strength(profile_data), 'cached': False})
+
+        cache_obj = await aget_ai_cache(request.user)
+        if cache_obj.strength_data:
+            return JsonResponse({'status': 'success', 'data': cache_obj.strength_data, 'cached': True})
+
+        profile_data = await profile_payload(request.user)
+        strength_data = await aevaluate_profile_strength(profile_data)
+
+        await astore_artifact(request.user, 'strength_data', profile_data, strength_data, cache_obj.profile_version)
+
+        return JsonResponse({'status': 'success', 'data': strength_data, 'cached': False})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_GET
+@async_jwt_required
+async def university_recommendations_view(request):
+    try:
+        try:
+            catalog = await sync_to_async(get_catalog)()  # The first load (or a reload) parses the JSON file
+        except FileNotFoundError:
+            return JsonResponse({'error': 'University data file not found'}, status=404)
+
+        preferred_countries = await StudyGoal.objects.filter(user=request.user).values_list('preferred_countries', flat=True).afirst()
+        top_60_unis = recommendation_pool(catalog, preferred_countries)
+
+        cache_obj = await aget_ai_cache(request.user)
+        if not cache_obj.recommendations:
+            profile_data = await profile_payload(request.user)
+            fingerprint = recommendation_cache_key(profile_data, top_60_unis)
+            token = await aacquire_recommendations_lease(request.user, fingerprint)
+            if token is None:
+                ai_response = await await_recommendations(request.user, settings.RECOMMENDATION_WAIT_SECONDS)
+                if ai_response is None:
+                    return recommendations_pending_response(request.get_full_path())
+            else:
+                try:
+                    ai_response = await aget_university_recommendations(profile_data, top_60_unis)
+                except Exception:
+                    await arelease_recommendations_lease(request.user, token)
+                    raise
+                await acomplete_recommendations(
+                    request.user, token, ai_response, inputs_fingerprint(profile_data, 'recommendations')
+                )
+            is_cached = token is None
+        else:
+            ai_response = cache_obj.recommendations
+            is_cached = True
+
+        locked_set = {
+            name async for name in ShortlistedUniversity.objects
+            .filter(user=request.user, is_locked=True)
+            .values_list('university_name', flat=True)
+        }
+
+        return JsonResponse({
+            'status': 'success',
+            'data': merge_recommendations(ai_response, top_60_unis, locked_set),
+            'cached': is_cached,
+            'locked_universities': list(locked_set),
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_POST
+@async_jwt_required
+async def generate_new_tasks_view(request):
+    try:
+        # Debounce: AI call frequency limit (5 seconds), shared with the sync view
+        lock_key = f"ai_gen_lock_{request.user.id}"
+        if await cache.aget(lock_key):
+            return JsonResponse({'status': 'skipped', 'data': []})
+        await cache.aset(lock_key, "true", timeout=5)
+
+        new_tasks = []
+        try:
+            context = await sync_to_async(task_generation_context)(request.user)
+            if context is not None:
+                generated_titles = await agenerate_tasks_for_user(
+                    context['profile_data'], context['current_stage'], context['existing_tasks']
+                )
+                new_tasks = await sync_to_async(save_generated_tasks)(
+                    request.user, generated_titles, context['active_tasks_count'], context['existing_titles']
+                )
+        except Exception:
+            new_tasks = []
+
+        return JsonResponse({'status': 'success', 'data': TaskSerializer(new_tasks, many=True).data}, status=201)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_POST
+@async_jwt_required
+async def chat_view(request):
+    try:
+        data = json_body(request)
+        user_message = data.get('message')
+        session_id = data.get('session_id')
+
+        if not user_message:
+            return JsonResponse({'error': 'Message is required'}, status=400)
+
+        try:
+            session = await sync_to_async(get_chat_session)(request.user, session_id)
+        except (ChatSession.DoesNotExist, ValidationError):
+            return JsonResponse({'error': 'Invalid Session ID'}, status=404)
+
+        context = await sync_to_async(load_chat_context)(request.user, session, user_message)
+        ai_result = await achat_with_counselor(**context)
+        await sync_to_async(save_chat_turn)(request.user, session, user_message, ai_result)
+
+        return JsonResponse({
+            'status': 'success',
+            'data': {
+                'response': ai_result['response'],
+                'suggested_actions': ai_result['suggested_actions'],
+                'session_id': session.id,
+                'session_title': session.title
+            }
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
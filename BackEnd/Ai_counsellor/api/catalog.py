@@ -0,0 +1,246 @@
+"""
+Process-wide, read-only view of the university catalog.
+
+`University_data/university_data_by_rank.json` is parsed once per worker and
+turned into immutable indexes (by country, by ISO code, by normalized name,
+a global rank-sorted array and a full-text search index). `get_catalog()`
+re-stats the file on every call and rebuilds the indexes when its mtime
+changes, so the data can be edited without restarting the server.
+
+Records are `MappingProxyType` objects: views must copy them
+(`{**uni, 'is_locked': ...}`) instead of mutating shared state.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+
+from django.conf import settings
+
+from .countries import CountryResolver, merge_by_rank
+from .university_search import QueryCache, UniversitySearchIndex, fold
+
+DEFAULT_RANK = 9999
+FILTER_CACHE_SIZE = 256
+
+CATALOG_PATH = getattr(
+    settings,
+    'UNIVERSITY_CATALOG_PATH',
+    os.path.join(settings.BASE_DIR, 'University_data', 'university_data_by_rank.json'),
+)
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace so lookups ignore formatting."""
+    return ' '.join(str(text or '').lower().split())
+
+
+def rank_of(uni):
+    rank = uni.get('rank')
+    return DEFAULT_RANK if rank is None else rank
+
+
+def _freeze(uni, country):
+    record = dict(uni)
+    # The country name is injected once here instead of per request in the views
+    record['country'] = record.get('country') or country
+    record['domains'] = tuple(record.get('domains') or ())
+    record['web_pages'] = tuple(record.get('web_pages') or ())
+    return MappingProxyType(record)
+
+
+def _group(records, key):
+    groups = {}
+    for record in records:
+        groups.setdefault(key(record), []).append(record)
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+
+class UniversityCatalog:
+    """
+    Immutable snapshot of the catalog file.
+    Every index holds the same record objects, ordered by rank.
+    """
+
+    def __init__(self, countries_data, version):
+        self.version = version
+
+        records = []
+        countries = []
+        for country_data in countries_data:
+            c_name = country_data.get('country', '')
+            countries.append(c_name)
+            for uni in country_data.get('universities', []):
+                records.append(_freeze(uni, c_name))
+
+        # sorted() is stable, so equal ranks keep their file order
+        self.ranked = tuple(sorted(records, key=rank_of))
+        self.countries = tuple(countries)
+        self.by_country = _group(self.ranked, lambda u: normalize(u['country']))
+        self.by_code = _group(self.ranked, lambda u: (u.get('alpha_two_code') or '').upper())
+        self.by_name = _group(self.ranked, lambda u: normalize(u.get('name')))
+        self.search_index = UniversitySearchIndex(self.ranked)
+        self.country_resolver = CountryResolver(
+            self.countries,
+            {code: records[0]['country'] for code, records in self.by_code.items() if code},
+        )
+        self._filtered = QueryCache(FILTER_CACHE_SIZE)
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def in_country(self, country):
+        return self.by_country.get(normalize(country), ())
+
+    def in_code(self, code):
+        return self.by_code.get((code or '').upper(), ())
+
+    def get(self, name, country=None):
+        """Best-ranked record with this name (optionally within a country), or None."""
+        for record in self.by_name.get(normalize(name), ()):
+            if country is None or normalize(record['country']) == normalize(country):
+                return record
+        return None
+
+    def countries_matching(self, query):
+        """Countries whose name contains `query` (case-insensitive)."""
+        query = normalize(query)
+        return tuple(c_name for c_name in self.countries if query in normalize(c_name))
+
+    def ranked_in(self, countries):
+        """Rank-sorted records belonging to any of `countries`."""
+        keys = {normalize(c) for c in countries}
+        if len(keys) == 1:
+            return self.by_country.get(keys.pop(), ())
+        return tuple(u for u in self.ranked if normalize(u['country']) in keys)
+
+    def candidate_pool(self, countries, size):
+        """
+        Top `size` universities across `countries` by rank, with per-country quotas
+        so one large country cannot crowd out the others.
+        """
+        pools = [self.in_country(c) for c in countries]
+        return merge_by_rank([pool for pool in pools if pool], size, rank_of)
+
+    def filtered(self, country=None, rank_min=0, rank_max=10000, search=''):
+        """
+        Ordered records for an explorer filter combination.
+        Results are computed once per catalog version and reused by every page request.
+        """
+        key = filter_key(country, rank_min, rank_max, search)
+        return self._filtered.get_or_compute(key, lambda: self._filter(country, rank_min, rank_max, search))
+
+    def _filter(self, country, rank_min, rank_max, search):
+        countries = None
+        if country:
+            # "uk", "USA", "Deutschland" resolve exactly; anything else is a substring match
+            resolved = self.country_resolver.resolve(country)
+            countries = {resolved} if resolved else set(self.countries_matching(country))
+
+        if search.strip():
+            # Ranked full-text matches (relevance first, then rank)
+            universities = self.search_index.search(search)
+        elif countries is not None:
+            universities = self.ranked_in(countries)
+        else:
+            universities = self.ranked
+
+        return tuple(
+            uni for uni in universities
+            if (countries is None or uni['country'] in countries)
+            and rank_min <= rank_of(uni) <= rank_max
+        )
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def filter_key(country=None, rank_min=0, rank_max=10000, search=''):
+    """Normalized explorer filters: equal keys select the same records."""
+    return (normalize(country), rank_min, rank_max, fold(search).strip())
+
+
+def _filters_hash(filters):
+    return hashlib.sha256(json.dumps(filters).encode()).hexdigest()[:16]
+
+
+def encode_cursor(catalog, records, position, filters=None):
+    """
+    Opaque cursor pointing just after `records[position - 1]`, bound to the
+    `filter_key` that produced `records`.
+    """
+    last = records[position - 1]
+    payload = {
+        'v': catalog.version, 'p': position, 'n': last.get('name'), 'c': last.get('country'),
+        'f': _filters_hash(filters or filter_key()),
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(catalog, records, cursor, filters=None):
+    """
+    Start position in `records` for `cursor`.
+    Cursors from an older catalog version are re-anchored on the last record they saw;
+    a cursor taken under other filters is rejected.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        position = int(payload['p'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+
+    if payload.get('f') != _filters_hash(filters or filter_key()):
+        raise InvalidCursor('Cursor does not match these filters')
+
+    if payload.get('v') == catalog.version and 0 <= position <= len(records):
+        return position
+
+    for index, uni in enumerate(records):
+        if uni.get('name') == payload.get('n') and uni.get('country') == payload.get('c'):
+            return index + 1
+    raise InvalidCursor('Cursor is no longer valid')
+
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def load_versioned(path, build):
+    """
+    Returns `build(parsed_json, version, stat)` for `path`, cached per process and
+    rebuilt only when the file's mtime or size changes.
+    Raises FileNotFoundError when the file is missing.
+    """
+    stat = os.stat(path)
+    version = f"{stat.st_mtime_ns}-{stat.st_size}"
+    key = (path, build)
+
+    cached = _loaded.get(key)
+    if cached is not None and cached.version == version:
+        return cached
+
+    with _lock:
+        cached = _loaded.get(key)
+        if cached is None or cached.version != version:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = build(json.load(f), version, stat)
+            _loaded[key] = cached
+        return cached
+
+
+def get_catalog(path=None):
+    """
+    Returns the cached catalog for `path`, reloading it if the file changed.
+    Raises FileNotFoundError when the data file is missing.
+    """
+    return load_versioned(path or CATALOG_PATH, _build_catalog)
+
+
+def _build_catalog(data, version, stat):
+    return UniversityCatalog(data, version)
@@ -0,0 +1,99 @@
+"""
+Context loading and persistence for one chat turn, shared by the plain,
+streaming and async chat views.
+
+`load_chat_context` reads everything the counsellor prompt needs in a fixed
+number of queries, however many universities, tasks or messages the user has:
+
+1. the user with the four profile sections (select_related),
+2. the shortlist and 3. the active tasks (prefetch_related),
+4. the session's recent history (chat_summary.recent_history).
+
+The application stage is stored on the user. Nothing is written while the LLM is working;
+`save_chat_turn` then stores the user message, the reply, the task action and
+the session title/timestamp in one transaction.
+"""
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .chat_summary import recent_history, request_summary
+from .models import ChatMessage, ChatSession, ShortlistedUniversity, Task, User
+from .serializers import ProfileSerializer
+
+DEFAULT_TITLE = "New Chat"
+ACTIVE_TASK_LIMIT = 7 # Tasks the AI may create beyond this are dropped
+
+
+def load_user(user):
+    """`user` with profile sections, shortlist and active tasks loaded in three queries."""
+    return User.objects.select_related(
+        'academic_background', 'study_goal', 'budget', 'exams_readiness'
+    ).prefetch_related(
+        Prefetch('shortlisted_universities', queryset=ShortlistedUniversity.objects.order_by('id')),
+        Prefetch('tasks', queryset=Task.objects.filter(is_completed=False).order_by('id'), to_attr='active_tasks'),
+    ).get(pk=user.pk)
+
+
+def session_title(session, history, user_message):
+    """The title after this turn: a new session is named after its first user message."""
+    if session.title != DEFAULT_TITLE or session.summary_last_message_id:
+        return session.title
+    if any(msg['role'] == 'user' for msg in history):
+        return session.title
+    return (user_message[:30] + '..') if len(user_message) > 30 else user_message
+
+
+def load_chat_context(user, session, user_message):
+    """
+    Returns the keyword arguments for the counsellor (profile, summary, history,
+    stage, universities and tasks). Sets the session's new title in memory;
+    save_chat_turn persists it.
+    """
+    from .views import get_current_stage_data
+
+    loaded = load_user(user)
+    history = recent_history(session)
+    session.title = session_title(session, history, user_message)
+
+    shortlisted = list(loaded.shortlisted_universities.all())
+    as_context = lambda u: {"name": u.university_name, "country": u.country, "category": u.category}
+    locked_unis = [as_context(u) for u in shortlisted if u.is_locked]
+    stage_data = get_current_stage_data(loaded)
+
+    return {
+        'profile_data': ProfileSerializer(loaded).data,
+        'history': history,
+        'summary': session.summary,
+        'user_message': user_message,
+        'stage': stage_data.get('application_stage'),
+        'locked_unis': locked_unis,
+        'shortlisted_unis': [as_context(u) for u in shortlisted if not u.is_locked],
+        'tasks': [{"id": t.id, "title": t.title} for t in loaded.active_tasks],
+    }
+
+
+def apply_task_action(user, task_action):
+    if not task_action:
+        return
+    if task_action.get('type') == 'create_task':
+        if Task.objects.filter(user=user, is_completed=False).count() < ACTIVE_TASK_LIMIT:
+            Task.objects.create(user=user, title=task_action.get('title'), task_type='PERSONAL')
+    elif task_action.get('type') == 'complete_task':
+        Task.objects.filter(id=task_action.get('task_id'), user=user).update(is_completed=True)
+
+
+def save_chat_turn(user, session, user_message, ai_result):
+    """Stores the turn atomically and returns the AI message."""
+    with transaction.atomic():
+        apply_task_action(user, ai_result.get('task_action'))
+        # One INSERT; created_at and ids keep the user message first
+        _, message = ChatMessage.objects.bulk_create([
+            ChatMessage(user=user, session=session, sender='user', message=user_message),
+            ChatMessage(user=user, session=session, sender='ai', message=ai_result['response'], suggested_actions=ai_result['suggested_actions']),
+        ])
+        session.updated_at = timezone.now()
+        ChatSession.objects.filter(pk=session.pk).update(title=session.title, updated_at=session.updated_at)
+
+    request_summary(user, session)
+    return message
@@ -0,0 +1,104 @@
+"""
+Cursor-paginated chat history.
+
+A session is read a page at a time instead of all at once:
+
+- Without a cursor, the newest `limit` messages.
+- `before=<cursor>`: the `limit` messages older than that one (scrolling up).
+- `since=<cursor>`: only the messages newer than that one (polling), oldest
+  first, at most `limit` of them.
+
+Each page is returned oldest first. Cursors are opaque and keyed on the message
+id, which is also the order messages were saved in (see chat_summary.py), so a
+page is one range scan on the (session, id) index however long the session is.
+The rows come from a `values()` iterator and are serialized as they are read.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from rest_framework.utils.encoders import JSONEncoder
+
+from .catalog import InvalidCursor
+from .models import ChatMessage
+
+FIELDS = ('id', 'sender', 'message', 'suggested_actions', 'created_at')
+
+
+def encode_message_cursor(message_id):
+    raw = json.dumps({'m': message_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_message_cursor(cursor):
+    """Message id of `cursor`. Raises InvalidCursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        message_id = int(json.loads(raw)['m'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+    if message_id < 0:
+        raise InvalidCursor('Invalid cursor')
+    return message_id
+
+
+def _rows(session_id, before, since, limit):
+    """values() iterator over the page, oldest first; `since` pages read one row ahead."""
+    messages = ChatMessage.objects.filter(session_id=session_id)
+    if since is not None:
+        page = messages.filter(id__gt=since).order_by('id')[:limit + 1]
+    else:
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        # The page's oldest id, so the rows can be read in ascending order in one query
+        oldest = messages.order_by('-id').values('id')[limit - 1:limit]
+        page = messages.filter(id__gte=Coalesce(Subquery(oldest), 0)).order_by('id')
+    return page.values(*FIELDS).iterator()
+
+
+def _serialize(row):
+    return json.dumps({
+        'id': row['id'],
+        'sender': row['sender'],
+        'message': row['message'],
+        'suggested_actions': row['suggested_actions'] or [],
+        'timestamp': row['created_at'],
+    }, cls=JSONEncoder, ensure_ascii=False)
+
+
+def stream_history_page(session_id, before=None, since=None, limit=50):
+    """
+    Yields the JSON body of one page as it is read:
+    {"status": "success", "data": [...], "pagination": {...}} where
+    `next_cursor` loads older messages (None once the start is reached;
+    always None for `since` pages) and `since_cursor` polls for newer ones
+    (None while the session has no messages).
+    """
+    yield '{"status":"success","data":['
+    first_id = last_id = None
+    count = 0
+    has_more = False
+    for row in _rows(session_id, before, since, limit):
+        if count == limit:
+            has_more = True  # The look-ahead row of a `since` page
+            break
+        yield (',' if count else '') + _serialize(row)
+        first_id = row['id'] if first_id is None else first_id
+        last_id = row['id']
+        count += 1
+
+    next_cursor = None
+    if since is None and first_id is not None:
+        has_more = ChatMessage.objects.filter(session_id=session_id, id__lt=first_id).exists()
+        next_cursor = encode_message_cursor(first_id) if has_more else None
+
+    if last_id is None and since is not None:
+        last_id = since  # Nothing new: keep polling from the same place
+    elif last_id is None:
+        # An empty page before the start: poll from the newest message, if there is one
+        last_id = ChatMessage.objects.filter(session_id=session_id).order_by('-id').values_list('id', flat=True).first()
+    since_cursor = encode_message_cursor(last_id) if last_id is not None else None
+    pagination = {'has_more': has_more, 'next_cursor': next_cursor, 'since_cursor': since_cursor}
+    yield '],"pagination":' + json.dumps(pagination) + '}'
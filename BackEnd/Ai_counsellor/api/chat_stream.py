@@ -0,0 +1,123 @@
+"""
+Helpers for streaming chat replies over Server-Sent Events.
+
+The counsellor answers with a JSON object (`{"response": "...", "suggested_actions": [...],
+"action": {...}}`). `ResponseFieldExtractor` is fed the raw deltas as they arrive and
+returns the decoded text of the top-level "response" string as soon as it is
+available, so the user sees the answer while the rest of the object is still
+being generated.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def sse_event(event, data):
+    """One SSE frame; `data` is sent as single-line JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class ResponseFieldExtractor:
+    """
+    Incremental scanner for one top-level string field of a streamed JSON object.
+    Only tracks nesting and string boundaries, so it never re-parses what it has seen.
+    """
+
+    def __init__(self, field='response'):
+        self.field = field
+        self.text = ''          # Raw JSON received so far
+        self.pos = 0            # Next character to scan
+        self.depth = 0
+        self.in_string = False
+        self.string_start = 0
+        self.last_key = None    # Most recent string at depth 1 (a key, if a ':' follows)
+        self.emitting = False   # Inside the value of `field`
+        self.done = False
+
+    def feed(self, chunk):
+        """Returns the newly decoded characters of the field (possibly '')."""
+        self.text += chunk
+        out = []
+        while self.pos < len(self.text) and not self.done:
+            c = self.text[self.pos]
+
+            if self.emitting:
+                if c == '\\':
+                    decoded, width = self._escape(self.pos)
+                    if width == 0:
+                        break  # Escape sequence split across chunks; wait for more
+                    out.append(decoded)
+                    self.pos += width
+                    continue
+                if c == '"':
+                    self.done = True
+                else:
+                    out.append(c)
+                self.pos += 1
+                continue
+
+            if self.in_string:
+                if c == '\\':
+                    if self.pos + 1 >= len(self.text):
+                        break
+                    self.pos += 2
+                    continue
+                if c == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_key = json.loads(self.text[self.string_start:self.pos + 1])
+                self.pos += 1
+                continue
+
+            if c == '"':
+                if self.depth == 1 and self.last_key == self.field and self._after_colon():
+                    self.emitting = True
+                else:
+                    self.in_string = True
+                    self.string_start = self.pos
+            elif c in '{[':
+                self.depth += 1
+            elif c in '}]':
+                self.depth -= 1
+            elif c == ',':
+                self.last_key = None
+            self.pos += 1
+        return ''.join(out)
+
+    def _after_colon(self):
+        # True if the string starting at self.pos is a value, i.e. preceded by ':'
+        return self.text[:self.pos].rstrip().endswith(':')
+
+    def _escape(self, pos):
+        """(decoded text, characters consumed) for the escape at `pos`; width 0 if incomplete."""
+        if pos + 1 >= len(self.text):
+            return '', 0
+        kind = self.text[pos + 1]
+        if kind != 'u':
+            return _ESCAPES.get(kind, kind), 2
+        if pos + 6 > len(self.text):
+            return '', 0
+        code = int(self.text[pos + 2:pos + 6], 16)
+        if 0xD800 <= code < 0xDC00:
+            # High surrogate: needs the following \uXXXX low surrogate
+            if pos + 12 > len(self.text):
+                return '', 0
+            if self.text[pos + 6:pos + 8] == '\\u':
+                low = int(self.text[pos + 8:pos + 12], 16)
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+        return chr(code), 6
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF negotiate `Accept: text/event-stream`. Only used for error responses
+    raised before the stream starts; they are sent as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event('error', data).encode(self.charset)
@@ -0,0 +1,76 @@
+"""
+Rolling conversation summaries per ChatSession.
+
+The chat prompt is the session's `summary` plus the messages after
+`summary_last_message_id`, so its size stays flat however long a session
+runs. Once CHAT_SUMMARY_EVERY messages have piled up behind the recent window
+of CHAT_RECENT_MESSAGES, `chat_context.save_chat_turn` enqueues a `summarize_chats` job;
+the worker folds those messages into the summary with one small LLM call
+(ai_service.summarize_conversation). Properties:
+
+- Incremental: only the new messages and the previous summary are sent.
+- Jobs are per user and coalesce (jobs.py), so a busy chat triggers one
+  refresh per debounce window, covering all of the user's sessions.
+- The summary is saved with a conditional UPDATE on the previous
+  `summary_last_message_id`, so two workers never fold the same messages twice.
+"""
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import jobs
+from .models import ChatMessage, ChatSession
+
+
+def as_prompt_message(msg):
+    return {"role": msg.sender if msg.sender == 'user' else 'assistant', "content": msg.message}
+
+
+def unsummarized(session):
+    """Messages of `session` not yet folded into its summary."""
+    return ChatMessage.objects.filter(session=session, id__gt=session.summary_last_message_id)
+
+
+def recent_history(session, exclude_id=None):
+    """
+    The prompt history: the unsummarized messages, oldest first. Bounded even
+    while a refresh is pending (at most one refresh behind the recent window).
+    """
+    messages = unsummarized(session).exclude(id=exclude_id).order_by('-id')
+    limit = settings.CHAT_RECENT_MESSAGES + settings.CHAT_SUMMARY_EVERY
+    return [as_prompt_message(msg) for msg in reversed(messages[:limit])]
+
+
+def needs_summary(session):
+    return unsummarized(session).count() >= settings.CHAT_RECENT_MESSAGES + settings.CHAT_SUMMARY_EVERY
+
+
+def request_summary(user, session):
+    """Enqueues a summary refresh when `session` has outgrown its recent window."""
+    if needs_summary(session):
+        jobs.enqueue('summarize_chats', user)
+
+
+def summarize_session(session):
+    """Folds everything before the recent window into the summary. Returns False if another worker did first."""
+    from .ai_service import summarize_conversation
+
+    older = list(unsummarized(session).order_by('-id')[settings.CHAT_RECENT_MESSAGES:])
+    if not older:
+        return False
+    older.reverse()
+
+    summary = summarize_conversation(session.summary, [as_prompt_message(msg) for msg in older])
+    return bool(ChatSession.objects.filter(
+        pk=session.pk, summary_last_message_id=session.summary_last_message_id
+    ).update(summary=summary, summary_last_message_id=older[-1].id, summary_updated_at=timezone.now()))
+
+
+def summarize_sessions(user):
+    """Refreshes every session of `user` that has outgrown its recent window."""
+    threshold = settings.CHAT_RECENT_MESSAGES + settings.CHAT_SUMMARY_EVERY
+    sessions = ChatSession.objects.filter(user=user).annotate(
+        pending=Count('messages', filter=Q(messages__id__gt=F('summary_last_message_id')))
+    ).filter(pending__gte=threshold)
+    for session in sessions:
+        summarize_session(session)
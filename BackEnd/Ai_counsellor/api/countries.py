@@ -0,0 +1,129 @@
+"""
+Country name resolution for free-text user input.
+
+`StudyGoal.preferred_countries` is typed by users ("UK, usa & Deutschland").
+`CountryResolver` precompiles canonical names, ISO codes, aliases and common
+misspellings into a single dict so each lookup is O(1); only unknown spellings
+fall back to a (memoized) edit-distance match.
+"""
+import heapq
+import re
+from functools import lru_cache
+
+from .university_search import edit_distance, fold, max_typos
+
+# Canonical name (as used in University_data) -> ISO 3166 codes, aliases and misspellings
+COUNTRY_ALIASES = {
+    "Australia": ["AU", "AUS", "aussie", "australlia", "austrailia", "australi"],
+    "Austria": ["AT", "AUT", "osterreich", "oesterreich", "austira"],
+    "Canada": ["CA", "CAN", "canda", "cananda", "kanada"],
+    "China": ["CN", "CHN", "prc", "peoples republic of china", "mainland china", "chaina"],
+    "Denmark": ["DK", "DNK", "danmark", "denmakr"],
+    "France": ["FR", "FRA", "frence", "frnace"],
+    "Germany": ["DE", "DEU", "deutschland", "german", "germnay", "germeny", "gemany"],
+    "Ireland": ["IE", "IRL", "eire", "republic of ireland", "irland"],
+    "Italy": ["IT", "ITA", "italia", "itly"],
+    "Japan": ["JP", "JPN", "nippon", "japn"],
+    "Malaysia": ["MY", "MYS", "malasia", "malaysa"],
+    "Netherlands": ["NL", "NLD", "holland", "the netherlands", "nederland", "netherland", "netherlnds"],
+    "New Zealand": ["NZ", "NZL", "newzealand", "new zeland", "aotearoa"],
+    "Singapore": ["SG", "SGP", "singapur", "singapoor", "singpore"],
+    "Spain": ["ES", "ESP", "espana", "spian"],
+    "Sweden": ["SE", "SWE", "sverige", "swedan"],
+    "Switzerland": ["CH", "CHE", "swiss", "schweiz", "suisse", "switzerlnd", "switerland"],
+    "United Kingdom": [
+        "GB", "GBR", "UK", "great britain", "britain", "england", "scotland", "wales",
+        "northern ireland", "united kingdon", "untied kingdom",
+    ],
+    "United States": [
+        "US", "USA", "united states of america", "america", "states", "the states",
+        "unites states", "united state", "untied states",
+    ],
+    "United Arab Emirates": ["AE", "ARE", "UAE", "emirates"],
+    "South Korea": ["KR", "KOR", "korea", "republic of korea"],
+    "India": ["IN", "IND", "bharat"],
+}
+
+_SEPARATORS = re.compile(r'\s*(?:,|;|/|\||&|\band\b)\s*')
+
+
+def country_key(text):
+    """Lowercase, strip accents and punctuation: "U.S.A." -> "usa"."""
+    text = fold(text).replace('.', '')
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def split_countries(value):
+    """Splits "UK, Canada and Germany" into its parts."""
+    return [part for part in _SEPARATORS.split(value or '') if part.strip()]
+
+
+class CountryResolver:
+    def __init__(self, countries=(), codes=None):
+        """
+        `countries` are canonical names (extra names are added to the alias table),
+        `codes` maps ISO alpha-2 codes to canonical names.
+        """
+        lookup = {}
+        for canonical, aliases in COUNTRY_ALIASES.items():
+            lookup[country_key(canonical)] = canonical
+            for alias in aliases:
+                lookup[country_key(alias)] = canonical
+        for canonical in countries:
+            lookup.setdefault(country_key(canonical), canonical)
+        for code, canonical in (codes or {}).items():
+            lookup.setdefault(country_key(code), canonical)
+        self._lookup = lookup
+        self._fuzzy = lru_cache(maxsize=1024)(self._fuzzy_match)
+
+    def _fuzzy_match(self, key):
+        limit = max_typos(key)
+        if not limit:
+            return None
+        best, best_distance = None, limit + 1
+        for alias, canonical in self._lookup.items():
+            distance = edit_distance(key, alias, limit)
+            if distance < best_distance:
+                best, best_distance = canonical, distance
+        return best
+
+    def resolve(self, text):
+        """Canonical country name for `text`, or None if it is not recognised."""
+        key = country_key(text)
+        if not key:
+            return None
+        return self._lookup.get(key) or self._fuzzy(key)
+
+    def resolve_all(self, value):
+        """Canonical names for a comma-separated list, in the user's order, without duplicates."""
+        resolved = (self.resolve(part) for part in split_countries(value))
+        return list(dict.fromkeys(c for c in resolved if c))
+
+
+def allocate_quotas(sizes, total):
+    """
+    Splits `total` slots over countries with `sizes` available universities.
+    Earlier (more preferred) countries get the remainder; slots a small country
+    cannot fill are handed to the others.
+    """
+    quotas = [0] * len(sizes)
+    remaining = total
+    open_slots = [i for i, size in enumerate(sizes) if size > 0]
+    while remaining > 0 and open_slots:
+        share, extra = divmod(remaining, len(open_slots))
+        for position, i in enumerate(open_slots):
+            wanted = share + (1 if position < extra else 0)
+            given = min(wanted, sizes[i] - quotas[i])
+            quotas[i] += given
+            remaining -= given
+        open_slots = [i for i in open_slots if quotas[i] < sizes[i]]
+    return quotas
+
+
+def merge_by_rank(pools, total, rank_key):
+    """
+    k-way merge of rank-sorted `pools`, taking at most each pool's quota.
+    Returns up to `total` records, ordered by rank.
+    """
+    quotas = allocate_quotas([len(pool) for pool in pools], total)
+    return list(heapq.merge(*(pool[:quota] for pool, quota in zip(pools, quotas)), key=rank_key))
@@ -0,0 +1,213 @@
+"""
+Local Dream/Target/Safe classification.
+
+Every university in the candidate pool (views.recommendation_pool) gets an
+admission-fit score in one vectorized NumPy pass:
+
+    fit = profile strength - selectivity - budget penalty
+
+- Profile strength (0-1) blends GPA, IELTS/TOEFL and GRE/GMAT, each normalized.
+- Selectivity (0-1) blends the university's rank percentile within the whole
+  catalog with its percentile within the scored set (unranked universities
+  count as the least selective), so a pool of only top-ranked universities
+  still spreads from reach to safe.
+- The budget penalty compares the user's budget with the yearly cost tier of
+  the university's country.
+
+Categories are cut at fixed margins around zero, then moved so each holds at
+least MIN_CATEGORY_SHARE of the scored set. The LLM is no longer needed to
+classify; with RECOMMENDATION_LLM_REASONS it only rewrites the reason/risks
+text (see ai_service.get_university_recommendations).
+"""
+import re
+import weakref
+
+import numpy as np
+
+from .ai_service import parse_gpa, exam_state
+from .catalog import DEFAULT_RANK, get_catalog, normalize, rank_of
+
+CATEGORIES = ("Dream", "Target", "Safe")
+DREAM_BELOW = -0.15  # fit under this: a reach
+SAFE_ABOVE = 0.15  # fit over this: comfortably admissible
+MIN_CATEGORY_SHARE = 0.15  # Of the scored set, per category (the lowest fits become Dream, the highest Safe)
+CATALOG_SELECTIVITY_WEIGHT = 0.3  # The rest is the rank percentile within the scored set
+
+PROFILE_WEIGHTS = {'gpa': 0.6, 'english': 0.25, 'tests': 0.15}
+BUDGET_PENALTY = 0.2  # Largest fit reduction for a country well over budget
+
+# Typical yearly tuition + living cost in INR (the onboarding budget currency)
+TIER_COSTS = {1: 1_200_000, 2: 2_500_000, 3: 4_500_000}
+_TIER_COST_ARRAY = np.array([0.0] + [TIER_COSTS[tier] for tier in sorted(TIER_COSTS)])
+TIER_LABELS = {1: 'Low', 2: 'Medium', 3: 'High'}
+COUNTRY_COST_TIERS = {
+    'united states': 3, 'united kingdom': 3, 'australia': 3, 'singapore': 3,
+    'canada': 2, 'new zealand': 2, 'ireland': 2, 'netherlands': 2, 'switzerland': 2,
+    'denmark': 2, 'sweden': 2, 'japan': 2,
+    'germany': 1, 'france': 1, 'italy': 1, 'spain': 1, 'austria': 1, 'china': 1, 'malaysia': 1,
+}
+DEFAULT_COST_TIER = 2
+USD_TO_INR = 85
+
+ACCEPTANCE = {"Dream": 'Low', "Target": 'Medium', "Safe": 'High'}
+REASONS = {
+    "Dream": "Admits are usually stronger than your current profile.",
+    "Target": "Your profile is close to its typical admit level.",
+    "Safe": "Your profile is comfortably above its typical admit level.",
+}
+RISKS = {
+    "Dream": "A reach: apply alongside Target and Safe choices.",
+    "Target": "Competitive: a strong SOP and test scores make the difference.",
+    "Safe": "Low admission risk.",
+}
+
+# Sorted ranks of the ranked universities, per catalog snapshot
+_catalog_ranks = weakref.WeakKeyDictionary()
+
+
+def _clip01(value):
+    return min(1.0, max(0.0, value))
+
+
+def _score(text):
+    match = re.search(r'\d+(?:\.\d+)?', str(text or ''))
+    return float(match.group()) if match else None
+
+
+def english_level(exams):
+    """IELTS band or TOEFL score normalized to 0-1; the exam status when there is no score."""
+    score = _score(exams.get('ielts_toefl_score'))
+    if score is not None and score <= 9:
+        return _clip01((score - 5.5) / 2.5)  # IELTS 5.5 .. 8.0
+    if score is not None and score <= 120:
+        return _clip01((score - 70) / 45)  # TOEFL 70 .. 115
+    return {'done': 0.6, 'planned': 0.4}.get(exam_state(exams.get('ielts_toefl_status')), 0.3)
+
+
+def test_level(exams):
+    """GRE or GMAT score normalized to 0-1; the exam status when there is no score."""
+    score = _score(exams.get('gre_gmat_score'))
+    if score is not None and 260 <= score <= 340:
+        return _clip01((score - 290) / 40)  # GRE
+    if score is not None and 200 <= score <= 800:
+        return _clip01((score - 500) / 250)  # GMAT
+    # Often optional, so not having one is only a mild minus
+    return {'done': 0.6}.get(exam_state(exams.get('gre_gmat_status')), 0.4)
+
+
+def profile_strength(profile_data):
+    """Weighted 0-1 strength of the academic profile."""
+    academic = profile_data.get('academic_background') or {}
+    exams = profile_data.get('exams_readiness') or {}
+    gpa = parse_gpa(academic.get('gpa'))
+    levels = {
+        'gpa': 0.5 if gpa is None else _clip01((gpa - 2.5) / 1.5),  # 2.5 .. 4.0
+        'english': english_level(exams),
+        'tests': test_level(exams),
+    }
+    return sum(PROFILE_WEIGHTS[name] * level for name, level in levels.items())
+
+
+def parse_budget(budget_range):
+    """Upper end of a budget range ("₹5,00,000 - ₹10,00,000", "$40k") in INR, or None."""
+    text = str(budget_range or '').lower()
+    amounts = []
+    for number, suffix in re.findall(r'(\d[\d,]*(?:\.\d+)?)\s*(k|l|lakh|lakhs|cr|crore|m)?\b', text):
+        amount = float(number.replace(',', ''))
+        amount *= {'k': 1e3, 'l': 1e5, 'lakh': 1e5, 'lakhs': 1e5, 'cr': 1e7, 'crore': 1e7, 'm': 1e6}.get(suffix, 1)
+        amounts.append(amount)
+    if not amounts:
+        return None
+    budget = max(amounts)
+    # Under a lakh is not a plausible yearly budget in rupees: read unmarked small amounts as USD
+    if '$' in text or 'usd' in text or ('₹' not in text and budget < 100_000):
+        budget *= USD_TO_INR
+    return budget
+
+
+def cost_tier(country):
+    return COUNTRY_COST_TIERS.get(normalize(country), DEFAULT_COST_TIER)
+
+
+def _ranked_ranks(catalog):
+    ranks = _catalog_ranks.get(catalog)
+    if ranks is None:
+        ranks = np.array([rank_of(u) for u in catalog.ranked if rank_of(u) < DEFAULT_RANK], dtype=float)
+        _catalog_ranks[catalog] = ranks
+    return ranks
+
+
+def _rank_percentile(ranks, reference):
+    """1 for the best of the sorted `reference` ranks down to 0, and 0 for unranked."""
+    if not len(reference):
+        return np.zeros(len(ranks))
+    percentile = np.searchsorted(reference, ranks, side='left') / len(reference)
+    return np.where(ranks >= DEFAULT_RANK, 0.0, 1.0 - percentile)
+
+
+def selectivity(universities, catalog):
+    """0-1 per university: the catalog-wide and the within-set rank percentile, blended."""
+    ranks = np.array([rank_of(u) for u in universities], dtype=float)
+    in_set = np.sort(ranks[ranks < DEFAULT_RANK])
+    return (
+        CATALOG_SELECTIVITY_WEIGHT * _rank_percentile(ranks, _ranked_ranks(catalog))
+        + (1 - CATALOG_SELECTIVITY_WEIGHT) * _rank_percentile(ranks, in_set)
+    )
+
+
+def score_universities(profile_data, universities, catalog=None):
+    """Fit score for every university, as one array (higher is more admissible)."""
+    catalog = catalog or get_catalog()
+    tiers = np.array([cost_tier(u.get('country')) for u in universities], dtype=int)
+
+    budget = parse_budget((profile_data.get('budget') or {}).get('budget_range'))
+    if budget is None:
+        penalty = np.zeros(len(tiers))
+    else:
+        penalty = BUDGET_PENALTY * np.clip(1 - budget / _TIER_COST_ARRAY[tiers], 0, 1)
+
+    return profile_strength(profile_data) - selectivity(universities, catalog) - penalty
+
+
+def category_labels(fits):
+    """0/1/2 (Dream/Target/Safe) per fit: the fixed cuts, moved so no category falls below its share."""
+    n = len(fits)
+    labels = np.ones(n, dtype=int)
+    if not n:
+        return labels
+    minimum = max(1, int(n * MIN_CATEGORY_SHARE)) if n >= len(CATEGORIES) else 0
+    dreams = min(max(int((fits < DREAM_BELOW).sum()), minimum), n - 2 * minimum)
+    safes = min(max(int((fits > SAFE_ABOVE).sum()), minimum), n - dreams - minimum)
+
+    order = np.argsort(fits, kind='stable')
+    labels[order[:dreams]] = 0
+    labels[order[n - safes:]] = 2
+    return labels
+
+
+def classify_universities(profile_data, universities, catalog=None):
+    """
+    {Dream, Target, Safe} lists of {name, reason, risks, cost, acceptance_chance,
+    fit_score}, in the order of `universities`. Same shape as the LLM output.
+    """
+    fits = score_universities(profile_data, universities, catalog)
+    labels = category_labels(fits)
+    budget = parse_budget((profile_data.get('budget') or {}).get('budget_range'))
+
+    result = {category: [] for category in CATEGORIES}
+    for uni, fit, label in zip(universities, fits.tolist(), labels.tolist()):
+        category = CATEGORIES[label]
+        tier = cost_tier(uni.get('country'))
+        rank = rank_of(uni)
+        risks = RISKS[category]
+        if budget is not None and budget < TIER_COSTS[tier]:
+            risks += " Likely above your budget."
+        result[category].append({
+            "name": uni.get('name'),
+            "reason": (f"Ranked #{rank}. " if rank < DEFAULT_RANK else "Unranked. ") + REASONS[category],
+            "risks": risks,
+            "cost": TIER_LABELS[tier],
+            "acceptance_chance": ACCEPTANCE[category],
+            "fit_score": round(fit, 3),
+        })
+    return result
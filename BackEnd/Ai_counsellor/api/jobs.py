@@ -0,0 +1,165 @@
+"""
+Local job queue on the `BackgroundJob` table.
+
+Views call `enqueue(...)` and return immediately; `manage.py run_jobs` claims
+due jobs and runs them. Properties:
+
+- Coalescing: at most one pending job per (kind, user). Enqueueing again pushes
+  its `run_after` back (debounce), capped at JOB_COALESCE_MAX_SECONDS after the
+  first request, so ten rapid profile edits become one generation.
+- Claiming is a conditional UPDATE, so several workers can share the table.
+- Visibility timeout: a claimed job is hidden until `locked_until`; if its
+  worker dies, another worker picks it up again after that.
+- Failed runs are retried with exponential backoff up to `max_attempts`.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+def generate_tasks(user):
+    """AI task generation for one user (the work views used to do inline)."""
+    from .ai_service import generate_tasks_for_user
+    from .views import task_generation_context, save_generated_tasks
+
+    context = task_generation_context(user)
+    if context is None:
+        return
+    # raise_errors: a provider failure should be retried, not saved as a fallback task
+    generated_titles = generate_tasks_for_user(
+        context['profile_data'], context['current_stage'], context['existing_tasks'], raise_errors=True
+    )
+    save_generated_tasks(user, generated_titles, context['active_tasks_count'], context['existing_titles'])
+
+
+def summarize_chats(user):
+    """Refreshes the rolling summaries of the user's long chat sessions."""
+    from .chat_summary import summarize_sessions
+    summarize_sessions(user)
+
+
+HANDLERS = {
+    'generate_tasks': generate_tasks,
+    'summarize_chats': summarize_chats,
+}
+
+
+def enqueue(kind, user, delay=None):
+    """Schedules `kind` for `user`, merging with a job that is already pending."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    delay = timedelta(seconds=settings.JOB_COALESCE_SECONDS if delay is None else delay)
+
+    if settings.JOBS_RUN_INLINE:
+        # Development/tests without a worker process
+        try:
+            HANDLERS[kind](user)
+        except Exception:
+            logger.exception("Inline job %s failed", kind)
+        return None
+
+    while True:
+        now = timezone.now()
+        job = BackgroundJob.objects.filter(kind=kind, user=user, status=PENDING).first()
+        if job is not None:
+            latest = job.created_at + timedelta(seconds=settings.JOB_COALESCE_MAX_SECONDS)
+            run_after = max(job.run_after, min(now + delay, latest))
+            # Only if it is still pending; a worker may have claimed it meanwhile
+            if BackgroundJob.objects.filter(pk=job.pk, status=PENDING).update(run_after=run_after):
+                return job
+            continue
+        try:
+            with transaction.atomic():
+                return BackgroundJob.objects.create(kind=kind, user=user, run_after=now + delay)
+        except IntegrityError:
+            continue  # Another request created the pending job first
+
+
+def _claimable(now):
+    return Q(status=PENDING, run_after__lte=now) | Q(status=RUNNING, locked_until__lt=now)
+
+
+def claim_next(worker_id):
+    """Marks the next due job as running for `worker_id` and returns it, or None."""
+    now = timezone.now()
+    candidates = (
+        BackgroundJob.objects.filter(_claimable(now))
+        .order_by('run_after')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = BackgroundJob.objects.filter(_claimable(now), pk=pk).update(
+            status=RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT),
+            locked_by=worker_id,
+            updated_at=now,
+        )
+        if claimed:
+            return BackgroundJob.objects.select_related('user').get(pk=pk)
+    return None
+
+
+def run_job(job, worker_id):
+    """Runs a claimed job and records the outcome."""
+    # Only touch the row while we still own it (the visibility timeout may have expired)
+    owned = BackgroundJob.objects.filter(pk=job.pk, status=RUNNING, locked_by=worker_id)
+    try:
+        HANDLERS[job.kind](job.user)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %s", job.pk, job.kind, job.attempts)
+        if job.attempts >= job.max_attempts:
+            owned.update(status=FAILED, locked_until=None, last_error=str(e), updated_at=timezone.now())
+            return False
+        retry_at = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        try:
+            with transaction.atomic():
+                owned.update(status=PENDING, run_after=retry_at, locked_until=None, last_error=str(e), updated_at=timezone.now())
+        except IntegrityError:
+            # A newer pending job for this user exists and will redo the work
+            owned.update(status=FAILED, locked_until=None, last_error=f"Superseded after: {e}", updated_at=timezone.now())
+        return False
+
+    owned.update(status=DONE, locked_until=None, last_error='', updated_at=timezone.now())
+    return True
+
+
+def run_pending(worker_id=None, limit=None):
+    """Runs due jobs until none are left (or `limit` is reached). Returns how many ran."""
+    worker_id = worker_id or default_worker_id()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next(worker_id)
+        if job is None:
+            break
+        run_job(job, worker_id)
+        count += 1
+    return count
+
+
+def purge_finished(older_than_days):
+    """Deletes done/failed jobs last updated more than `older_than_days` ago."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = BackgroundJob.objects.filter(status__in=[DONE, FAILED], updated_at__lt=cutoff).delete()
+    return deleted
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_task_generation(user):
+    """Views call this instead of generating tasks inside the request."""
+    return enqueue('generate_tasks', user)
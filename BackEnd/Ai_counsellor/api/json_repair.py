@@ -0,0 +1,81 @@
+"""
+Tolerant JSON parsing for LLM output.
+
+Models that are asked for JSON still return near-misses: the object wrapped in
+a ```json fence or in prose, trailing commas, "smart" quotes, Python literals,
+or a reply cut off by the token limit. `loads_tolerant` fixes those up and
+parses what is left instead of asking the model again.
+"""
+import json
+import re
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# A "smart" quote standing where JSON needs a delimiter: after { [ , : or before : , } ]
+_SMART_DELIMITER = re.compile(r'(?<=[{\[,:])(\s*)[“”‘’]|[“”‘’](?=\s*[:,}\]])')
+_PYTHON_LITERALS = re.compile(r'([:\[,]\s*)(True|False|None)(?=\s*[,}\]])')
+_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+_decoder = json.JSONDecoder()
+
+
+def _outermost(text):
+    """From the first { or [ on, so prose before the JSON is ignored."""
+    starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+    return text[min(starts):] if starts else text
+
+
+def _close_truncated(text):
+    """Closes the string, arrays and objects left open by a cut-off reply."""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    # A dangling `"key":` or `,` cannot be completed; drop it before closing
+    text = re.sub(r'(,|:)\s*$', '', text.rstrip())
+    text = re.sub(r'([{,])\s*"[^"]*"\s*$', r'\1', text)
+    return text + ''.join(reversed(stack))
+
+
+def _straighten_quotes(text):
+    """Smart quotes used as JSON delimiters become "; those inside strings stay."""
+    return _SMART_DELIMITER.sub(lambda m: (m.group(1) or '') + '"', text)
+
+
+def _candidates(text):
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    text = _outermost(text.strip())
+    yield text
+
+    text = _straighten_quotes(text)
+    yield text
+
+    cleaned = _TRAILING_COMMA.sub(r'\1', _PYTHON_LITERALS.sub(lambda m: m.group(1) + _LITERALS[m.group(2)], text))
+    yield cleaned
+    yield _TRAILING_COMMA.sub(r'\1', _close_truncated(cleaned))
+
+
+def loads_tolerant(text):
+    """json.loads with the common LLM formatting mistakes repaired. Raises ValueError."""
+    error = None
+    for candidate in _candidates(text or ''):
+        try:
+            # raw_decode stops after the first value, so prose after the JSON is ignored
+            return _decoder.raw_decode(candidate)[0]
+        except ValueError as e:
+            error = e
+    raise ValueError(f"Unrepairable JSON: {error}")
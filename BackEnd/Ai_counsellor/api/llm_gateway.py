@@ -0,0 +1,205 @@
+"""
+Single entry point for every LLM request made by the backend.
+
+Owns one process-wide OpenAI-compatible client (Groq) on a keep-alive
+connection pool with explicit connect/read timeouts, retries transient
+failures with jittered exponential backoff, and caps how many provider calls
+a process has in flight. Callers get the message text (or a stream of deltas)
+back, or an `LLMError`.
+
+The async functions (`achat_completion`) are used by the ASGI views. They run on
+an `AsyncOpenAI` client with its own, larger concurrency cap, since an awaiting
+request costs a coroutine rather than a worker thread.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import openai
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+
+# Errors worth retrying: network problems, timeouts, 429 and 5xx
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,  # Includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMError(Exception):
+    """The provider could not produce a completion (after retries)."""
+
+
+_client = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+
+# asyncio primitives belong to one event loop, so the async client and cap are kept per loop
+_async_clients = weakref.WeakKeyDictionary()
+_async_slots = weakref.WeakKeyDictionary()
+
+
+def _timeout():
+    return httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+
+
+def _request_kwargs(messages, temperature, response_format, model, **extra):
+    kwargs = {
+        'model': model or settings.GROQ_MODEL,
+        'messages': messages,
+        'temperature': temperature,
+        **extra,
+    }
+    if response_format:
+        kwargs['response_format'] = response_format
+    return kwargs
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_POOL_SIZE,
+                        max_keepalive_connections=settings.LLM_POOL_SIZE,
+                        keepalive_expiry=60,
+                    ),
+                    timeout=_timeout(),
+                )
+                _client = OpenAI(
+                    base_url=settings.LLM_BASE_URL,
+                    api_key=settings.GROQ_API_KEY,
+                    http_client=http_client,
+                    max_retries=0,  # Retries are handled below, with jitter
+                )
+    return _client
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform(0, base * 2**attempt), capped."""
+    return random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+def chat_completion(messages, temperature, response_format=None, model=None):
+    """
+    Returns the text of the first choice.
+    Raises LLMError when no slot frees up in time or the call keeps failing.
+    """
+    kwargs = _request_kwargs(messages, temperature, response_format, model)
+
+    if not _slots.acquire(timeout=settings.LLM_QUEUE_TIMEOUT):
+        raise LLMError("Too many concurrent LLM requests")
+    try:
+        attempt = 0
+        while True:
+            try:
+                completion = get_client().chat.completions.create(**kwargs)
+                return completion.choices[0].message.content
+            except TRANSIENT_ERRORS as e:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise LLMError(str(e)) from e
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+            except openai.OpenAIError as e:
+                raise LLMError(str(e)) from e
+    finally:
+        _slots.release()
+
+
+def stream_completion(messages, temperature, response_format=None, model=None):
+    """
+    Yields content deltas as the provider produces them.
+    Transient errors are retried only until the first chunk arrives; after that a
+    failure raises LLMError mid-stream.
+    """
+    kwargs = _request_kwargs(messages, temperature, response_format, model, stream=True)
+
+    if not _slots.acquire(timeout=settings.LLM_QUEUE_TIMEOUT):
+        raise LLMError("Too many concurrent LLM requests")
+    try:
+        attempt = 0
+        while True:
+            try:
+                stream = get_client().chat.completions.create(**kwargs)
+                break
+            except TRANSIENT_ERRORS as e:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise LLMError(str(e)) from e
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+            except openai.OpenAIError as e:
+                raise LLMError(str(e)) from e
+
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except openai.OpenAIError as e:
+            raise LLMError(str(e)) from e
+        finally:
+            stream.close()
+    finally:
+        _slots.release()
+
+
+def _async_slots_for_loop():
+    loop = asyncio.get_running_loop()
+    slots = _async_slots.get(loop)
+    if slots is None:
+        slots = _async_slots[loop] = asyncio.Semaphore(settings.LLM_ASYNC_MAX_CONCURRENCY)
+    return slots
+
+
+def get_async_client():
+    """This loop's AsyncOpenAI client, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_ASYNC_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.LLM_POOL_SIZE,
+                keepalive_expiry=60,
+            ),
+            timeout=_timeout(),
+        )
+        client = AsyncOpenAI(
+            base_url=settings.LLM_BASE_URL,
+            api_key=settings.GROQ_API_KEY,
+            http_client=http_client,
+            max_retries=0,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def achat_completion(messages, temperature, response_format=None, model=None):
+    """Async variant of chat_completion; same retry policy, per-loop concurrency cap."""
+    kwargs = _request_kwargs(messages, temperature, response_format, model)
+    slots = _async_slots_for_loop()
+
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=settings.LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMError("Too many concurrent LLM requests")
+    try:
+        attempt = 0
+        while True:
+            try:
+                completion = await get_async_client().chat.completions.create(**kwargs)
+                return completion.choices[0].message.content
+            except TRANSIENT_ERRORS as e:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise LLMError(str(e)) from e
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+            except openai.OpenAIError as e:
+                raise LLMError(str(e)) from e
+    finally:
+        slots.release()
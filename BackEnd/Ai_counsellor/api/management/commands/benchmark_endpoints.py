@@ -0,0 +1,122 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from api.chat_context import load_chat_context
+from api.models import ChatMessage, ChatSession, ShortlistedUniversity, Task, User
+
+SESSIONS_PER_USER = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds other users' chat messages and tasks in steps (up to a million by default) and prints the "
+        "latency of the per-user endpoints for one probe user at each step. They should stay flat. "
+        "Runs in a transaction that is rolled back: nothing is left in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steps', default='10000,100000,1000000',
+                            help="Comma-separated totals of seeded messages (and tasks) to measure at")
+        parser.add_argument('--users', type=int, default=2000, help="Background users the rows are spread over")
+        parser.add_argument('--repeat', type=int, default=20, help="Requests per endpoint and step (the median is reported)")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        try:
+            steps = sorted(int(step) for step in options['steps'].split(','))
+        except ValueError:
+            raise CommandError("--steps must be comma-separated integers")
+
+        with transaction.atomic():
+            probe, session = self.seed_probe()
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(probe)
+            endpoints = {
+                'GET /api/tasks/': lambda: client.get('/api/tasks/'),
+                'GET /api/chat/sessions/': lambda: client.get('/api/chat/sessions/'),
+                'GET /api/chat/history/': lambda: client.get(f'/api/chat/history/?session_id={session.id}'),
+                'GET /api/universities/locked/': lambda: client.get('/api/universities/locked/'),
+                'GET /api/onboarding/status/': lambda: client.get('/api/onboarding/status/'),
+                'chat context (no LLM)': lambda: load_chat_context(probe, session, "Which should I lock?"),
+            }
+
+            sessions = self.seed_background_users(options['users'])
+            results = {name: [] for name in endpoints}
+            seeded = 0
+            for step in steps:
+                self.seed_rows(sessions, step - seeded, options['batch_size'])
+                seeded = step
+                self.analyze()
+                for name, request in endpoints.items():
+                    results[name].append(self.median_ms(request, options['repeat']))
+                self.stdout.write(f"Measured at {step:,} messages and tasks")
+
+            self.report(steps, results)
+            transaction.set_rollback(True)
+
+    def seed_probe(self):
+        probe = User.objects.create_user(email='benchmark-probe@example.com', password=None, onboarding_step='Completed')
+        Task.objects.bulk_create([Task(user=probe, title=f"Probe task {i}", is_completed=i % 3 == 0) for i in range(20)])
+        ShortlistedUniversity.objects.bulk_create([
+            ShortlistedUniversity(user=probe, university_name=f"Probe University {i}", country='Germany', category='Target', is_locked=i < 3)
+            for i in range(10)
+        ])
+        sessions = ChatSession.objects.bulk_create([ChatSession(user=probe, title=f"Probe chat {i}") for i in range(3)])
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user=probe, session=session, sender='user' if i % 2 else 'ai', message=f"Probe message {i}")
+            for session in sessions for i in range(50)
+        ])
+        return probe, sessions[0]
+
+    def seed_background_users(self, count):
+        users = User.objects.bulk_create([
+            User(email=f"benchmark-{i}@example.com", password='!', onboarding_step='Completed') for i in range(count)
+        ])
+        return ChatSession.objects.bulk_create([
+            ChatSession(user=user, title="Benchmark chat") for user in users for _ in range(SESSIONS_PER_USER)
+        ])
+
+    def seed_rows(self, sessions, count, batch_size):
+        """`count` more messages and tasks, spread evenly over the background sessions and their users."""
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            batch = [sessions[(start + i) % len(sessions)] for i in range(size)]
+            ChatMessage.objects.bulk_create([
+                ChatMessage(user_id=s.user_id, session=s, sender='user' if i % 2 else 'ai', message="Benchmark message")
+                for i, s in enumerate(batch)
+            ])
+            Task.objects.bulk_create([
+                Task(user_id=s.user_id, title="Benchmark task", is_completed=i % 2 == 0)
+                for i, s in enumerate(batch)
+            ])
+
+    def analyze(self):
+        # Fresh planner statistics, as a long-running database would have
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def run(self, request):
+        response = request()
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)  # Streamed responses read their rows here
+
+    def median_ms(self, request, repeat):
+        self.run(request)  # Warm-up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.run(request)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def report(self, steps, results):
+        width = max(len(name) for name in results)
+        self.stdout.write("")
+        self.stdout.write(f"{'median ms':<{width}}" + ''.join(f"{step:>12,}" for step in steps))
+        for name, timings in results.items():
+            self.stdout.write(f"{name:<{width}}" + ''.join(f"{ms:>12.2f}" for ms in timings))
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
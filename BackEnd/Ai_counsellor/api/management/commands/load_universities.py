@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api.catalog import get_catalog, normalize
+from api.models import University, ShortlistedUniversity
+
+
+class Command(BaseCommand):
+    help = "Bulk-loads the JSON university catalog into the University table and links existing shortlists to it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Catalog JSON file (defaults to University_data/university_data_by_rank.json)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        catalog = get_catalog(options.get('path'))
+
+        # The file lists a few universities twice within a country; keep the best-ranked copy
+        # (records are rank-sorted) so one upsert batch never touches a row twice.
+        unique = {}
+        for uni in catalog.ranked:
+            unique.setdefault((uni.get('name'), uni.get('country')), uni)
+
+        universities = [
+            University(
+                name=uni.get('name'),
+                country=uni.get('country'),
+                alpha_two_code=uni.get('alpha_two_code') or '',
+                state_province=uni.get('state-province'),
+                rank=uni.get('rank') or 9999,
+                domains=list(uni.get('domains', ())),
+                web_pages=list(uni.get('web_pages', ())),
+                logo=uni.get('logo'),
+            )
+            for uni in unique.values()
+        ]
+
+        with transaction.atomic():
+            # Upsert on (name, country) so re-running the command refreshes ranks and metadata
+            University.objects.bulk_create(
+                universities,
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['name', 'country'],
+                update_fields=['alpha_two_code', 'state_province', 'rank', 'domains', 'web_pages', 'logo'],
+            )
+            linked = self.link_shortlists(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {len(universities)} universities, linked {linked} shortlist entries."
+        ))
+
+    def link_shortlists(self, batch_size):
+        """
+        Points legacy name-only shortlist rows at their University row and drops
+        their `data` snapshot, which the University row now holds. Rows that
+        cannot be matched keep the snapshot.
+        """
+        by_name = {}
+        by_name_country = {}
+        for pk, name, country in University.objects.order_by('-rank').values_list('id', 'name', 'country'):
+            # Iterating worst rank first leaves the best-ranked match for duplicate names
+            by_name[normalize(name)] = pk
+            by_name_country[(normalize(name), normalize(country))] = pk
+
+        def match(name, country):
+            key = normalize(name)
+            return by_name_country.get((key, normalize(country))) or by_name.get(key)
+
+        pending = []
+        entries = ShortlistedUniversity.objects.filter(Q(university__isnull=True) | Q(data__isnull=False))
+        for entry in entries.only('id', 'university_id', 'university_name', 'country', 'data'):
+            if entry.university_id is None:
+                snapshot = entry.data or {}
+                entry.university_id = match(entry.university_name, entry.country) or (
+                    match(snapshot['name'], snapshot.get('country') or entry.country) if snapshot.get('name') else None
+                )
+            if entry.university_id:
+                entry.data = None
+                pending.append(entry)
+
+        ShortlistedUniversity.objects.bulk_update(pending, ['university', 'data'], batch_size=batch_size)
+        return len(pending)
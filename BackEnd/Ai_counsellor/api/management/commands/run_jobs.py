@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs (AI task generation). Keeps polling unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs that are due now, then exit")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--keep-days', type=int, default=7, help="Delete finished jobs older than this")
+
+    def handle(self, *args, **options):
+        worker_id = jobs.default_worker_id()
+        self.stdout.write(f"Job worker {worker_id} started")
+
+        last_purge = 0
+        while True:
+            ran = jobs.run_pending(worker_id)
+            if ran:
+                self.stdout.write(f"Ran {ran} job(s)")
+
+            if time.monotonic() - last_purge > 3600:
+                jobs.purge_finished(options['keep_days'])
+                last_purge = time.monotonic()
+
+            if options['once']:
+                break
+            if not ran:
+                time.sleep(options['poll_interval'])
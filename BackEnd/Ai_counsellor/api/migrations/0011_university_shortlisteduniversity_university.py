@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_user_has_visited_explore_user_has_visited_shortlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='University',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('country', models.CharField(max_length=100)),
+                ('alpha_two_code', models.CharField(blank=True, max_length=2)),
+                ('state_province', models.CharField(blank=True, max_length=255, null=True)),
+                ('rank', models.PositiveIntegerField(default=9999)),
+                ('domains', models.JSONField(blank=True, default=list)),
+                ('web_pages', models.JSONField(blank=True, default=list)),
+                ('logo', models.URLField(blank=True, max_length=500, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Universities',
+                'ordering': ['rank'],
+                'indexes': [models.Index(fields=['country', 'rank'], name='university_country_rank_idx'), models.Index(fields=['name'], name='university_name_idx')],
+                'constraints': [models.UniqueConstraint(fields=('name', 'country'), name='unique_university_per_country')],
+            },
+        ),
+        migrations.AddField(
+            model_name='shortlisteduniversity',
+            name='university',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shortlisted_by', to='api.university'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profileaicache',
+            name='recommendations_fingerprint',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='profileaicache',
+            name='recommendations_lease_key',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='profileaicache',
+            name='recommendations_lease_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='profileaicache',
+            name='recommendations_lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
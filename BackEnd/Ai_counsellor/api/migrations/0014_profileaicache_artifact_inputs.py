@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_profileaicache_recommendation_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profileaicache',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profileaicache',
+            name='recommendations_inputs',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='profileaicache',
+            name='strength_inputs',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def dedupe_shortlists(apps, schema_editor):
+    """
+    Keeps one row per (user, university_name) before the unique constraint is added:
+    the locked one if any, else the newest, linked to the catalog row if any duplicate was.
+    """
+    ShortlistedUniversity = apps.get_model('api', 'ShortlistedUniversity')
+    duplicated = (
+        ShortlistedUniversity.objects.values('user_id', 'university_name')
+        .annotate(copies=Count('id')).filter(copies__gt=1)
+    )
+    for group in duplicated.iterator():
+        rows = list(ShortlistedUniversity.objects.filter(
+            user_id=group['user_id'], university_name=group['university_name']
+        ).order_by('-is_locked', '-id'))
+        keep, extra = rows[0], rows[1:]
+        if keep.university_id is None:
+            keep.university_id = next((row.university_id for row in extra if row.university_id), None)
+            keep.save(update_fields=['university'])
+        ShortlistedUniversity.objects.filter(pk__in=[row.pk for row in extra]).delete()
+
+
+class Migration(migrations.Migration):
+    """
+    Before 0017 adds unique_shortlist_per_user. Kept apart because PostgreSQL
+    cannot ALTER a table with pending (deferred FK) trigger events from these
+    updates in the same transaction.
+    """
+
+    dependencies = [
+        ('api', '0015_chatsession_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_shortlists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_dedupe_shortlists'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'created_at'], name='chatmsg_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user', 'updated_at'], name='chatsession_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shortlisteduniversity',
+            index=models.Index(fields=['user', 'is_locked'], name='shortlist_user_locked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'is_completed', 'created_at'], name='task_user_done_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shortlisteduniversity',
+            constraint=models.UniqueConstraint(fields=('user', 'university_name'), name='unique_shortlist_per_user'),
+        ),
+    ]
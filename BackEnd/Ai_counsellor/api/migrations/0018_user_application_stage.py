@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q
+
+
+def backfill_stage(apps, schema_editor):
+    """Same rules as application_stage.compute_stage, as three bulk updates."""
+    User = apps.get_model('api', 'User')
+    ShortlistedUniversity = apps.get_model('api', 'ShortlistedUniversity')
+    completed = User.objects.filter(onboarding_step='Completed')
+    completed.update(application_stage=2)
+    completed.filter(Q(has_visited_explore=True) | Q(has_visited_shortlist=True)).update(application_stage=3)
+    completed.filter(Exists(ShortlistedUniversity.objects.filter(user=OuterRef('pk'), is_locked=True))).update(application_stage=4)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='application_stage',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(backfill_stage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_user_application_stage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'id'], name='chatmsg_session_id_idx'),
+        ),
+    ]
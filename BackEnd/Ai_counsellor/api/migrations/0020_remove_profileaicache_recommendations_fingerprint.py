@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:47
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_chatmessage_session_id_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='profileaicache',
+            name='recommendations_fingerprint',
+        ),
+    ]
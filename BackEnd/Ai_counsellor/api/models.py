@@ -40,6 +40,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     has_visited_shortlist = models.BooleanField(default=False)
     has_visited_explore = models.BooleanField(default=False)
+    # Derived from the fields above and locked universities; kept current by api/application_stage.py
+    application_stage = models.PositiveSmallIntegerField(default=1)
 
 
     USERNAME_FIELD = 'email'  # Set email as the unique identifier
@@ -69,6 +71,12 @@ class Task(models.Model):
     task_type = models.CharField(max_length=20, choices=TASK_TYPES, default='PERSONAL')
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Dashboard list (active first, newest first) and active-task counts
+            models.Index(fields=['user', 'is_completed', 'created_at'], name='task_user_done_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.title}"
 
@@ -121,6 +129,48 @@ class ExamsAndReadiness(models.Model):
     def __str__(self):
         return f"{self.user.email} - Exams & Readiness"
 
+class University(models.Model):
+    """
+    Normalized copy of the JSON catalog, populated by `manage.py load_universities`.
+    Shortlists reference it by foreign key; catalog browsing and filtering still
+    use the in-memory indexes in catalog.py.
+    """
+    name = models.CharField(max_length=255)
+    country = models.CharField(max_length=100)
+    alpha_two_code = models.CharField(max_length=2, blank=True)
+    state_province = models.CharField(max_length=255, blank=True, null=True)
+    rank = models.PositiveIntegerField(default=9999)
+    domains = models.JSONField(default=list, blank=True)
+    web_pages = models.JSONField(default=list, blank=True)
+    logo = models.URLField(max_length=500, blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = 'Universities'
+        ordering = ['rank']
+        indexes = [
+            models.Index(fields=['country', 'rank'], name='university_country_rank_idx'),
+            models.Index(fields=['name'], name='university_name_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'country'], name='unique_university_per_country'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.country})"
+
+    def as_catalog_dict(self):
+        """Same shape as a record in University_data/university_data_by_rank.json."""
+        return {
+            'name': self.name,
+            'country': self.country,
+            'alpha_two_code': self.alpha_two_code,
+            'state-province': self.state_province,
+            'rank': self.rank,
+            'domains': self.domains,
+            'web_pages': self.web_pages,
+            'logo': self.logo,
+        }
+
 class ShortlistedUniversity(models.Model):
     CATEGORY_CHOICES = [
         ('Dream', 'Dream'),
@@ -129,13 +179,25 @@ class ShortlistedUniversity(models.Model):
     ]
 
     user = models.ForeignKey(User, related_name="shortlisted_universities", on_delete=models.CASCADE)
+    # Null only for names that are not (yet) in the University table
+    university = models.ForeignKey(University, related_name="shortlisted_by", on_delete=models.SET_NULL, null=True, blank=True)
     university_name = models.CharField(max_length=255)
     country = models.CharField(max_length=100)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     is_locked = models.BooleanField(default=False)
-    data = models.JSONField(null=True, blank=True)  # Snapshot of university data
+    # Legacy per-user snapshot of the university; load_universities clears it once the row is linked
+    data = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_locked'], name='shortlist_user_locked_idx'),
+        ]
+        constraints = [
+            # Also the (user, university_name) lookup index; makes concurrent update_or_create safe
+            models.UniqueConstraint(fields=['user', 'university_name'], name='unique_shortlist_per_user'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.university_name} ({self.category})"
 
@@ -143,7 +205,16 @@ class ShortlistedUniversity(models.Model):
 class ProfileAICache(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='ai_cache')
     recommendations = models.JSONField(null=True, blank=True)
+    # Single-flight lease (api/single_flight.py): who is generating which fingerprint, until when
+    recommendations_lease_key = models.CharField(max_length=100, blank=True)
+    recommendations_lease_token = models.CharField(max_length=32, blank=True)
+    recommendations_lease_until = models.DateTimeField(null=True, blank=True)
     strength_data = models.JSONField(null=True, blank=True)
+    # Fingerprints of the profile fields each artifact depends on (api/ai_dependencies.py)
+    recommendations_inputs = models.CharField(max_length=64, blank=True)
+    strength_inputs = models.CharField(max_length=64, blank=True)
+    # Goes up by one whenever a write changes any AI input
+    profile_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -154,9 +225,18 @@ class ChatSession(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, related_name="chat_sessions", on_delete=models.CASCADE)
     title = models.CharField(max_length=255, default="New Chat")
+    # Rolling summary of the older messages (see api/chat_summary.py)
+    summary = models.TextField(blank=True)
+    summary_last_message_id = models.PositiveBigIntegerField(default=0) # Newest message folded into `summary`
+    summary_updated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='chatsession_user_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.title}"
 
@@ -173,5 +253,56 @@ class ChatMessage(models.Model):
     suggested_actions = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'created_at'], name='chatmsg_session_created_idx'),
+            models.Index(fields=['session', 'id'], name='chatmsg_session_id_idx'),  # History pages and prompt history read by id
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.sender}: {self.message[:20]}"
+
+
+class BackgroundJob(models.Model):
+    """
+    Row in the local job queue (see api/jobs.py, run by `manage.py run_jobs`).
+    At most one job per (kind, user) is pending, so bursts of edits coalesce.
+    """
+    KIND_CHOICES = [
+        ('generate_tasks', 'Generate tasks'),
+        ('summarize_chats', 'Summarize chats'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    user = models.ForeignKey(User, related_name="background_jobs", on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    run_after = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Visibility timeout: a running job whose worker died is picked up again after this
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'user'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_per_user',
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.user.email} - {self.sender}: {self.message[:20]}"
\ No newline at end of file
+        return f"{self.kind} for {self.user.email} ({self.status})"
@@ -0,0 +1,130 @@
+"""
+Token-budgeted prompt assembly.
+
+A prompt is a set of named sections. Required sections (instructions, the
+user's message) are always kept whole; the others are filled item by item in
+priority order until the budget is spent, and a section that lost items says
+how many were left out. Single oversized items (a pasted essay in the chat
+history) are cut to `max_item_tokens` first. The result reports the tokens each
+section used, so input size stays flat however much state a user accumulates.
+
+Tokens are counted with tiktoken when it is installed and by a local
+approximation otherwise; the approximation errs on the high side.
+"""
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+TIKTOKEN_ENCODING = 'o200k_base'
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception:
+            _encoder = None  # Not installed, or the encoding could not be loaded
+    return _encoder
+
+
+def count_tokens(text):
+    """Token count of `text`: exact with tiktoken, else ~1 token per 4 characters of a word or symbol."""
+    text = text or ''
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return sum(1 + (len(piece) - 1) // 4 for piece in _PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts `text` to about `max_tokens`, marking the cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoder = _get_encoder()
+    if encoder is not None:
+        return encoder.decode(encoder.encode(text)[:max_tokens]) + '…'
+    pieces = list(_PIECE_RE.finditer(text))
+    used = 0
+    for piece in pieces:
+        used += 1 + (len(piece.group()) - 1) // 4
+        if used > max_tokens:
+            return text[:piece.start()].rstrip() + '…'
+    return text
+
+
+class Section:
+    """
+    One part of a prompt.
+    `items` are in keep-first order; `render` turns the kept ones into text.
+    Lower `priority` is filled first; required sections are never cut.
+    """
+
+    def __init__(self, name, items, render=None, render_item=json.dumps, priority=0, required=False, max_item_tokens=None):
+        self.name = name
+        self.items = list(items)
+        self.render = render or (lambda kept, omitted: json.dumps(kept) + (f" (+{omitted} more not shown)" if omitted else ''))
+        self.render_item = render_item
+        self.priority = priority
+        self.required = required
+        self.max_item_tokens = max_item_tokens
+
+
+def _compact(section, item):
+    """Caps a single item at max_item_tokens (text items, or the 'content' of message dicts)."""
+    limit = section.max_item_tokens
+    if limit is None:
+        return item
+    if isinstance(item, str):
+        return truncate_to_tokens(item, limit)
+    if isinstance(item, dict) and isinstance(item.get('content'), str):
+        return {**item, 'content': truncate_to_tokens(item['content'], limit)}
+    return item
+
+
+def fit_sections(sections, budget):
+    """
+    Returns {name: {'items': kept, 'text': rendered, 'tokens': n, 'omitted': k}}
+    plus a 'total' token count, keeping the sum within `budget` where the
+    required sections allow it.
+    """
+    result = {}
+    remaining = budget
+
+    for section in sorted(sections, key=lambda s: (not s.required, s.priority)):
+        items = [_compact(section, item) for item in section.items]
+        if section.required:
+            kept = items
+        else:
+            # Section wrapper with nothing in it, then items while they fit
+            used = count_tokens(section.render([], 0))
+            kept = []
+            for item in items:
+                cost = count_tokens(section.render_item(item)) + 1  # + separator
+                if used + cost > remaining:
+                    break
+                kept.append(item)
+                used += cost
+            while kept and count_tokens(section.render(kept, len(items) - len(kept))) > remaining:
+                kept.pop()  # The omission note itself did not fit
+
+        omitted = len(items) - len(kept)
+        text = section.render(kept, omitted)
+        tokens = count_tokens(text)
+        remaining -= tokens
+        result[section.name] = {'items': kept, 'text': text, 'tokens': tokens, 'omitted': omitted}
+
+    result['total'] = budget - remaining
+    return result
+
+
+def usage_report(fitted):
+    """{section: tokens, ..., 'total': n} for logging."""
+    return {name: (part['tokens'] if name != 'total' else part) for name, part in fitted.items()}
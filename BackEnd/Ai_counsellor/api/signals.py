@@ -2,6 +2,9 @@ from allauth.socialaccount.signals import social_account_added
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
+from .application_stage import stage_changed
+from .jobs import enqueue_task_generation
+
 @receiver(social_account_added)
 def social_account_added_callback(request, sociallogin, **kwargs):
     # Check if the login is from Google
@@ -16,3 +19,10 @@ def social_account_added_callback(request, sociallogin, **kwargs):
         user.first_name = first_name
         user.last_name = last_name
         user.save()
+
+
+@receiver(stage_changed)
+def stage_changed_callback(sender, user, old_stage, new_stage, **kwargs):
+    # Stage-specific guidance: regenerate the AI tasks for the new stage
+    if new_stage > 1:
+        enqueue_task_generation(user)
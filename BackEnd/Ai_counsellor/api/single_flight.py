@@ -0,0 +1,160 @@
+"""
+Single-flight recommendation generation, coordinated through ProfileAICache.
+
+Opening the shortlist page in several tabs (or several workers serving the same
+user) used to start one full recommendation graph run per request. Now the
+first request takes a lease on the user's cache row for the fingerprint of the
+inputs it is generating from; everyone else waits briefly for that result and
+otherwise gets a 202 to poll with. Properties:
+
+- The lease is a conditional UPDATE, so it works across processes and hosts.
+- A lease expires after RECOMMENDATION_LEASE_SECONDS, so a crashed owner does
+  not block the user forever.
+- A request with a different fingerprint (the profile changed mid-run) takes
+  the lease over, and the old owner's write is discarded.
+- Profile writes that change recommendation inputs clear the lease token too,
+  for the same reason (ai_dependencies.py).
+"""
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProfileAICache
+
+POLL_INTERVAL = 0.25  # Seconds between checks while waiting on another request
+
+
+def get_ai_cache(user):
+    """get_or_create that survives two first requests racing to create the row."""
+    try:
+        with transaction.atomic():
+            return ProfileAICache.objects.get_or_create(user=user)[0]
+    except IntegrityError:
+        return ProfileAICache.objects.get(user=user)
+
+
+async def aget_ai_cache(user):
+    try:
+        return (await ProfileAICache.objects.aget_or_create(user=user))[0]
+    except IntegrityError:
+        return await ProfileAICache.objects.aget(user=user)
+
+
+def _lease_is_free(fingerprint, now):
+    return (
+        Q(recommendations_lease_until__isnull=True)
+        | Q(recommendations_lease_until__lt=now)
+        | ~Q(recommendations_lease_key=fingerprint)
+    )
+
+
+def _lease_update(fingerprint, token, now):
+    return {
+        'recommendations_lease_key': fingerprint,
+        'recommendations_lease_token': token,
+        'recommendations_lease_until': now + timedelta(seconds=settings.RECOMMENDATION_LEASE_SECONDS),
+    }
+
+
+def acquire_recommendations_lease(user, fingerprint):
+    """Returns a token if this request should generate, or None if another one already is."""
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    won = ProfileAICache.objects.filter(_lease_is_free(fingerprint, now), user=user).update(
+        **_lease_update(fingerprint, token, now)
+    )
+    return token if won else None
+
+
+async def aacquire_recommendations_lease(user, fingerprint):
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    won = await ProfileAICache.objects.filter(_lease_is_free(fingerprint, now), user=user).aupdate(
+        **_lease_update(fingerprint, token, now)
+    )
+    return token if won else None
+
+
+def _ours(user, token, inputs):
+    # Still our lease, and the profile inputs are still those we generated from
+    return ProfileAICache.objects.filter(
+        Q(recommendations_inputs=inputs) | Q(recommendations_inputs=''),
+        user=user,
+        recommendations_lease_token=token,
+    )
+
+
+def _completed(recommendations, inputs):
+    return {
+        'recommendations': recommendations,
+        'recommendations_inputs': inputs,
+        'recommendations_lease_token': '',
+        'recommendations_lease_until': None,
+        'updated_at': timezone.now(),
+    }
+
+
+def complete_recommendations(user, token, recommendations, inputs):
+    """
+    Stores the result if the lease is still ours. `inputs` is the
+    ai_dependencies fingerprint of the profile it was generated from.
+    Returns False if the result was discarded.
+    """
+    return bool(_ours(user, token, inputs).update(**_completed(recommendations, inputs)))
+
+
+async def acomplete_recommendations(user, token, recommendations, inputs):
+    return bool(await _ours(user, token, inputs).aupdate(**_completed(recommendations, inputs)))
+
+
+_RELEASED = {'recommendations_lease_token': '', 'recommendations_lease_until': None}
+
+
+def release_recommendations_lease(user, token):
+    """Gives the lease up after a failed run so the next request can retry at once."""
+    ProfileAICache.objects.filter(user=user, recommendations_lease_token=token).update(**_RELEASED)
+
+
+async def arelease_recommendations_lease(user, token):
+    await ProfileAICache.objects.filter(user=user, recommendations_lease_token=token).aupdate(**_RELEASED)
+
+
+def _wait_state(user):
+    return ProfileAICache.objects.filter(user=user).values(
+        'recommendations', 'recommendations_lease_until'
+    )
+
+
+def _finished(row, now):
+    """(done, recommendations): done once a result landed or the owner gave up."""
+    if row is None:
+        return True, None
+    if row['recommendations']:
+        return True, row['recommendations']
+    lease_until = row['recommendations_lease_until']
+    return lease_until is None or lease_until < now, None
+
+
+def wait_for_recommendations(user, timeout):
+    """Polls for another request's result. Returns it, or None if it did not arrive in time."""
+    deadline = time.monotonic() + timeout
+    while True:
+        done, recommendations = _finished(_wait_state(user).first(), timezone.now())
+        if done or time.monotonic() >= deadline:
+            return recommendations
+        time.sleep(POLL_INTERVAL)
+
+
+async def await_recommendations(user, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        done, recommendations = _finished(await _wait_state(user).afirst(), timezone.now())
+        if done or time.monotonic() >= deadline:
+            return recommendations
+        await asyncio.sleep(POLL_INTERVAL)
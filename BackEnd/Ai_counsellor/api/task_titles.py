@@ -0,0 +1,56 @@
+"""
+Local duplicate detection for generated task titles.
+
+The LLM only sees a bounded slice of the user's task history
+(TASK_PROMPT_HISTORY titles), so it will sometimes suggest a task the user
+already had. `TaskTitleIndex` catches those without asking the database per
+title: titles are normalized ("Register for the IELTS!" -> "ielts register")
+and compared exactly, then fuzzily with difflib (TASK_DUPLICATE_CUTOFF).
+"""
+import difflib
+import re
+
+from django.conf import settings
+
+from .university_search import fold
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Words that do not change what a task is about
+STOPWORDS = frozenset({'a', 'an', 'the', 'for', 'to', 'of', 'and', 'your', 'my', 'on', 'in', 'with'})
+
+
+def normalize_title(title):
+    """Accent- and case-folded content words, sorted so word order does not matter."""
+    return ' '.join(sorted(w for w in _WORD_RE.findall(fold(title)) if w not in STOPWORDS))
+
+
+class TaskTitleIndex:
+    """Normalized titles of a user's tasks; `add` as new ones are accepted."""
+
+    def __init__(self, titles=()):
+        self._keys = set()
+        for title in titles:
+            self.add(title)
+
+    def add(self, title):
+        self._keys.add(normalize_title(title))
+
+    def __contains__(self, title):
+        key = normalize_title(title)
+        if not key:
+            return True # Nothing left to do
+        if key in self._keys:
+            return True
+        return bool(difflib.get_close_matches(key, self._keys, n=1, cutoff=settings.TASK_DUPLICATE_CUTOFF))
+
+    def new_titles(self, titles, limit):
+        """Up to `limit` of `titles` that duplicate neither the index nor each other (added to the index)."""
+        accepted = []
+        for title in titles:
+            if len(accepted) >= limit:
+                break
+            if not isinstance(title, str) or title in self:
+                continue
+            self.add(title)
+            accepted.append(title.strip())
+        return accepted
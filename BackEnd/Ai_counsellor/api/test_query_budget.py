@@ -0,0 +1,335 @@
+"""
+Query budgets for every route in api/urls.py.
+
+Each test drives one endpoint as a heavy user (full profile, dozens of tasks,
+shortlisted universities, chat sessions and messages) with a local fake LLM,
+and fails if the request issues more database queries than its budget or
+spends more than MAX_QUERY_SECONDS in them. The budgets are the current
+counts: a new query in a hot path fails here, and when a change legitimately
+needs one, the budget is raised in the same commit.
+
+Run with QUERY_BUDGET_REPORT=1 to print the measured count of every endpoint.
+"""
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import ai_cache
+from api.application_stage import refresh_application_stage
+from api.models import (
+    AcademicBackground, Budget, ChatMessage, ChatSession, ExamsAndReadiness,
+    ShortlistedUniversity, StudyGoal, Task, University, User,
+)
+
+MAX_QUERY_SECONDS = 0.5  # Total database time of one request
+TASKS, SESSIONS, MESSAGES_PER_SESSION, SHORTLISTED = 40, 5, 40, 25
+
+_measured = {}
+
+
+class FakeLLM:
+    """Answers each prompt kind the way the provider would, without the network."""
+
+    def reply(self, messages):
+        system = messages[0]['content']
+        if 'JSON arrays' in system:
+            return json.dumps(["Book the IELTS", "Ask for recommendation letters", "Draft SOP"])
+        if 'conversation summaries' in system:
+            return "The student is comparing German and Canadian universities."
+        if 'outputs only JSON' in system:
+            return json.dumps({"academics": "Strong", "exams": "In Progress", "sop": "Draft"})
+        if 'Counsellor' in system:
+            return json.dumps({"response": "Start with your SOP.", "suggested_actions": ["a", "b", "c"]})
+        return json.dumps({"Dream": [], "Target": [], "Safe": []})
+
+    def create(self, **kwargs):
+        text = self.reply(kwargs['messages'])
+        if kwargs.get('stream'):
+            chunks = []
+            for i in range(0, len(text), 16):
+                chunk = MagicMock()
+                chunk.choices[0].delta.content = text[i:i + 16]
+                chunks.append(chunk)
+            stream = MagicMock()
+            stream.__iter__.return_value = iter(chunks)
+            return stream
+        completion = MagicMock()
+        completion.choices[0].message.content = text
+        return completion
+
+    async def acreate(self, **kwargs):
+        return self.create(**kwargs)
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='heavy@example.com', password='pw', first_name='Heavy', onboarding_step='Completed',
+            has_visited_explore=True,
+        )
+        AcademicBackground.objects.create(user=cls.user, education_level='Bachelors', degree_major='Computer Science', graduation_year=2024, gpa='3.6')
+        StudyGoal.objects.create(user=cls.user, intended_degree='Masters', field_of_study='AI', target_intake='Fall 2026', preferred_countries='Germany, Canada')
+        Budget.objects.create(user=cls.user, budget_range='₹20L - ₹30L', funding_plan='Self-funded')
+        ExamsAndReadiness.objects.create(user=cls.user, ielts_toefl_status='Completed', ielts_toefl_score='7.5', gre_gmat_status='Planning', sop_status='Draft')
+
+        Task.objects.bulk_create([
+            Task(user=cls.user, title=f"Task {i}", is_completed=i % 2 == 0) for i in range(TASKS)
+        ])
+        cls.task = Task.objects.filter(user=cls.user).first()
+
+        universities = University.objects.bulk_create([
+            University(name=f"University {i}", country='Germany' if i % 2 else 'Canada', rank=i + 1) for i in range(SHORTLISTED)
+        ])
+        ShortlistedUniversity.objects.bulk_create([
+            ShortlistedUniversity(
+                user=cls.user, university=uni, university_name=uni.name, country=uni.country,
+                category='Target', is_locked=i < 3,
+            )
+            for i, uni in enumerate(universities)
+        ])
+        cls.university = universities[5]
+
+        cls.sessions = ChatSession.objects.bulk_create([ChatSession(user=cls.user, title=f"Chat {i}") for i in range(SESSIONS)])
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user=cls.user, session=session, sender='user' if i % 2 else 'ai', message=f"Message {i}")
+            for session in cls.sessions for i in range(MESSAGES_PER_SESSION)
+        ])
+        cls.session = cls.sessions[0]
+        refresh_application_stage(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if os.environ.get('QUERY_BUDGET_REPORT'):
+            for name, count in sorted(_measured.items()):
+                print(f"{name}: {count}")
+
+    def setUp(self):
+        cache.clear()
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.async_client = AsyncClient()
+        self.auth = {'Authorization': f'Bearer {self.access}'}
+
+        fake = FakeLLM()
+        client = MagicMock()
+        client.chat.completions.create.side_effect = fake.create
+        async_client = MagicMock()
+        async_client.chat.completions.create = AsyncMock(side_effect=fake.acreate)
+        for target, value in (('api.llm_gateway._client', client), ('api.llm_gateway.get_async_client', MagicMock(return_value=async_client))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assertQueryBudget(self, max_queries, request, expected_status=200):
+        """Runs `request()` and checks its status, query count and query time. Returns the response."""
+        with CaptureQueriesContext(connection) as captured:
+            response = request()
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)  # The stream's queries count too
+
+        self.assertEqual(response.status_code, expected_status, getattr(response, 'content', b'')[:500])
+        queries = captured.captured_queries
+        _measured[self._testMethodName] = len(queries)
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f"{len(queries)} queries, budget {max_queries}:\n" + "\n".join(q['sql'] for q in queries),
+        )
+        seconds = sum(float(q['time']) for q in queries)
+        self.assertLess(seconds, MAX_QUERY_SECONDS, f"{seconds:.3f}s spent in queries")
+        return response
+
+    # Auth
+
+    def test_register(self):
+        data = {'email': 'new@example.com', 'password': 'pw-123456', 'first_name': 'New', 'last_name': 'User'}
+        self.assertQueryBudget(4, lambda: self.client.post('/api/register/', data, format='json'), 201)
+
+    def test_login(self):
+        data = {'email': 'heavy@example.com', 'password': 'pw'}
+        self.assertQueryBudget(3, lambda: self.client.post('/api/login/', data, format='json'))
+
+    def test_token(self):
+        data = {'email': 'heavy@example.com', 'password': 'pw'}
+        self.assertQueryBudget(1, lambda: self.client.post('/api/token/', data, format='json'))
+
+    def test_token_refresh(self):
+        data = {'refresh': str(RefreshToken.for_user(self.user))}
+        self.assertQueryBudget(1, lambda: self.client.post('/api/token/refresh/', data, format='json'))
+
+    def test_google_callback(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertQueryBudget(0, lambda: client.get('/api/auth/google/callback/'), 302)
+
+    def test_forgot_password(self):
+        data = {'email': 'heavy@example.com'}
+        self.assertQueryBudget(3, lambda: self.client.post('/api/forgot-password/', data, format='json'))
+
+    def test_reset_password(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = default_token_generator.make_token(self.user)
+        url = f'/api/reset-password/?uid={uid}&token={token}'
+        self.assertQueryBudget(3, lambda: self.client.post(url, {'password': 'new-pw-123456'}, format='json'))
+
+    # Profile and onboarding
+
+    def test_profile_get(self):
+        self.assertQueryBudget(5, lambda: self.client.get('/api/profile/'))
+
+    def test_profile_put(self):
+        data = {'first_name': 'Renamed'}
+        self.assertQueryBudget(16, lambda: self.client.put('/api/profile/', data, format='json'))
+
+    def test_onboarding_get(self):
+        for section in ('academic', 'study-goal', 'budget', 'exams'):
+            with self.subTest(section=section):
+                self.assertQueryBudget(2, lambda: self.client.get(f'/api/onboarding/{section}/'))
+
+    def test_onboarding_post(self):
+        sections = {
+            'academic': {'education_level': 'Masters', 'degree_major': 'Data Science', 'graduation_year': 2025, 'gpa': '3.8'},
+            'study-goal': {'intended_degree': 'PhD', 'field_of_study': 'AI', 'target_intake': 'Fall 2027', 'preferred_countries': 'Canada'},
+            'budget': {'budget_range': '₹30L - ₹40L', 'funding_plan': 'Loan-dependent'},
+            'exams': {'ielts_toefl_status': 'Completed', 'ielts_toefl_score': '8', 'gre_gmat_status': 'Completed', 'sop_status': 'Ready'},
+        }
+        for section, data in sections.items():
+            with self.subTest(section=section):
+                self.assertQueryBudget(15, lambda: self.client.post(f'/api/onboarding/{section}/', data, format='json'), 201)
+
+    def test_onboarding_status(self):
+        self.assertQueryBudget(2, lambda: self.client.get('/api/onboarding/status/'))
+
+    def test_record_visit(self):
+        self.assertQueryBudget(3, lambda: self.client.post('/api/onboarding/record-visit/', {'section': 'shortlist'}, format='json'))
+
+    # Tasks and dashboard
+
+    def test_tasks_list(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/tasks/'))
+
+    def test_task_create(self):
+        self.assertQueryBudget(2, lambda: self.client.post('/api/tasks/', {'title': 'Call the embassy'}, format='json'), 201)
+
+    def test_task_update(self):
+        self.assertQueryBudget(3, lambda: self.client.patch(f'/api/tasks/{self.task.id}/', {'is_completed': True}, format='json'))
+
+    def test_task_delete(self):
+        self.assertQueryBudget(3, lambda: self.client.delete(f'/api/tasks/{self.task.id}/'))
+
+    def test_generate_tasks(self):
+        Task.objects.filter(user=self.user).delete()
+        self.assertQueryBudget(8, lambda: self.client.post('/api/tasks/generate/'), 201)
+
+    def test_profile_strength(self):
+        self.assertQueryBudget(5, lambda: self.client.get('/api/dashboard/strength/'))
+
+    def test_profile_strength_enriched(self):
+        self.assertQueryBudget(12, lambda: self.client.get('/api/dashboard/strength/?enrich=true'))
+
+    # Universities
+
+    def test_top_20(self):
+        self.assertQueryBudget(0, lambda: self.client.get('/api/university/top-20/'))
+
+    def test_recommendations_generated(self):
+        self.assertQueryBudget(14, lambda: self.client.get('/api/universities/recommendations/'))
+
+    def test_recommendations_cached(self):
+        self.client.get('/api/universities/recommendations/')
+        response = self.assertQueryBudget(6, lambda: self.client.get('/api/universities/recommendations/'))
+        self.assertTrue(response.json()['cached'])
+
+    def test_evaluate(self):
+        self.assertQueryBudget(1, lambda: self.client.get('/api/universities/evaluate/?name=University%205'))
+
+    def test_shortlist_lock(self):
+        data = {'action': 'lock', 'university_name': self.university.name, 'country': self.university.country, 'category': 'Target'}
+        self.assertQueryBudget(9, lambda: self.client.post('/api/universities/shortlist/', data, format='json'))
+
+    def test_shortlist_unlock(self):
+        data = {'action': 'unlock', 'university_name': self.university.name, 'country': self.university.country}
+        self.assertQueryBudget(4, lambda: self.client.post('/api/universities/shortlist/', data, format='json'))
+
+    def test_locked_universities(self):
+        self.assertQueryBudget(2, lambda: self.client.get('/api/universities/locked/'))
+
+    def test_all_universities(self):
+        self.assertQueryBudget(2, lambda: self.client.get('/api/universities/all/?search=university'))
+
+    def test_autocomplete(self):
+        self.assertQueryBudget(1, lambda: self.client.get('/api/universities/autocomplete/?q=tech'))
+
+    # Chat
+
+    def test_chat_sessions_list(self):
+        self.assertQueryBudget(2, lambda: self.client.get('/api/chat/sessions/'))
+
+    def test_chat_session_create(self):
+        self.assertQueryBudget(4, lambda: self.client.post('/api/chat/sessions/'), 201)
+
+    def test_chat_session_rename(self):
+        url = f'/api/chat/sessions/{self.session.id}/'
+        self.assertQueryBudget(3, lambda: self.client.patch(url, {'title': 'Germany'}, format='json'))
+
+    def test_chat_session_delete(self):
+        url = f'/api/chat/sessions/{self.session.id}/'
+        self.assertQueryBudget(4, lambda: self.client.delete(url))
+
+    def test_chat(self):
+        data = {'message': 'Which should I lock?', 'session_id': str(self.session.id)}
+        self.assertQueryBudget(15, lambda: self.client.post('/api/chat/', data, format='json'))
+
+    def test_chat_stream(self):
+        data = {'message': 'Which should I lock?', 'session_id': str(self.session.id)}
+        self.assertQueryBudget(15, lambda: self.client.post('/api/chat/stream/', data, format='json'))
+
+    def test_chat_history(self):
+        self.assertQueryBudget(4, lambda: self.client.get(f'/api/chat/history/?session_id={self.session.id}'))
+
+    # Admin
+
+    def test_admin_changelists(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw')
+        client = APIClient()
+        client.force_login(admin)
+        for model in ('task', 'shortlisteduniversity', 'backgroundjob', 'profileaicache'):
+            with self.subTest(model=model):
+                self.assertQueryBudget(5, lambda: client.get(f'/admin/api/{model}/'))
+
+    # Async variants
+
+    def async_post(self, path, data=None):
+        return async_to_sync(self.async_client.post)(path, data or {}, content_type='application/json', headers=self.auth)
+
+    def async_get(self, path):
+        return async_to_sync(self.async_client.get)(path, headers=self.auth)
+
+    def test_async_chat(self):
+        data = {'message': 'Which should I lock?', 'session_id': str(self.session.id)}
+        self.assertQueryBudget(15, lambda: self.async_post('/api/async/chat/', data))
+
+    def test_async_profile_strength(self):
+        self.assertQueryBudget(5, lambda: self.async_get('/api/async/dashboard/strength/'))
+
+    def test_async_recommendations(self):
+        self.assertQueryBudget(13, lambda: self.async_get('/api/async/universities/recommendations/'))
+
+    def test_async_generate_tasks(self):
+        Task.objects.filter(user=self.user).delete()
+        self.assertQueryBudget(8, lambda: self.async_post('/api/async/tasks/generate/'), 201)
@@ -2,13 +2,47 @@ from django.test import TestCase
 
 # Create your tests here.
 
+import asyncio
+import importlib
 import json
-from django.test import SimpleTestCase
-from unittest.mock import patch, MagicMock
-from api.ai_service import evaluate_profile_strength, generate_tasks_for_user
+import os
+import threading
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, AsyncClient
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.test import APIClient
+from unittest.mock import patch, MagicMock, AsyncMock
+import httpx
+import openai
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError
+from django.test import override_settings
+from api import ai_cache, ai_dependencies, application_stage, chat_context, chat_history, chat_summary, jobs, llm_gateway, single_flight
+from api.ai_service import chat_with_counselor, evaluate_profile_strength, generate_tasks_for_user, compute_profile_strength, parse_gpa
+from api.catalog import get_catalog, encode_cursor, decode_cursor, filter_key, InvalidCursor
+from api.university_search import UniversitySearchIndex
+from api.countries import CountryResolver, allocate_quotas, merge_by_rank
+from api.top_universities import Top20Pages, choose_encoding
+from api.chat_stream import ResponseFieldExtractor
+from api.json_repair import loads_tolerant
+from api.ai_graph import run_recommendation_graph, arun_recommendation_graph, build_chat_prompt, build_chat_messages
+from api import fit_scoring, prompt_budget
+from api.ai_service import get_university_recommendations
+from api.models import User, ShortlistedUniversity, University, ChatMessage, ChatSession, BackgroundJob, ProfileAICache, Budget, Task
+from api.serializers import ProfileSerializer
+from api import views
+from api.task_titles import TaskTitleIndex
+from api.application_stage import refresh_application_stage
+from api.views import recommendation_pool
 
 class AIServiceTests(SimpleTestCase):
     def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
         self.profile_data = {
             'academic_background': {
                 'education_level': 'Bachelors',
@@ -33,7 +67,7 @@ class AIServiceTests(SimpleTestCase):
             }
         }
 
-    @patch('api.ai_service.client')
+    @patch('api.llm_gateway._client')
     def test_evaluate_profile_strength(self, mock_client):
         # Mock response
         mock_completion = MagicMock()
@@ -57,7 +91,7 @@ class AIServiceTests(SimpleTestCase):
         call_args = mock_client.chat.completions.create.call_args
         self.assertIn("USA", call_args[1]['messages'][1]['content']) # Check if country is passed
 
-    @patch('api.ai_service.client')
+    @patch('api.llm_gateway._client')
     def test_generate_tasks_for_user(self, mock_client):
         # Mock response
         expected_tasks = ["Register for GRE", "Refine SOP", "Shortlist Universities"]
@@ -82,3 +116,1273 @@ class AIServiceTests(SimpleTestCase):
         self.assertIn("USA", prompt_content)
         self.assertIn("Self-funded", prompt_content)
         self.assertIn("GOAL", prompt_content) # Verify new goal part is present
+
+
+    @patch('api.llm_gateway._client')
+    def test_identical_inputs_share_one_llm_call(self, mock_client):
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = json.dumps({"academics": "Strong", "exams": "In Progress", "sop": "Draft"})
+        mock_client.chat.completions.create.return_value = mock_completion
+
+        other_user = json.loads(json.dumps(self.profile_data))
+        other_user['budget']['budget_range'] = '10k-20k' # Not part of the strength prompt
+
+        first = evaluate_profile_strength(self.profile_data)
+        second = evaluate_profile_strength(other_user)
+
+        self.assertEqual(first, second)
+        mock_client.chat.completions.create.assert_called_once()
+
+    @patch('api.llm_gateway._client')
+    def test_failed_calls_are_not_cached(self, mock_client):
+        mock_client.chat.completions.create.side_effect = RuntimeError("provider down")
+        self.assertEqual(generate_tasks_for_user(self.profile_data, "Building Profile"), ["Complete your profile information"])
+
+        mock_client.chat.completions.create.side_effect = None
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = json.dumps(["Register for GRE"])
+        mock_client.chat.completions.create.return_value = mock_completion
+        self.assertEqual(generate_tasks_for_user(self.profile_data, "Building Profile"), ["Register for GRE"])
+
+    @patch('api.llm_gateway._client')
+    def test_resent_chat_message_gets_a_fresh_reply(self, mock_client):
+        replies = [json.dumps({"response": text, "suggested_actions": []}) for text in ("First answer", "Second answer")]
+        mock_client.chat.completions.create.side_effect = [MagicMock(choices=[MagicMock(message=MagicMock(content=r))]) for r in replies]
+
+        first = chat_with_counselor(self.profile_data, [], "Which country suits me?")
+        second = chat_with_counselor(self.profile_data, [], "Which country suits me?")
+
+        self.assertEqual((first['response'], second['response']), ("First answer", "Second answer"))
+
+    def test_cache_key_covers_model_temperature_and_prompt_version(self):
+        base = ai_cache.make_key('tasks', {'a': 1, 'b': 2}, 'model-a', 0.7, 1)
+        self.assertEqual(base, ai_cache.make_key('tasks', {'b': 2, 'a': 1}, 'model-a', 0.7, 1))
+        self.assertNotEqual(base, ai_cache.make_key('tasks', {'a': 1, 'b': 2}, 'model-b', 0.7, 1))
+        self.assertNotEqual(base, ai_cache.make_key('tasks', {'a': 1, 'b': 2}, 'model-a', 0.3, 1))
+        self.assertNotEqual(base, ai_cache.make_key('tasks', {'a': 1, 'b': 2}, 'model-a', 0.7, 2))
+
+class LLMGatewayTests(SimpleTestCase):
+    def completion(self, text):
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = text
+        return mock_completion
+
+    @patch('api.llm_gateway.time.sleep')
+    @patch('api.llm_gateway._client')
+    def test_transient_errors_are_retried(self, mock_client, mock_sleep):
+        request = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+        mock_client.chat.completions.create.side_effect = [
+            openai.APIConnectionError(request=request),
+            openai.APITimeoutError(request=request),
+            self.completion('{"ok": true}'),
+        ]
+
+        self.assertEqual(llm_gateway.chat_completion([{"role": "user", "content": "hi"}], temperature=0), '{"ok": true}')
+        self.assertEqual(mock_client.chat.completions.create.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch('api.llm_gateway.time.sleep')
+    @patch('api.llm_gateway._client')
+    def test_gives_up_after_max_retries(self, mock_client, mock_sleep):
+        request = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+        mock_client.chat.completions.create.side_effect = openai.APIConnectionError(request=request)
+
+        with self.assertRaises(llm_gateway.LLMError):
+            llm_gateway.chat_completion([{"role": "user", "content": "hi"}], temperature=0)
+        self.assertEqual(mock_client.chat.completions.create.call_count, settings.LLM_MAX_RETRIES + 1)
+
+    @patch('api.llm_gateway._client')
+    def test_client_errors_are_not_retried(self, mock_client):
+        request = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+        response = httpx.Response(400, request=request)
+        mock_client.chat.completions.create.side_effect = openai.BadRequestError("bad request", response=response, body=None)
+
+        with self.assertRaises(llm_gateway.LLMError):
+            llm_gateway.chat_completion([{"role": "user", "content": "hi"}], temperature=0)
+        mock_client.chat.completions.create.assert_called_once()
+
+    def test_backoff_is_capped(self):
+        for attempt in range(20):
+            self.assertLessEqual(llm_gateway.backoff_delay(attempt), settings.LLM_BACKOFF_MAX)
+
+
+class UniversityCatalogTests(SimpleTestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'catalog.json')
+        self.write_catalog([
+            {"country": "Canada", "universities": [
+                {"name": "University of Toronto", "alpha_two_code": "CA", "rank": 25, "domains": ["utoronto.ca"]},
+                {"name": "McGill University", "alpha_two_code": "CA", "rank": 30, "domains": ["mcgill.ca"]},
+            ]},
+            {"country": "United Kingdom", "universities": [
+                {"name": "University of Oxford", "alpha_two_code": "GB", "rank": 3, "domains": ["ox.ac.uk"]},
+            ]},
+        ])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_catalog(self, data, mtime=None):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        if mtime:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def test_indexes(self):
+        catalog = get_catalog(self.path)
+
+        self.assertEqual([u['name'] for u in catalog.ranked], ["University of Oxford", "University of Toronto", "McGill University"])
+        self.assertEqual([u['name'] for u in catalog.in_country('canada')], ["University of Toronto", "McGill University"])
+        self.assertEqual(catalog.in_code('gb')[0]['country'], "United Kingdom")
+        self.assertEqual(catalog.get('  mcgill   UNIVERSITY')['rank'], 30)
+        self.assertEqual(catalog.countries_matching('uk'), ())
+        self.assertEqual(catalog.countries_matching('king'), ("United Kingdom",))
+
+    def test_records_are_read_only(self):
+        record = get_catalog(self.path).ranked[0]
+        with self.assertRaises(TypeError):
+            record['is_locked'] = True
+        self.assertIsInstance(record['domains'], tuple)
+
+    def test_reloads_when_file_changes(self):
+        first = get_catalog(self.path)
+        self.assertIs(get_catalog(self.path), first)
+
+        self.write_catalog([{"country": "Japan", "universities": [{"name": "University of Tokyo", "rank": 28}]}], mtime=10**18)
+        second = get_catalog(self.path)
+
+        self.assertIsNot(second, first)
+        self.assertEqual([u['name'] for u in second.ranked], ["University of Tokyo"])
+
+
+    def test_filtered_results_are_reused(self):
+        catalog = get_catalog(self.path)
+        first = catalog.filtered('canada', 0, 100)
+        self.assertEqual([u['name'] for u in first], ["University of Toronto", "McGill University"])
+        self.assertIs(catalog.filtered('Canada', 0, 100), first)
+        self.assertEqual([u['name'] for u in catalog.filtered(rank_max=10)], ["University of Oxford"])
+
+    def test_cursor_round_trip_and_reanchoring(self):
+        catalog = get_catalog(self.path)
+        records = catalog.filtered()
+        cursor = encode_cursor(catalog, records, 1)
+        self.assertEqual(decode_cursor(catalog, records, cursor), 1)
+
+        # A new catalog version resumes after the last record the client saw
+        self.write_catalog([{"country": "United Kingdom", "universities": [
+            {"name": "University of Cambridge", "rank": 2},
+            {"name": "University of Oxford", "rank": 3},
+            {"name": "Imperial College London", "rank": 8},
+        ]}], mtime=10**18)
+        reloaded = get_catalog(self.path)
+        self.assertEqual(decode_cursor(reloaded, reloaded.filtered(), cursor), 2)
+
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(reloaded, reloaded.filtered(), 'not-a-cursor')
+
+    def test_cursor_is_bound_to_its_filters(self):
+        catalog = get_catalog(self.path)
+        canada = filter_key('canada', 0, 100)
+        cursor = encode_cursor(catalog, catalog.filtered('canada', 0, 100), 1, canada)
+
+        self.assertEqual(decode_cursor(catalog, catalog.filtered('Canada', 0, 100), cursor, filter_key('Canada', 0, 100)), 1)
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(catalog, catalog.filtered(), cursor, filter_key())
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(catalog, catalog.filtered('canada', 0, 100, 'toronto'), cursor, filter_key('canada', 0, 100, 'toronto'))
+
+class UniversitySearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = UniversitySearchIndex([
+            {"name": "University of Oxford", "country": "United Kingdom", "state-province": None, "domains": ("ox.ac.uk",), "rank": 3},
+            {"name": "Technische Universität München", "country": "Germany", "state-province": "Bavaria", "domains": ("tum.de",), "rank": 20},
+            {"name": "University of Toronto", "country": "Canada", "state-province": "Ontario", "domains": ("utoronto.ca",), "rank": 25},
+            {"name": "Oxford Brookes University", "country": "United Kingdom", "state-province": None, "domains": ("brookes.ac.uk",), "rank": 300},
+        ])
+
+    def test_search_ranks_by_relevance_then_rank(self):
+        self.assertEqual([u['name'] for u in self.index.search('oxford')], ["University of Oxford", "Oxford Brookes University"])
+        self.assertEqual([u['name'] for u in self.index.search('brookes')], ["Oxford Brookes University"])
+
+    def test_search_covers_domains_region_and_country(self):
+        self.assertEqual(self.index.search('utoronto.ca')[0]['name'], "University of Toronto")
+        self.assertEqual(self.index.search('ontario')[0]['name'], "University of Toronto")
+        self.assertEqual(self.index.search('germany')[0]['name'], "Technische Universität München")
+
+    def test_search_tolerates_typos_and_accents(self):
+        self.assertEqual(self.index.search('oxfrod')[0]['name'], "University of Oxford")
+        self.assertEqual(self.index.search('munchen')[0]['name'], "Technische Universität München")
+        self.assertEqual(self.index.search('oxford toronto'), ())
+
+    def test_autocomplete_returns_top_k_by_rank(self):
+        self.assertEqual([u['name'] for u in self.index.autocomplete('univ', limit=2)], ["University of Oxford", "Technische Universität München"])
+        self.assertEqual([u['name'] for u in self.index.autocomplete('univ of to')], ["University of Toronto"])
+        self.assertEqual(self.index.autocomplete(''), ())
+
+
+class UniversityTableTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'catalog.json')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump([
+                {"country": "Australia", "universities": [{"name": "Victoria University", "alpha_two_code": "AU", "rank": 500, "domains": ["vu.edu.au"]}]},
+                {"country": "New Zealand", "universities": [{"name": "Victoria University", "alpha_two_code": "NZ", "rank": 240, "domains": ["vuw.ac.nz"]}]},
+            ], f)
+        self.user = User.objects.create_user('student@example.com', 'pw', first_name='Stu', last_name='Dent')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_is_idempotent_and_links_legacy_shortlists(self):
+        snapshot = {'name': "Victoria University", 'country': "Australia", 'domains': ["vu.edu.au"]}
+        legacy = ShortlistedUniversity.objects.create(user=self.user, university_name="Victoria University", country="Australia", category="Safe", data=snapshot)
+        unknown = ShortlistedUniversity.objects.create(user=self.user, university_name="Atlantis College", country="Atlantis", category="Dream", data={'name': "Atlantis College"})
+
+        call_command('load_universities', path=self.path, stdout=StringIO())
+        call_command('load_universities', path=self.path, stdout=StringIO())
+
+        self.assertEqual(University.objects.count(), 2)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.university.country, "Australia")
+        self.assertIsNone(legacy.data) # Now held by the University row
+        unknown.refresh_from_db()
+        self.assertEqual(unknown.data, {'name': "Atlantis College"}) # Unmatched rows keep their snapshot
+
+    def test_lock_references_university_by_foreign_key(self):
+        call_command('load_universities', path=self.path, stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post('/api/universities/shortlist/', {'action': 'lock', 'university_name': 'Victoria University', 'category': 'Target'})
+        self.assertEqual(response.status_code, 200)
+
+        entry = ShortlistedUniversity.objects.get(user=self.user)
+        # Without a country the best-ranked match wins
+        self.assertEqual(entry.university.country, "New Zealand")
+        self.assertEqual(entry.country, "New Zealand")
+
+        response = client.get('/api/universities/locked/')
+        self.assertEqual(response.json()['data'][0]['university']['domains'], ["vuw.ac.nz"])
+
+    def test_explorer_cursor_and_etag_follow_the_request(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        first = client.get('/api/universities/all/', {'country': 'germany', 'limit': 5}).json()
+        cursor = first['pagination']['next_cursor']
+
+        by_page = client.get('/api/universities/all/', {'country': 'germany', 'limit': 5, 'page': 2})
+        by_cursor = client.get('/api/universities/all/', {'country': 'germany', 'limit': 5, 'cursor': cursor})
+        self.assertEqual(by_page.json()['data'], by_cursor.json()['data'])
+        self.assertNotEqual(by_page['ETag'], by_cursor['ETag'])  # next_page differs
+
+        other = client.get('/api/universities/all/', {'country': 'france', 'limit': 5, 'cursor': cursor})
+        self.assertEqual(other.status_code, 400)
+
+    def test_autocomplete_rejects_a_bad_limit_and_caps_a_large_one(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for limit in ('abc', '0', '-3'):
+            response = client.get('/api/universities/autocomplete/', {'q': 'univ', 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+        response = client.get('/api/universities/autocomplete/', {'q': 'univ', 'limit': 1000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 50)
+
+
+class CountryResolverTests(SimpleTestCase):
+    def setUp(self):
+        self.resolver = CountryResolver(["Canada", "Germany", "United Kingdom", "United States"])
+
+    def test_resolves_aliases_codes_and_misspellings(self):
+        self.assertEqual(self.resolver.resolve('U.S.A.'), "United States")
+        self.assertEqual(self.resolver.resolve('gb'), "United Kingdom")
+        self.assertEqual(self.resolver.resolve('Deutschland'), "Germany")
+        self.assertEqual(self.resolver.resolve('Cannada'), "Canada")
+        self.assertIsNone(self.resolver.resolve('Atlantis'))
+
+    def test_resolves_every_preferred_country_in_order(self):
+        self.assertEqual(self.resolver.resolve_all("UK, Canada and germany / uk"), ["United Kingdom", "Canada", "Germany"])
+
+    def test_quotas_redistribute_unused_slots(self):
+        self.assertEqual(allocate_quotas([40, 40, 40], 25), [9, 8, 8])
+        self.assertEqual(allocate_quotas([2, 40, 40], 25), [2, 12, 11])
+        self.assertEqual(allocate_quotas([1, 2], 25), [1, 2])
+
+    def test_merge_by_rank_respects_quotas(self):
+        uk = [{'name': 'Oxford', 'rank': 3}, {'name': 'Imperial', 'rank': 8}, {'name': 'UCL', 'rank': 9}]
+        canada = [{'name': 'Toronto', 'rank': 25}, {'name': 'McGill', 'rank': 30}]
+        pool = merge_by_rank([uk, canada], 4, lambda u: u['rank'])
+        self.assertEqual([u['name'] for u in pool], ['Oxford', 'Imperial', 'Toronto', 'McGill'])
+
+
+class Top20PagesTests(SimpleTestCase):
+    def setUp(self):
+        self.pages = Top20Pages([{"name": f"University {i}", "rank": i} for i in range(1, 12)], "v1", 0)
+
+    def test_pages_match_paginator_fallbacks(self):
+        self.assertEqual(self.pages.num_pages, 3)
+        self.assertEqual(json.loads(self.pages.page('abc').body)['pagination']['current_page'], 1)
+        last = json.loads(self.pages.page(99).body)
+        self.assertEqual(last['pagination'], {'current_page': 3, 'total_pages': 3, 'total_items': 11, 'has_next': False, 'has_previous': True})
+        self.assertEqual([u['rank'] for u in last['data']], [11])
+
+    def test_compressed_variants_decode_to_same_body(self):
+        import gzip
+        page = self.pages.page(1)
+        self.assertEqual(gzip.decompress(page.encoded['gzip']), page.body)
+        self.assertEqual(len(page.etags), len(page.encoded) + 1)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate', {'gzip': b'', 'br': b''}), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=1, br;q=0.5', {'gzip': b'', 'br': b''}), 'gzip')
+        self.assertEqual(choose_encoding('br, gzip', {'gzip': b''}), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0', {'gzip': b''}))
+        self.assertIsNone(choose_encoding(None, {'gzip': b''}))
+
+
+class ProfileStrengthRulesTests(SimpleTestCase):
+    def profile(self, gpa=None, ielts=None, gre=None, sop=None):
+        return {
+            'academic_background': {'gpa': gpa},
+            'exams_readiness': {'ielts_toefl_status': ielts, 'gre_gmat_status': gre, 'sop_status': sop},
+        }
+
+    def test_parse_gpa_scales(self):
+        self.assertEqual(parse_gpa('3.8'), 3.8)
+        self.assertAlmostEqual(parse_gpa('85%'), 3.4)
+        self.assertAlmostEqual(parse_gpa('9 / 10'), 3.6)
+        self.assertAlmostEqual(parse_gpa('8.2 CGPA'), 3.28)
+        self.assertIsNone(parse_gpa('N/A'))
+
+    def test_academics(self):
+        self.assertEqual(compute_profile_strength(self.profile(gpa='3.8'))['academics'], 'Strong')
+        self.assertEqual(compute_profile_strength(self.profile(gpa='80%'))['academics'], 'Average')
+        self.assertEqual(compute_profile_strength(self.profile(gpa='2.9'))['academics'], 'Weak')
+        self.assertEqual(compute_profile_strength(self.profile())['academics'], 'Average')
+
+    def test_exams_and_sop(self):
+        self.assertEqual(compute_profile_strength(self.profile(ielts='Taken', gre='Taken', sop='Ready')), {'academics': 'Average', 'exams': 'Completed', 'sop': 'Ready'})
+        self.assertEqual(compute_profile_strength(self.profile(ielts='Not Taken', gre='Planning to take'))['exams'], 'In Progress')
+        self.assertEqual(compute_profile_strength(self.profile(ielts='Not Taken', gre='Not Taken'))['exams'], 'Not Started')
+        self.assertEqual(compute_profile_strength(self.profile(sop='Unknown'))['sop'], 'Not started')
+
+    def test_agrees_with_llm_mode_fixture(self):
+        profile_data = self.profile(gpa='3.8', ielts='Completed', gre='Not started', sop='Draft')
+        self.assertEqual(compute_profile_strength(profile_data), {'academics': 'Strong', 'exams': 'In Progress', 'sop': 'Draft'})
+
+
+class ChatStreamTests(TestCase):
+    reply = {
+        "response": "Hi \"Sam\"!\nTry **TU München** — ok \U0001F393",
+        "suggested_actions": ["Analyze my profile", "Recommend universities", "Show my tasks"],
+        "action": {"type": "create_task", "title": "Book IELTS"}
+    }
+
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='stream@example.com', password='pw', first_name='Sam')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_extractor_decodes_response_field_from_any_chunking(self):
+        raw = json.dumps({"suggested_actions": ["response"], **self.reply})
+        for size in (1, 2, 3, 7, len(raw)):
+            extractor = ResponseFieldExtractor('response')
+            text = ''.join(extractor.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+            self.assertEqual(text, self.reply['response'])
+            self.assertTrue(extractor.done)
+
+    def stream_of(self, text, size=5):
+        chunks = []
+        for i in range(0, len(text), size):
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = text[i:i + size]
+            chunks.append(chunk)
+        stream = MagicMock()
+        stream.__iter__.return_value = iter(chunks)
+        return stream
+
+    def events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        events = []
+        for frame in body.strip().split('\n\n'):
+            event, data = frame.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    @patch('api.llm_gateway._client')
+    def test_streams_tokens_then_done_and_persists_reply(self, mock_client):
+        mock_client.chat.completions.create.return_value = self.stream_of(json.dumps(self.reply))
+
+        response = self.client.post('/api/chat/stream/', {'message': 'Where should I apply?'}, format='json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self.events(response)
+
+        self.assertEqual(events[0][0], 'session')
+        self.assertGreater(len([e for e in events if e[0] == 'token']), 1)
+        self.assertEqual(''.join(data['text'] for kind, data in events if kind == 'token'), self.reply['response'])
+
+        kind, done = events[-1]
+        self.assertEqual(kind, 'done')
+        self.assertEqual(done['suggested_actions'], self.reply['suggested_actions'])
+        self.assertEqual(done['task_action'], self.reply['action'])
+
+        saved = ChatMessage.objects.get(id=done['message_id'])
+        self.assertEqual(saved.message, self.reply['response'])
+        self.assertTrue(self.user.tasks.filter(title='Book IELTS').exists())
+        self.assertTrue(mock_client.chat.completions.create.call_args[1]['stream'])
+
+    @patch('api.llm_gateway._client')
+    def test_provider_failure_ends_with_fallback_message(self, mock_client):
+        mock_client.chat.completions.create.side_effect = RuntimeError("provider down")
+
+        response = self.client.post('/api/chat/stream/', {'message': 'Hello'}, format='json')
+        kind, done = self.events(response)[-1]
+
+        self.assertEqual(kind, 'done')
+        self.assertEqual(done['response'], "I encountered an error. Please try again.")
+        self.assertEqual(ChatMessage.objects.get(id=done['message_id']).message, done['response'])
+
+    def test_missing_message_is_rejected(self):
+        response = self.client.post('/api/chat/stream/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='async@example.com', password='pw', first_name='Ada')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client = AsyncClient()
+        self.auth = {'Authorization': f'Bearer {token}'}
+
+    def mock_llm(self, mock_get_client, payload):
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = json.dumps(payload)
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
+        mock_get_client.return_value = mock_client
+        return mock_client
+
+    @patch('api.llm_gateway.get_async_client')
+    async def test_chat_awaits_llm_and_persists_turn(self, mock_get_client):
+        self.mock_llm(mock_get_client, {"response": "Start with your SOP.", "suggested_actions": ["a", "b", "c"]})
+
+        response = await self.client.post('/api/async/chat/', {'message': 'What next?'}, content_type='application/json', headers=self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['response'], "Start with your SOP.")
+        senders = [m async for m in ChatMessage.objects.filter(user=self.user).order_by('created_at').values_list('sender', flat=True)]
+        self.assertEqual(senders, ['ai', 'user', 'ai']) # Greeting, question, answer
+
+    @override_settings(RECOMMENDATION_LLM_REASONS=True)
+    @patch('api.llm_gateway.get_async_client')
+    async def test_recommendations_match_sync_payload_shape(self, mock_get_client):
+        name = recommendation_pool(get_catalog(), None)[0]['name']
+        self.mock_llm(mock_get_client, {
+            "Dream": [{"name": name, "reason": "Top ranked", "risks": "Competitive", "cost": "High", "acceptance_chance": "Low"}],
+            "Target": [],
+            "Safe": []
+        })
+
+        response = await self.client.get('/api/async/universities/recommendations/', headers=self.auth)
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(data['cached'])
+        self.assertEqual(data['data']['Dream'][0]['name'], name)
+        self.assertEqual(data['data']['Dream'][0]['reason'], "Top ranked")
+        self.assertFalse(data['data']['Dream'][0]['is_locked'])
+
+        create = mock_get_client.return_value.chat.completions.create
+        calls = create.await_count # One per chunk of the pool
+        again = (await self.client.get('/api/async/universities/recommendations/', headers=self.auth)).json()
+        self.assertTrue(again['cached'])
+        self.assertEqual(create.await_count, calls)
+
+    async def test_requires_bearer_token(self):
+        response = await self.client.get('/api/async/dashboard/strength/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_strength_defaults_to_local_rules(self):
+        response = await self.client.get('/api/async/dashboard/strength/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['data']), {'academics', 'exams', 'sop'})
+
+
+class BackgroundJobTests(TestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='jobs@example.com', password='pw', onboarding_step='Completed')
+
+    def mock_tasks(self, mock_client, titles):
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = json.dumps(titles)
+        mock_client.chat.completions.create.return_value = mock_completion
+
+    def make_due(self):
+        BackgroundJob.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_rapid_enqueues_coalesce_into_one_job(self):
+        first = jobs.enqueue_task_generation(self.user)
+        for _ in range(9):
+            jobs.enqueue_task_generation(self.user)
+
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+        job = BackgroundJob.objects.get()
+        self.assertGreaterEqual(job.run_after, first.run_after) # Debounced, not run yet
+        self.assertLessEqual(job.run_after, job.created_at + timedelta(seconds=settings.JOB_COALESCE_MAX_SECONDS))
+        self.assertEqual(jobs.run_pending('test-worker'), 0)
+
+    @patch('api.llm_gateway._client')
+    def test_profile_save_enqueues_instead_of_calling_llm(self, mock_client):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for gpa in ('3.5', '3.6', '3.7'):
+            response = client.put('/api/profile/', {'first_name': gpa}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        mock_client.chat.completions.create.assert_not_called()
+        self.assertEqual(BackgroundJob.objects.filter(status='pending').count(), 1)
+
+        self.mock_tasks(mock_client, ["Register for IELTS", "Draft SOP"])
+        self.make_due()
+        self.assertEqual(jobs.run_pending('test-worker'), 1)
+
+        self.assertEqual(BackgroundJob.objects.get().status, 'done')
+        self.assertEqual(set(self.user.tasks.values_list('title', flat=True)), {"Register for IELTS", "Draft SOP"})
+        mock_client.chat.completions.create.assert_called_once()
+
+    @patch('api.llm_gateway._client')
+    def test_failures_are_retried_then_marked_failed(self, mock_client):
+        mock_client.chat.completions.create.side_effect = RuntimeError("provider down")
+        jobs.enqueue_task_generation(self.user)
+
+        for attempt in range(1, 4):
+            self.make_due()
+            jobs.run_pending('test-worker')
+            job = BackgroundJob.objects.get()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn("provider down", job.last_error)
+
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(self.user.tasks.exists()) # No fallback task saved
+
+    def test_expired_lock_makes_job_visible_again(self):
+        jobs.enqueue_task_generation(self.user)
+        self.make_due()
+        job = jobs.claim_next('crashed-worker')
+        self.assertIsNone(jobs.claim_next('other-worker')) # Hidden while locked
+
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = jobs.claim_next('other-worker')
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertEqual(reclaimed.locked_by, 'other-worker')
+
+
+class SingleFlightRecommendationTests(TestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='flight@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.name = recommendation_pool(get_catalog(), None)[0]['name']
+        self.result = {"Dream": [{"name": self.name, "reason": "Top ranked"}], "Target": [], "Safe": []}
+        single_flight.get_ai_cache(self.user)
+
+    def hold_lease(self, fingerprint='in-flight'):
+        return single_flight.acquire_recommendations_lease(self.user, fingerprint)
+
+    @override_settings(RECOMMENDATION_WAIT_SECONDS=0)
+    @patch('api.llm_gateway._client')
+    def test_request_during_generation_gets_202_without_llm_call(self, mock_client):
+        with patch('api.views.recommendation_cache_key', return_value='in-flight'):
+            self.hold_lease()
+            response = self.client.get('/api/universities/recommendations/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(response.json()['poll_url'], '/api/universities/recommendations/')
+        mock_client.chat.completions.create.assert_not_called()
+
+    @patch('api.llm_gateway._client')
+    def test_waiter_is_served_the_owners_result(self, mock_client):
+        token = self.hold_lease()
+
+        def owner_finishes(seconds):
+            single_flight.complete_recommendations(self.user, token, self.result, inputs='')
+
+        with patch('api.views.recommendation_cache_key', return_value='in-flight'), \
+                patch('api.single_flight.time.sleep', side_effect=owner_finishes):
+            response = self.client.get('/api/universities/recommendations/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['cached'])
+        self.assertEqual(response.json()['data']['Dream'][0]['name'], self.name)
+        mock_client.chat.completions.create.assert_not_called()
+
+    def test_profile_change_discards_the_stale_owners_write(self):
+        inputs = ai_dependencies.inputs_fingerprint(ProfileSerializer(self.user).data, 'recommendations')
+        token = self.hold_lease()
+        Budget.objects.create(user=self.user, budget_range='$40k', funding_plan='Self-funded')
+        ai_dependencies.record_profile_write(self.user)
+
+        self.assertFalse(single_flight.complete_recommendations(self.user, token, self.result, inputs))
+        self.assertIsNone(ProfileAICache.objects.get(user=self.user).recommendations)
+
+    def test_lease_for_other_inputs_or_expired_is_taken_over(self):
+        self.assertIsNotNone(self.hold_lease('old-profile'))
+        self.assertIsNone(self.hold_lease('old-profile'))
+        self.assertIsNotNone(self.hold_lease('new-profile'))
+
+        ProfileAICache.objects.filter(user=self.user).update(recommendations_lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(self.hold_lease('new-profile'))
+
+    def test_failed_generation_releases_the_lease(self):
+        with patch('api.views.get_university_recommendations', side_effect=RuntimeError("boom")):
+            response = self.client.get('/api/universities/recommendations/')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIsNone(ProfileAICache.objects.get(user=self.user).recommendations_lease_until)
+
+    def test_racing_cache_row_creation_returns_existing_row(self):
+        existing = ProfileAICache.objects.get(user=self.user)
+        with patch.object(ProfileAICache.objects, 'get_or_create', side_effect=IntegrityError):
+            self.assertEqual(single_flight.get_ai_cache(self.user).pk, existing.pk)
+
+
+@override_settings(RECOMMENDATION_CHUNK_SIZE=25)
+class ChunkedRecommendationTests(SimpleTestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.pool = [{"name": f"University {i}", "rank": i + 1} for i in range(60)]
+        self.profile_data = {'academic_background': {'gpa': '3.5'}}
+
+    def classification(self, messages):
+        """Classifies the chunk named in the prompt by rank: every third one is a Dream."""
+        prompt = messages[1]['content']
+        names = [u['name'] for u in self.pool if f'"{u["name"]}"' in prompt]
+        result = {"Dream": [], "Target": [], "Safe": []}
+        for name in reversed(names): # Out of pool order on purpose
+            rank = int(name.split()[-1])
+            result[["Dream", "Target", "Safe"][rank % 3]].append({"name": name, "reason": "ok"})
+        return json.dumps(result)
+
+    def completion(self, text):
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = text
+        return mock_completion
+
+    @patch('api.llm_gateway._client')
+    def test_chunks_run_concurrently_and_merge_in_pool_order(self, mock_client):
+        barrier = threading.Barrier(3, timeout=5) # Only passes if all three chunks are in flight at once
+
+        def create(**kwargs):
+            barrier.wait()
+            return self.completion(self.classification(kwargs['messages']))
+        mock_client.chat.completions.create.side_effect = create
+
+        result = run_recommendation_graph(self.profile_data, self.pool)
+
+        self.assertEqual(mock_client.chat.completions.create.call_count, 3)
+        self.assertEqual(sum(len(items) for items in result.values()), 60)
+        self.assertEqual([item['name'] for item in result['Dream']], [f"University {i}" for i in range(0, 60, 3)])
+
+    @patch('api.llm_gateway._client')
+    def test_failed_chunk_does_not_drop_the_others(self, mock_client):
+        def create(**kwargs):
+            if '"University 30"' in kwargs['messages'][1]['content']:
+                raise RuntimeError("provider down")
+            return self.completion(self.classification(kwargs['messages']))
+        mock_client.chat.completions.create.side_effect = create
+
+        result = run_recommendation_graph(self.profile_data, self.pool)
+        names = {item['name'] for items in result.values() for item in items}
+
+        self.assertEqual(len(names), 35) # Chunks 0-24 and 50-59
+        self.assertNotIn("University 30", names)
+
+    @patch('api.llm_gateway.get_async_client')
+    def test_async_path_gives_the_same_merge(self, mock_get_client):
+        async def create(**kwargs):
+            return self.completion(self.classification(kwargs['messages']))
+        mock_get_client.return_value.chat.completions.create = AsyncMock(side_effect=create)
+
+        result = asyncio.run(arun_recommendation_graph(self.profile_data, self.pool))
+
+        self.assertEqual([item['name'] for item in result['Safe']], [f"University {i}" for i in range(2, 60, 3)])
+
+
+class FitScoringTests(SimpleTestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.catalog = get_catalog()
+
+    def profile(self, gpa, ielts=None, budget=None):
+        return {
+            'academic_background': {'gpa': gpa},
+            'exams_readiness': {'ielts_toefl_status': 'Taken' if ielts else 'Not Taken', 'ielts_toefl_score': ielts},
+            'budget': {'budget_range': budget},
+        }
+
+    def category_of(self, result, name):
+        return next(category for category, items in result.items() for item in items if item['name'] == name)
+
+    def test_scores_whole_catalog_in_one_pass(self):
+        fits = fit_scoring.score_universities(self.profile('3.5'), self.catalog.ranked, self.catalog)
+        self.assertEqual(fits.shape, (len(self.catalog),))
+
+        result = fit_scoring.classify_universities(self.profile('3.5'), self.catalog.ranked, self.catalog)
+        self.assertEqual(sum(len(items) for items in result.values()), len(self.catalog))
+        self.assertEqual(self.category_of(result, self.catalog.ranked[0]['name']), 'Dream')
+        self.assertEqual(self.category_of(result, self.catalog.ranked[-1]['name']), 'Safe')
+
+    def test_stronger_profile_moves_universities_toward_safe(self):
+        weak = fit_scoring.score_universities(self.profile('2.8', '6'), self.catalog.ranked, self.catalog)
+        strong = fit_scoring.score_universities(self.profile('3.9', '8.5'), self.catalog.ranked, self.catalog)
+        self.assertTrue((strong > weak).all())
+
+    def test_budget_below_country_cost_lowers_fit(self):
+        us = list(self.catalog.in_country('United States'))
+        rich = fit_scoring.score_universities(self.profile('3.5', budget='> ₹75,00,000'), us, self.catalog)
+        tight = fit_scoring.score_universities(self.profile('3.5', budget='< ₹5,00,000'), us, self.catalog)
+        self.assertTrue((tight < rich).all())
+
+        result = fit_scoring.classify_universities(self.profile('3.5', budget='< ₹5,00,000'), us[:1], self.catalog)
+        self.assertIn("above your budget", next(iter(sum(result.values(), [])))['risks'])
+
+    def test_usa_pool_is_split_across_all_categories(self):
+        pool = recommendation_pool(self.catalog, "United States")
+        splits = {}
+        for gpa, ielts in (('2.8', '6'), ('3.2', '7'), ('3.9', '8')):
+            result = fit_scoring.classify_universities(self.profile(gpa, ielts), pool, self.catalog)
+            splits[gpa] = {category: len(items) for category, items in result.items()}
+
+        minimum = int(len(pool) * fit_scoring.MIN_CATEGORY_SHARE)
+        self.assertTrue(all(count >= minimum for split in splits.values() for count in split.values()), splits)
+        # A mid profile gets reaches, matches and safeties; a stronger one fewer reaches
+        self.assertGreater(splits['3.2']['Target'], minimum)
+        self.assertGreater(splits['2.8']['Dream'], splits['3.2']['Dream'])
+        self.assertGreater(splits['3.2']['Dream'], splits['3.9']['Dream'])
+
+    def test_parse_budget(self):
+        self.assertEqual(fit_scoring.parse_budget("₹5,00,000 - ₹10,00,000"), 1_000_000)
+        self.assertEqual(fit_scoring.parse_budget("$40k"), 40_000 * fit_scoring.USD_TO_INR)
+        self.assertIsNone(fit_scoring.parse_budget(""))
+
+    @patch('api.llm_gateway._client')
+    def test_recommendations_need_no_llm_call_by_default(self, mock_client):
+        pool = recommendation_pool(self.catalog, None)
+        result = get_university_recommendations(self.profile('3.5'), pool)
+
+        mock_client.chat.completions.create.assert_not_called()
+        self.assertEqual(sorted(item['name'] for items in result.values() for item in items), sorted(u['name'] for u in pool))
+
+    @override_settings(RECOMMENDATION_LLM_REASONS=True)
+    @patch('api.llm_gateway._client')
+    def test_llm_only_rewrites_reasons(self, mock_client):
+        pool = recommendation_pool(self.catalog, None)[:3]
+        local = fit_scoring.classify_universities(self.profile('3.5'), pool, self.catalog)
+        # The LLM disagrees about the category of every university
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = json.dumps({
+            "Dream": [], "Target": [], "Safe": [{"name": u['name'], "reason": "Written by LLM", "risks": "None"} for u in pool]
+        })
+        mock_client.chat.completions.create.return_value = mock_completion
+
+        result = get_university_recommendations(self.profile('3.5'), pool)
+
+        self.assertEqual({c: [i['name'] for i in items] for c, items in result.items()}, {c: [i['name'] for i in items] for c, items in local.items()})
+        self.assertTrue(all(item['reason'] == "Written by LLM" for items in result.values() for item in items))
+        self.assertIn('"category"', mock_client.chat.completions.create.call_args[1]['messages'][1]['content'])
+
+
+class AIDependencyInvalidationTests(TestCase):
+    recommendations = {"Dream": [], "Target": [{"name": "Somewhere"}], "Safe": []}
+    strength = {"academics": "Strong", "exams": "Completed", "sop": "Ready"}
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='deps@example.com', password='pw', onboarding_step='Completed')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.exams = {'ielts_toefl_status': 'Taken', 'ielts_toefl_score': '7.5', 'gre_gmat_status': 'Not Taken', 'sop_status': 'Draft'}
+        self.client.post('/api/onboarding/exams/', self.exams, format='json')
+        self.fill_cache()
+
+    def fill_cache(self):
+        ProfileAICache.objects.filter(user=self.user).update(recommendations=self.recommendations, strength_data=self.strength)
+
+    def cache_row(self):
+        return ProfileAICache.objects.get(user=self.user)
+
+    def test_only_artifacts_whose_inputs_changed_are_cleared(self):
+        version = self.cache_row().profile_version
+
+        self.client.post('/api/onboarding/exams/', {**self.exams, 'sop_status': 'Ready'}, format='json')
+        row = self.cache_row()
+        self.assertIsNone(row.strength_data) # SOP status feeds the strength rating...
+        self.assertEqual(row.recommendations, self.recommendations) # ...but not the recommendations
+        self.assertEqual(row.profile_version, version + 1)
+
+        self.fill_cache()
+        self.client.post('/api/onboarding/exams/', {**self.exams, 'sop_status': 'Ready', 'ielts_toefl_score': '8'}, format='json')
+        row = self.cache_row()
+        self.assertIsNone(row.recommendations)
+        self.assertEqual(row.strength_data, self.strength)
+
+    def test_unchanged_resave_name_change_and_task_toggle_keep_artifacts(self):
+        version = self.cache_row().profile_version
+        self.client.post('/api/onboarding/exams/', self.exams, format='json')
+        self.client.put('/api/profile/', {'first_name': 'Renamed'}, format='json')
+        task = Task.objects.create(user=self.user, title='Draft SOP')
+        self.client.patch(f'/api/tasks/{task.id}/', {'is_completed': True}, format='json')
+
+        row = self.cache_row()
+        self.assertEqual((row.recommendations, row.strength_data), (self.recommendations, self.strength))
+        self.assertEqual(row.profile_version, version)
+
+    def test_result_from_an_outdated_profile_is_not_stored(self):
+        profile_data = ProfileSerializer(self.user).data
+        version = self.cache_row().profile_version
+        ProfileAICache.objects.filter(user=self.user).update(strength_data=None)
+        self.client.post('/api/onboarding/exams/', {**self.exams, 'gre_gmat_status': 'Taken'}, format='json')
+
+        self.assertFalse(ai_dependencies.store_artifact(self.user, 'strength_data', profile_data, self.strength, version))
+        self.assertTrue(ai_dependencies.store_artifact(
+            self.user, 'strength_data', ai_dependencies.current_profile(self.user), self.strength, self.cache_row().profile_version
+        ))
+
+    def test_result_is_dropped_even_if_the_edit_was_undone(self):
+        profile_data = ProfileSerializer(self.user).data
+        version = self.cache_row().profile_version
+        self.client.post('/api/onboarding/exams/', {**self.exams, 'gre_gmat_status': 'Taken'}, format='json')
+        self.client.post('/api/onboarding/exams/', self.exams, format='json')
+
+        self.assertEqual(ai_dependencies.inputs_fingerprint(profile_data, 'strength_data'), self.cache_row().strength_inputs)
+        self.assertFalse(ai_dependencies.store_artifact(self.user, 'strength_data', profile_data, self.strength, version))
+
+
+class RecommendationRepairTests(SimpleTestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.pool = [{"name": "Technische Universität München", "rank": 28}, {"name": "University of Toronto", "rank": 21}]
+        self.profile_data = {'academic_background': {'gpa': '3.5'}}
+
+    def completion(self, text):
+        mock_completion = MagicMock()
+        mock_completion.choices[0].message.content = text
+        return mock_completion
+
+    def test_loads_tolerant_fixes_common_llm_mistakes(self):
+        self.assertEqual(loads_tolerant('Sure!\n```json\n{"Dream": [{"name": "A",},],}\n```'), {"Dream": [{"name": "A"}]})
+        self.assertEqual(loads_tolerant('{"ok": True, "none": None} and some prose {x}'), {"ok": True, "none": None})
+        self.assertEqual(loads_tolerant('{"Dream": [{"name": "A", "reason": "Strong resea'), {"Dream": [{"name": "A", "reason": "Strong resea"}]})
+        self.assertEqual(loads_tolerant('{“name”: “A”, “ok”: [“x”]}'), {"name": "A", "ok": ["x"]})
+
+    def test_loads_tolerant_keeps_smart_quotes_inside_values(self):
+        self.assertEqual(loads_tolerant('{"a": "the “best” school"}'), {"a": "the “best” school"})
+        self.assertEqual(loads_tolerant('{“a”: “the ‘best’ school”,}'), {"a": "the ‘best’ school"})
+        with self.assertRaises(ValueError):
+            loads_tolerant('I cannot help with that.')
+
+    @patch('api.llm_gateway._client')
+    def test_near_miss_output_is_repaired_without_regenerating(self, mock_client):
+        mock_client.chat.completions.create.return_value = self.completion(
+            '```json\n{"dream": [{"name": "Technische Universitat Munchen", "reason": "Top 30"}, 42],'
+            ' "Target": ["Univ. of Toronto", "University of Toronto", {"name": "Nowhere College"}],}\n```'
+        )
+
+        result = run_recommendation_graph(self.profile_data, self.pool)
+
+        mock_client.chat.completions.create.assert_called_once()
+        self.assertEqual(result, {
+            "Dream": [{"name": "Technische Universität München", "reason": "Top 30"}],
+            "Target": [{"name": "University of Toronto"}],
+            "Safe": [],
+        })
+
+    @patch('api.llm_gateway._client')
+    def test_regenerates_only_when_nothing_is_salvageable(self, mock_client):
+        mock_client.chat.completions.create.return_value = self.completion('{"Dream": [{"name": "Nowhere College"}]}')
+
+        result = run_recommendation_graph(self.profile_data, self.pool)
+
+        self.assertEqual(mock_client.chat.completions.create.call_count, 3)
+        self.assertEqual(result, {"Dream": [], "Target": [], "Safe": []})
+
+    @override_settings(LLM_STRUCTURED_OUTPUTS=True)
+    @patch('api.llm_gateway._client')
+    def test_structured_outputs_fall_back_to_json_mode(self, mock_client):
+        request = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+        rejected = openai.BadRequestError("json_schema not supported", response=httpx.Response(400, request=request), body=None)
+        valid = json.dumps({"Dream": [], "Target": [{"name": "University of Toronto"}], "Safe": []})
+        mock_client.chat.completions.create.side_effect = [rejected, self.completion(valid)]
+
+        result = run_recommendation_graph(self.profile_data, self.pool)
+
+        formats = [c[1]['response_format']['type'] for c in mock_client.chat.completions.create.call_args_list]
+        self.assertEqual(formats, ['json_schema', 'json_object'])
+        self.assertEqual(result['Target'][0]['name'], "University of Toronto")
+
+
+
+class ChatPromptBudgetTests(SimpleTestCase):
+    def setUp(self):
+        self.profile_data = {'academic_background': {'gpa': '3.5'}, 'budget': {'budget_range': '₹20L'}}
+        self.locked = [{"name": "University of Toronto", "country": "Canada"}]
+        self.tasks = [{"id": i, "title": f"Task {i}"} for i in range(3)]
+        self.history = [{"role": "user" if i % 2 else "assistant", "content": f"message {i}"} for i in range(8)]
+
+    def test_fit_sections_drops_lowest_priority_items_first(self):
+        fitted = prompt_budget.fit_sections([
+            prompt_budget.Section('rules', ["word " * 50], render=lambda kept, omitted: kept[0], required=True),
+            prompt_budget.Section('important', ["a", "b"], priority=1),
+            prompt_budget.Section('extra', [f"university {i}" for i in range(100)], priority=2),
+        ], 100)
+
+        self.assertLessEqual(fitted['total'], 100)
+        self.assertEqual(fitted['important']['items'], ["a", "b"])
+        self.assertGreater(fitted['extra']['omitted'], 0)
+        self.assertIn(f"+{fitted['extra']['omitted']} more not shown", fitted['extra']['text'])
+
+    def test_truncate_to_tokens(self):
+        text = "essay " * 1000
+        self.assertLessEqual(prompt_budget.count_tokens(prompt_budget.truncate_to_tokens(text, 50)), 51)
+        self.assertEqual(prompt_budget.truncate_to_tokens("short", 50), "short")
+
+    @override_settings(CHAT_PROMPT_TOKEN_BUDGET=1500, CHAT_HISTORY_ITEM_TOKENS=100)
+    def test_chat_prompt_stays_within_budget_for_heavy_users(self):
+        shortlist = [{"name": f"University number {i}", "country": "Germany"} for i in range(500)]
+        history = self.history[:-1] + [{"role": "user", "content": "pasted essay " * 2000}]
+
+        messages, usage = build_chat_prompt(self.profile_data, history, "Which should I lock?", 2, self.locked, shortlist, self.tasks)
+
+        self.assertLessEqual(usage['total'], 1500)
+        self.assertEqual(set(usage), {'instructions', 'user_message', 'locked_universities', 'tasks', 'history', 'summary', 'shortlisted_universities', 'total'})
+        system = messages[0]['content']
+        self.assertIn("University of Toronto", system)
+        self.assertIn("Current Active Tasks (3 in total)", system)
+        self.assertIn("more not shown", system)
+        self.assertEqual(messages[-1], {"role": "user", "content": "Which should I lock?"})
+        # Newest turn kept (cut down), in chronological order
+        self.assertLess(prompt_budget.count_tokens(messages[-2]['content']), 110)
+        self.assertTrue(messages[-2]['content'].startswith("pasted essay"))
+
+    def test_small_context_is_passed_through(self):
+        messages = build_chat_messages(self.profile_data, self.history, "Hi", 1, self.locked, [], self.tasks)
+
+        self.assertEqual(messages[1:-1], self.history)
+        self.assertIn(json.dumps(self.tasks), messages[0]['content'])
+        self.assertNotIn("more not shown", messages[0]['content'])
+
+
+@override_settings(CHAT_RECENT_MESSAGES=2, CHAT_SUMMARY_EVERY=4)
+class ChatSummaryTests(TestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='summary@example.com', password='pw')
+        self.session = ChatSession.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_messages(self, count):
+        start = ChatMessage.objects.filter(session=self.session).count()
+        for i in range(start, start + count):
+            ChatMessage.objects.create(user=self.user, session=self.session, sender='user' if i % 2 else 'ai', message=f"message {i}")
+
+    def llm(self, summary="Student wants a CS masters in Germany."):
+        """Fake provider: plain text for summary prompts, chat JSON otherwise."""
+        def create(**kwargs):
+            completion = MagicMock()
+            if 'conversation summaries' in kwargs['messages'][0]['content']:
+                completion.choices[0].message.content = summary
+            else:
+                completion.choices[0].message.content = json.dumps({"response": "Sure.", "suggested_actions": []})
+            return completion
+        return create
+
+    @patch('api.llm_gateway._client')
+    def test_older_messages_are_folded_into_summary(self, mock_client):
+        mock_client.chat.completions.create.side_effect = self.llm()
+        self.add_messages(5)
+        self.assertFalse(chat_summary.needs_summary(self.session))
+        self.add_messages(1)
+        self.assertTrue(chat_summary.needs_summary(self.session))
+
+        chat_summary.summarize_sessions(self.user)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, "Student wants a CS masters in Germany.")
+        newest = list(ChatMessage.objects.filter(session=self.session).order_by('-id')[:2])
+        self.assertEqual(self.session.summary_last_message_id, newest[-1].id - 1)
+        self.assertEqual([m['content'] for m in chat_summary.recent_history(self.session)], ["message 4", "message 5"])
+        # Only the new messages and the previous summary are sent
+        prompt = mock_client.chat.completions.create.call_args[1]['messages'][1]['content']
+        self.assertIn("message 3", prompt)
+        self.assertNotIn("message 4", prompt)
+
+    @patch('api.llm_gateway._client')
+    def test_stale_refresh_is_discarded(self, mock_client):
+        mock_client.chat.completions.create.side_effect = self.llm()
+        self.add_messages(6)
+        stale = ChatSession.objects.get(pk=self.session.pk)
+
+        self.assertTrue(chat_summary.summarize_session(self.session))
+        self.assertFalse(chat_summary.summarize_session(stale))
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    @patch('api.llm_gateway._client')
+    def test_chat_prompt_is_summary_plus_recent_window(self, mock_client):
+        mock_client.chat.completions.create.side_effect = self.llm()
+        for turn in range(4):
+            response = self.client.post('/api/chat/', {'message': f"question {turn}", 'session_id': str(self.session.id)}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, "Student wants a CS masters in Germany.")
+        self.client.post('/api/chat/', {'message': "And the budget?", 'session_id': str(self.session.id)}, format='json')
+
+        chat_calls = [c[1]['messages'] for c in mock_client.chat.completions.create.call_args_list if 'Counsellor' in c[1]['messages'][0]['content']]
+        messages = chat_calls[-1]
+        self.assertIn("Earlier in this conversation: Student wants a CS masters in Germany.", messages[0]['content'])
+        self.assertLess(len(messages), 2 + 2 + 4)  # system + user + at most one refresh behind the window
+        self.assertNotIn("question 0", json.dumps(messages))
+
+
+class ChatContextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='context@example.com', password='pw', onboarding_step='Completed')
+        Budget.objects.create(user=self.user, budget_range='₹20L', funding_plan='Self-funded')
+        self.session = ChatSession.objects.create(user=self.user)
+
+    def add_state(self, count):
+        start = Task.objects.filter(user=self.user).count()
+        for i in range(start, start + count):
+            ShortlistedUniversity.objects.create(user=self.user, university_name=f"Uni {i}", country='Germany', category='Target', is_locked=i % 30 == 0)
+            Task.objects.create(user=self.user, title=f"Task {i}")
+            ChatMessage.objects.create(user=self.user, session=self.session, sender='user' if i % 2 else 'ai', message=f"message {i}")
+        refresh_application_stage(self.user)
+
+    def test_context_queries_do_not_grow_with_user_state(self):
+        self.add_state(2)
+        with self.assertNumQueries(4):
+            small = chat_context.load_chat_context(self.user, self.session, "Hi")
+        self.add_state(30)
+        with self.assertNumQueries(4):
+            context = chat_context.load_chat_context(self.user, self.session, "Hi")
+
+        self.assertEqual(small['stage'], 4)
+        self.assertEqual(context['profile_data']['budget']['funding_plan'], 'Self-funded')
+        self.assertEqual(len(context['locked_unis']), 2)
+        self.assertEqual(len(context['tasks']), 32)
+
+    def test_turn_is_saved_atomically(self):
+        context = chat_context.load_chat_context(self.user, self.session, "Where should I apply in Germany this year?")
+        self.assertEqual(self.session.title, "Where should I apply in German..")
+        result = {"response": "TU Munich.", "suggested_actions": [], "task_action": {"type": "create_task", "title": "Book IELTS"}}
+
+        message = chat_context.save_chat_turn(self.user, self.session, context['user_message'], result)
+
+        self.assertEqual(list(ChatMessage.objects.filter(session=self.session).order_by('id').values_list('sender', flat=True)), ['user', 'ai'])
+        self.assertEqual(message.message, "TU Munich.")
+        self.assertTrue(Task.objects.filter(user=self.user, title="Book IELTS").exists())
+        self.assertEqual(ChatSession.objects.get(pk=self.session.pk).title, "Where should I apply in German..")
+
+        with patch('api.chat_context.ChatMessage.objects.bulk_create', side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                chat_context.save_chat_turn(self.user, self.session, "Again", result)
+        self.assertEqual(Task.objects.filter(user=self.user, title="Book IELTS").count(), 1)
+
+
+class PerUserSchemaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='schema@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_shortlist_is_unique_per_user_and_name(self):
+        ShortlistedUniversity.objects.create(user=self.user, university_name="Uni A", country='Germany', category='Target')
+        with self.assertRaises(IntegrityError):
+            ShortlistedUniversity.objects.create(user=self.user, university_name="Uni A", country='Germany', category='Dream')
+
+    def test_relocking_updates_the_existing_row(self):
+        ShortlistedUniversity.objects.create(user=self.user, university_name="Uni A", country='Germany', category='Target')
+        for category in ('Dream', 'Safe'):
+            response = self.client.post('/api/universities/shortlist/', {'action': 'lock', 'university_name': "Uni A", 'category': category}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        row = ShortlistedUniversity.objects.get(user=self.user)
+        self.assertTrue(row.is_locked)
+        self.assertEqual(row.category, 'Dream')
+
+    def test_benchmark_command_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_endpoints', steps='50,100', users=5, repeat=1, stdout=out)
+
+        self.assertIn("GET /api/chat/history/", out.getvalue())
+        self.assertFalse(User.objects.filter(email__startswith='benchmark-').exists())
+        self.assertEqual(ChatMessage.objects.count(), 0)
+
+
+class TaskGenerationTests(TestCase):
+    def setUp(self):
+        caches[ai_cache.AI_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='taskgen@example.com', password='pw', onboarding_step='Completed')
+        Task.objects.bulk_create([Task(user=self.user, title=f"Old task {i}", is_completed=True) for i in range(100)])
+        Task.objects.create(user=self.user, title="Register for the IELTS")
+
+    def test_title_index_matches_normalized_and_near_duplicates(self):
+        index = TaskTitleIndex(["Register for the IELTS", "Draft your SOP"])
+
+        self.assertIn("register IELTS!", index)
+        self.assertIn("Draft SOPs", index)
+        self.assertNotIn("Book the GRE", index)
+        self.assertEqual(index.new_titles(["Book the GRE", "book GRE", "Draft SOP", "Ask for LORs"], 5), ["Book the GRE", "Ask for LORs"])
+
+    def test_prompt_carries_bounded_history(self):
+        context = views.task_generation_context(self.user)
+
+        self.assertEqual(len(context['existing_tasks']), settings.TASK_PROMPT_HISTORY)
+        self.assertEqual(context['existing_tasks'][0], "Register for the IELTS") # Active tasks first
+        self.assertEqual(len(context['existing_titles']), 101)
+        self.assertEqual(context['active_tasks_count'], 1)
+
+    def test_survivors_are_saved_in_one_insert(self):
+        context = views.task_generation_context(self.user)
+        generated = ["Register for IELTS", "Old Task 3", "Shortlist universities", "Draft SOP", "Draft the SOP"]
+
+        with self.assertNumQueries(1):
+            tasks = views.save_generated_tasks(self.user, generated, context['active_tasks_count'], context['existing_titles'])
+
+        self.assertEqual([t.title for t in tasks], ["Shortlist universities", "Draft SOP"])
+        self.assertTrue(all(t.pk for t in tasks))
+
+
+class ApplicationStageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='stage@example.com', password='pw', onboarding_step='Completed')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.events = []
+        application_stage.stage_changed.connect(self.record_event)
+        self.addCleanup(application_stage.stage_changed.disconnect, self.record_event)
+
+    def record_event(self, sender, user, old_stage, new_stage, **kwargs):
+        self.events.append((old_stage, new_stage))
+
+    @patch('api.signals.enqueue_task_generation')
+    def test_event_fires_only_on_real_transitions(self, enqueue):
+        self.client.post('/api/onboarding/record-visit/', {'section': 'explore'}, format='json')
+        self.client.post('/api/onboarding/record-visit/', {'section': 'explore'}, format='json')
+        self.client.post('/api/onboarding/record-visit/', {'section': 'shortlist'}, format='json')
+
+        self.assertEqual(self.events, [(1, 3)])
+        self.assertEqual(enqueue.call_count, 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.application_stage, 3)
+
+    @patch('api.signals.enqueue_task_generation')
+    def test_lock_and_unlock_move_the_stage(self, enqueue):
+        data = {'university_name': 'TU Munich', 'country': 'Germany', 'category': 'Target'}
+        self.client.post('/api/universities/shortlist/', {**data, 'action': 'lock'}, format='json')
+        self.client.post('/api/universities/shortlist/', {**data, 'action': 'unlock'}, format='json')
+
+        self.assertEqual(self.events, [(1, 4), (4, 2)])
+        self.assertEqual(self.client.get('/api/onboarding/status/').json()['data']['application_stage'], 2)
+
+    def test_racing_request_with_a_stale_stage_sends_nothing(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.assertEqual(refresh_application_stage(self.user), 2)
+
+        self.assertEqual(refresh_application_stage(stale), 2)
+        self.assertEqual(self.events, [(1, 2)])
+
+    def test_backfill_matches_compute_stage(self):
+        users = [
+            User.objects.create_user(email='b1@example.com', password='pw'),
+            User.objects.create_user(email='b2@example.com', password='pw', onboarding_step='Completed'),
+            User.objects.create_user(email='b3@example.com', password='pw', onboarding_step='Completed', has_visited_shortlist=True),
+            User.objects.create_user(email='b4@example.com', password='pw', onboarding_step='Completed'),
+        ]
+        ShortlistedUniversity.objects.create(user=users[3], university_name='ETH Zurich', country='Switzerland', category='Dream', is_locked=True)
+        migration = importlib.import_module('api.migrations.0018_user_application_stage')
+
+        migration.backfill_stage(django_apps, None)
+
+        stages = dict(User.objects.filter(pk__in=[u.pk for u in users]).values_list('email', 'application_stage'))
+        self.assertEqual(stages, {'b1@example.com': 1, 'b2@example.com': 2, 'b3@example.com': 3, 'b4@example.com': 4})
+
+
+@override_settings(CHAT_HISTORY_PAGE_SIZE=4, CHAT_HISTORY_MAX_PAGE_SIZE=10)
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='history@example.com', password='pw')
+        self.session = ChatSession.objects.create(user=self.user, title="Long chat")
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user=self.user, session=self.session, sender='user' if i % 2 else 'ai', message=f"message {i}")
+            for i in range(10)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, **params):
+        response = self.client.get('/api/chat/history/', {'session_id': self.session.id, **params})
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(b''.join(response.streaming_content))
+        return [m['message'] for m in body['data']], body['pagination']
+
+    def test_newest_page_first_then_older_pages(self):
+        messages, pagination = self.page()
+        self.assertEqual(messages, ["message 6", "message 7", "message 8", "message 9"])
+        self.assertTrue(pagination['has_more'])
+
+        messages, pagination = self.page(before=pagination['next_cursor'])
+        self.assertEqual(messages, ["message 2", "message 3", "message 4", "message 5"])
+
+        messages, pagination = self.page(before=pagination['next_cursor'])
+        self.assertEqual(messages, ["message 0", "message 1"])
+        self.assertFalse(pagination['has_more'])
+        self.assertIsNone(pagination['next_cursor'])
+
+    def test_since_returns_only_new_messages(self):
+        _, pagination = self.page()
+        self.assertEqual(self.page(since=pagination['since_cursor']), ([], {**pagination, 'has_more': False, 'next_cursor': None}))
+
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user=self.user, session=self.session, sender='user', message=f"new {i}") for i in range(5)
+        ])
+        messages, polled = self.page(since=pagination['since_cursor'])
+        self.assertEqual(messages, ["new 0", "new 1", "new 2", "new 3"])
+        self.assertTrue(polled['has_more'])
+        self.assertEqual(self.page(since=polled['since_cursor'])[0], ["new 4"])
+
+    def test_empty_page_polls_from_the_newest_message(self):
+        oldest = ChatMessage.objects.filter(session=self.session).order_by('id').first()
+        messages, pagination = self.page(before=chat_history.encode_message_cursor(oldest.id))
+        self.assertEqual(messages, [])
+        self.assertEqual(pagination['since_cursor'], self.page()[1]['since_cursor'])
+
+        ChatMessage.objects.filter(session=self.session).delete()
+        self.assertIsNone(self.page()[1]['since_cursor'])
+
+    def test_page_is_read_in_a_fixed_number_of_queries(self):
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user=self.user, session=self.session, sender='ai', message="filler") for _ in range(200)
+        ])
+        with self.assertNumQueries(3):  # Ownership, the page, whether older messages exist
+            messages, _ = self.page(limit=50)
+        self.assertEqual(len(messages), 10)  # Capped at CHAT_HISTORY_MAX_PAGE_SIZE
+
+    def test_bad_parameters(self):
+        url = '/api/chat/history/'
+        self.assertEqual(self.client.get(url, {'session_id': self.session.id, 'before': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'session_id': self.session.id, 'limit': 0}).status_code, 400)
+        cursor = chat_history.encode_message_cursor(5)
+        self.assertEqual(self.client.get(url, {'session_id': self.session.id, 'before': cursor, 'since': cursor}).status_code, 400)
+        other = ChatSession.objects.create(user=User.objects.create_user(email='other@example.com', password='pw'))
+        self.assertEqual(self.client.get(url, {'session_id': other.id}).status_code, 404)
@@ -0,0 +1,118 @@
+"""
+Pre-rendered pages for the public top-20 endpoint.
+
+`top_20_famous.json` is paginated and serialized once per file version
+(identity, gzip and, when the `brotli` package is installed, brotli bodies),
+so a request only picks a page and an encoding. Each page carries an ETag and
+Last-Modified so browsers and shared caches can revalidate for free.
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+
+from django.conf import settings
+from django.utils.http import http_date
+
+from .catalog import load_versioned
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+TOP_20_PATH = getattr(
+    settings,
+    'TOP_UNIVERSITIES_PATH',
+    os.path.join(settings.BASE_DIR, 'University_data', 'top_20_famous.json'),
+)
+PAGE_SIZE = 5 # 5 items per page
+CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=86400'
+
+
+def _compress(body):
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+class RenderedPage:
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.encoded = _compress(self.body)
+
+    def etag_for(self, encoding=None):
+        # Each representation needs its own strong validator
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+    @property
+    def etags(self):
+        return {self.etag_for()} | {self.etag_for(encoding) for encoding in self.encoded}
+
+
+class Top20Pages:
+    def __init__(self, data, version, last_modified):
+        self.version = version
+        self.last_modified = http_date(last_modified)
+
+        total = len(data)
+        self.num_pages = max(1, math.ceil(total / PAGE_SIZE))
+        pages = []
+        for number in range(1, self.num_pages + 1):
+            pages.append(RenderedPage({
+                'status': 'success',
+                'data': data[(number - 1) * PAGE_SIZE:number * PAGE_SIZE],
+                'pagination': {
+                    'current_page': number,
+                    'total_pages': self.num_pages,
+                    'total_items': total,
+                    'has_next': number < self.num_pages,
+                    'has_previous': number > 1
+                }
+            }))
+        self.pages = tuple(pages)
+
+    def page(self, page_num):
+        """Same fallbacks as Django's Paginator in the original view: bad input -> 1, out of range -> last."""
+        try:
+            number = int(page_num)
+        except (TypeError, ValueError):
+            number = 1
+        if number < 1 or number > self.num_pages:
+            number = self.num_pages
+        return self.pages[number - 1]
+
+
+def _build_pages(data, version, stat):
+    return Top20Pages(data, version, stat.st_mtime)
+
+
+def get_top20_pages(path=None):
+    """Raises FileNotFoundError when the data file is missing."""
+    return load_versioned(path or TOP_20_PATH, _build_pages)
+
+
+def choose_encoding(accept_encoding, available):
+    """Highest-q content-coding from an Accept-Encoding header among `available` (br wins ties)."""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ('br', 'gzip'):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in available and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
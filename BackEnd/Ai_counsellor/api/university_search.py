@@ -0,0 +1,211 @@
+"""
+Prebuilt search index over the university catalog.
+
+Built once per catalog version (see `catalog.UniversityCatalog`), it keeps an
+inverted index of tokens from `name`, `domains`, `state-province` and
+`country`, a trigram index over the token vocabulary for typo tolerance, and
+rank-sorted prefix postings for autocomplete. Queries never scan the catalog.
+"""
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+from types import MappingProxyType
+
+# Relative weight of a match in each field
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'domains': 2.0,
+    'state-province': 1.0,
+    'country': 1.0,
+}
+
+# Score multipliers by match type
+EXACT, PREFIX, INFIX, TYPO = 1.0, 0.8, 0.5, 0.4
+
+MIN_FUZZY_LENGTH = 5
+QUERY_CACHE_SIZE = 512
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Lowercase and strip accents ("Universität" -> "universitat")."""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (adjacent transpositions count as one edit).
+    Returns limit + 1 as soon as the distance is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def max_typos(token):
+    if len(token) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+class QueryCache:
+    """Thread-safe LRU for results derived from an immutable catalog snapshot."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return value
+
+
+class UniversitySearchIndex:
+    """
+    `records` must already be sorted by rank; document ids are their positions,
+    so sorting ids is the same as sorting by rank.
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+
+        postings = {}
+        for doc_id, record in enumerate(self.records):
+            for field, weight in FIELD_WEIGHTS.items():
+                value = record.get(field)
+                values = value if isinstance(value, (list, tuple)) else [value]
+                for text in values:
+                    for token in tokenize(text):
+                        docs = postings.setdefault(token, {})
+                        if docs.get(doc_id, 0) < weight:
+                            docs[doc_id] = weight
+        self.postings = MappingProxyType(postings)
+        self.vocabulary = tuple(sorted(postings))
+
+        grams = {}
+        for token in postings:
+            for gram in trigrams(token):
+                grams.setdefault(gram, set()).add(token)
+        self.trigrams = MappingProxyType({g: frozenset(t) for g, t in grams.items()})
+
+        prefixes = {}
+        for token, docs in postings.items():
+            for end in range(1, len(token) + 1):
+                prefixes.setdefault(token[:end], set()).update(docs)
+        self.prefixes = MappingProxyType({p: tuple(sorted(d)) for p, d in prefixes.items()})
+
+        # Small LRU of recent queries: the explore page asks again on every keystroke
+        self._cache = QueryCache(QUERY_CACHE_SIZE)
+
+    def _expand(self, term):
+        """Vocabulary tokens matching `term` with their match multiplier."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = EXACT
+
+        if len(term) < 3:
+            # Too short for trigrams: walk the sorted vocabulary instead
+            start = bisect_left(self.vocabulary, term)
+            for token in self.vocabulary[start:]:
+                if not token.startswith(term):
+                    break
+                matches.setdefault(token, PREFIX)
+            return matches
+
+        limit = max_typos(term)
+        candidates = set()
+        for gram in trigrams(term):
+            candidates.update(self.trigrams.get(gram, ()))
+
+        for token in candidates:
+            if token in matches:
+                continue
+            if token.startswith(term):
+                matches[token] = PREFIX
+            elif term in token:
+                matches[token] = INFIX
+            elif limit and edit_distance(term, token, limit) <= limit:
+                matches[token] = TYPO
+        return matches
+
+    def _term_scores(self, term):
+        scores = {}
+        for token, factor in self._expand(term).items():
+            for doc_id, weight in self.postings[token].items():
+                score = weight * factor
+                if scores.get(doc_id, 0) < score:
+                    scores[doc_id] = score
+        return scores
+
+    def _search_ids(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return ()
+
+        totals = None
+        for term in dict.fromkeys(terms):
+            scores = self._term_scores(term)
+            if totals is None:
+                totals = scores
+            else:
+                # Every term has to match somewhere
+                totals = {d: totals[d] + s for d, s in scores.items() if d in totals}
+            if not totals:
+                return ()
+
+        # Best score first, then best rank (lower doc id)
+        return tuple(sorted(totals, key=lambda d: (-totals[d], d)))
+
+    def search(self, query):
+        """Records matching every query term, ordered by relevance then rank."""
+        ids = self._cache.get_or_compute(('search', fold(query)), lambda: self._search_ids(query))
+        return tuple(self.records[d] for d in ids)
+
+    def _prefix_ids(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return ()
+        *complete, last = terms
+        required = [set(self.prefixes.get(t, ())) for t in complete]
+        return tuple(
+            doc_id for doc_id in self.prefixes.get(last, ())
+            if all(doc_id in docs for docs in required)
+        )
+
+    def autocomplete(self, query, limit=10):
+        """Top `limit` records by rank whose tokens start with every query term."""
+        ids = self._cache.get_or_compute(('prefix', fold(query)), lambda: self._prefix_ids(query))
+        return tuple(self.records[d] for d in ids[:limit])
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -42,10 +42,18 @@ urlpatterns = [
     path('universities/shortlist/', views.shortlist_action_view, name='shortlist_action'),
     path('universities/locked/', views.locked_universities_view, name='locked_universities'),
     path('universities/all/', views.all_universities_view, name='all_universities'),
+    path('universities/autocomplete/', views.university_autocomplete_view, name='university_autocomplete'),
     
     # AI Chat
     path('chat/sessions/', views.chat_sessions_view, name='chat_sessions'),
     path('chat/sessions/<uuid:session_id>/', views.chat_session_detail_view, name='chat_session_detail'),
     path('chat/', views.chat_view, name='chat'),
+    path('chat/stream/', views.chat_stream_view, name='chat_stream'),
     path('chat/history/', views.chat_history_view, name='chat_history'),
+
+    # Async variants of the LLM-bound endpoints (serve with an ASGI server, see README)
+    path('async/chat/', async_views.chat_view, name='async_chat'),
+    path('async/dashboard/strength/', async_views.profile_strength_view, name='async_profile_strength'),
+    path('async/universities/recommendations/', async_views.university_recommendations_view, name='async_university_recommendations'),
+    path('async/tasks/generate/', async_views.generate_new_tasks_view, name='async_generate_tasks'),
 ]
\ No newline at end of file
@@ -1,10 +1,11 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
 from django.shortcuts import redirect
-from django.http.response import JsonResponse
+from django.http.response import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout, get_user_model
 
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -14,12 +15,12 @@ from django.core.mail import send_mail, EmailMultiAlternatives
 from email.mime.image import MIMEImage
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode, parse_etags
 from django.utils.encoding import force_bytes, force_str
 from decouple import config
 from django.contrib.auth.tokens import default_token_generator
 from django.conf import settings
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+import hashlib
 import json
 import os
 import socket
@@ -36,8 +37,25 @@ from .serializers import (
     ExamsAndReadinessSerializer,
     TaskSerializer
 )
-from .models import User, AcademicBackground, StudyGoal, Budget, ExamsAndReadiness, Task, ShortlistedUniversity, ChatSession, ChatMessage, ProfileAICache
-from .ai_service import evaluate_profile_strength, generate_tasks_for_user, get_university_recommendations, chat_with_counselor
+from .models import User, AcademicBackground, StudyGoal, Budget, ExamsAndReadiness, Task, ShortlistedUniversity, University, ChatSession, ChatMessage
+from .ai_graph import recommendation_cache_key
+from .ai_service import evaluate_profile_strength, compute_profile_strength, generate_tasks_for_user, get_university_recommendations, chat_with_counselor, stream_chat_with_counselor
+from .chat_stream import EventStreamRenderer, sse_event
+from .catalog import get_catalog, encode_cursor, decode_cursor, filter_key, InvalidCursor
+from .top_universities import get_top20_pages, choose_encoding, CACHE_CONTROL
+from .jobs import enqueue_task_generation
+from .application_stage import refresh_application_stage
+from .task_titles import TaskTitleIndex
+from .chat_context import load_chat_context, save_chat_turn
+from .chat_history import decode_message_cursor, stream_history_page
+from .ai_dependencies import inputs_fingerprint, record_profile_write, store_artifact
+from .single_flight import (
+    acquire_recommendations_lease,
+    complete_recommendations,
+    get_ai_cache,
+    release_recommendations_lease,
+    wait_for_recommendations,
+)
 
 
 @api_view(['GET', 'PUT'])
@@ -51,12 +69,14 @@ def profile_view(request):
         serializer = ProfileSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            # Invalidate AI Cache
-            ProfileAICache.objects.filter(user=request.user).update(recommendations=None, strength_data=None)
+            if 'onboarding_step' in serializer.validated_data:
+                refresh_application_stage(request.user)
+            # Invalidate the AI artifacts whose inputs changed
+            record_profile_write(request.user)
             
             # Optionally trigger tasks
             if request.user.onboarding_step == 'Completed':
-                trigger_ai_task_generation(request.user)
+                enqueue_task_generation(request.user)
                 
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -278,13 +298,12 @@ def academic_background_view(request):
                 request.user.onboarding_step = 'StudyGoal'
                 request.user.save()
             
-            # Invalidate AI Cache
-            from .models import ProfileAICache
-            ProfileAICache.objects.filter(user=request.user).update(recommendations=None, strength_data=None)
+            # Invalidate the AI artifacts whose inputs changed
+            record_profile_write(request.user)
 
             # Only trigger AI if user is updating profile after already completing onboarding
             if request.user.onboarding_step == 'Completed':
-                trigger_ai_task_generation(request.user)
+                enqueue_task_generation(request.user)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -325,13 +344,12 @@ def study_goal_view(request):
                 request.user.onboarding_step = 'Budget'
                 request.user.save()
             
-            # Invalidate AI Cache
-            from .models import ProfileAICache
-            ProfileAICache.objects.filter(user=request.user).update(recommendations=None, strength_data=None)
+            # Invalidate the AI artifacts whose inputs changed
+            record_profile_write(request.user)
 
             # Only trigger AI if user is updating profile after already completing onboarding
             if request.user.onboarding_step == 'Completed':
-                trigger_ai_task_generation(request.user)
+                enqueue_task_generation(request.user)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -370,13 +388,12 @@ def budget_view(request):
                 request.user.onboarding_step = 'ExamsAndReadiness'
                 request.user.save()
             
-            # Invalidate AI Cache
-            from .models import ProfileAICache
-            ProfileAICache.objects.filter(user=request.user).update(recommendations=None, strength_data=None)
+            # Invalidate the AI artifacts whose inputs changed
+            record_profile_write(request.user)
 
             # Only trigger AI if user is updating profile after already completing onboarding
             if request.user.onboarding_step == 'Completed':
-                trigger_ai_task_generation(request.user)
+                enqueue_task_generation(request.user)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -412,13 +429,14 @@ def exams_readiness_view(request):
             
             request.user.onboarding_step = 'Completed'
             request.user.save()
+            refresh_application_stage(request.user) # Stage 1 -> 2 on first completion
             
-            # Invalidate AI Cache
-            ProfileAICache.objects.filter(user=request.user).update(recommendations=None, strength_data=None)
+            # Invalidate the AI artifacts whose inputs changed
+            record_profile_write(request.user)
 
             # Use same logic: triggers because status IS now 'Completed'
             if request.user.onboarding_step == 'Completed':
-                trigger_ai_task_generation(request.user)
+                enqueue_task_generation(request.user)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -429,26 +447,12 @@ def exams_readiness_view(request):
 def get_current_stage_data(user):
     """
     Helper to determine the granular application stage.
-    Used by both status view and task generation.
+    Used by both status view and task generation. The stage is stored on the
+    user (see application_stage.py), so this does not query.
     """
-    
-    onboarding_step = user.onboarding_step
-    application_stage = 1 # Building Profile
-    
-    if onboarding_step == 'Completed':
-        application_stage = 2 # Discovering Universities (Base stage after onboarding)
-        
-        # If user has visited explore or shortlist, move to Stage 3 (Finalizing Universities)
-        if user.has_visited_explore or user.has_visited_shortlist:
-            application_stage = 3
-            
-        # If user has locked any university, they are in Stage 4 (Preparing Applications)
-        if ShortlistedUniversity.objects.filter(user=user, is_locked=True).exists():
-            application_stage = 4
-            
     return {
-        'onboarding_step': onboarding_step,
-        'application_stage': application_stage
+        'onboarding_step': user.onboarding_step,
+        'application_stage': user.application_stage
     }
 
 @api_view(['POST'])
@@ -458,18 +462,15 @@ def record_visit_view(request):
     Endpoint to record visits to specific sections for stage progression.
     """
     section = request.data.get('section') # 'explore', 'shortlist'
-    
-    if section == 'explore':
-        request.user.has_visited_explore = True
-    elif section == 'shortlist':
-        request.user.has_visited_shortlist = True
-    else:
+    flags = {'explore': 'has_visited_explore', 'shortlist': 'has_visited_shortlist'}
+    if section not in flags:
         return Response({'error': 'Invalid section'}, status=status.HTTP_400_BAD_REQUEST)
-        
-    request.user.save()
-    
-    # Check if this changed the stage and trigger tasks if so
-    trigger_ai_task_generation(request.user)
+
+    # Repeat visits write nothing; a first visit may move the stage (which triggers task generation)
+    if not getattr(request.user, flags[section]):
+        setattr(request.user, flags[section], True)
+        request.user.save(update_fields=[flags[section]])
+        refresh_application_stage(request.user)
     
     return Response({'status': 'success', 'stage_data': get_current_stage_data(request.user)})
 
@@ -495,25 +496,17 @@ def tasks_view(request):
         tasks = Task.objects.filter(user=request.user).order_by('is_completed', '-created_at')
         
         # Auto-generate tasks if none exist (Basic Logic)
+        generating = False
         if not tasks.exists() and request.user.onboarding_step == 'Completed':
-            # Create a basic profile dict for AI
+            # Queued; the tasks show up on a later poll
             try:
-                profile_data = ProfileSerializer(request.user).data
-                generated_titles = generate_tasks_for_user(profile_data, "Building Profile")
-                
-                for title in generated_titles:
-                    Task.objects.create(
-                        user=request.user,
-                        title=title,
-                        task_type='PROFILE'
-                    )
-                # Re-fetch
-                tasks = Task.objects.filter(user=request.user).order_by('is_completed', '-created_at')
+                enqueue_task_generation(request.user)
+                generating = True
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         serializer = TaskSerializer(tasks, many=True)
-        return Response({'status': 'success', 'data': serializer.data}, status=status.HTTP_200_OK)
+        return Response({'status': 'success', 'data': serializer.data, 'generating': generating}, status=status.HTTP_200_OK)
 
     elif request.method == 'POST':
         # Create a PERSONAL task
@@ -536,9 +529,6 @@ def task_detail_view(request, task_id):
         serializer = TaskSerializer(task, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            # Invalidate AI Cache
-            from .models import ProfileAICache
-            ProfileAICache.objects.filter(user=request.user).update(recommendations=None, strength_data=None)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -550,7 +540,13 @@ def task_detail_view(request, task_id):
 @permission_classes([IsAuthenticated])
 def profile_strength_view(request):
     try:
-        cache_obj, created = ProfileAICache.objects.get_or_create(user=request.user)
+        # Rule-based by default; `?enrich=true` (or PROFILE_STRENGTH_USE_LLM) asks the LLM instead
+        enrich = request.query_params.get('enrich', '').lower() in ('1', 'true') or settings.PROFILE_STRENGTH_USE_LLM
+        if not enrich:
+            profile_data = ProfileSerializer(request.user).data
+            return Response({'status': 'success', 'data': compute_profile_strength(profile_data), 'cached': False})
+
+        cache_obj = get_ai_cache(request.user)
         
         if cache_obj.strength_data:
             return Response({'status': 'success', 'data': cache_obj.strength_data, 'cached': True})
@@ -558,70 +554,82 @@ def profile_strength_view(request):
         profile_data = ProfileSerializer(request.user).data
         strength_data = evaluate_profile_strength(profile_data)
         
-        # Save to cache
-        cache_obj.strength_data = strength_data
-        cache_obj.save()
+        # Save to cache (skipped if the profile changed meanwhile)
+        store_artifact(request.user, 'strength_data', profile_data, strength_data, cache_obj.profile_version)
         
         return Response({'status': 'success', 'data': strength_data, 'cached': False})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def task_generation_context(user):
+    """
+    Everything generate_tasks_for_user needs, plus the active task count and
+    all task titles (for save_generated_tasks). Returns None when the user
+    already has enough active tasks.
+    """
+    # 1. All task titles, active first then newest first, in one query
+    tasks = list(Task.objects.filter(user=user).order_by('is_completed', '-created_at').values_list('title', 'is_completed'))
+    active_tasks_count = sum(1 for _, is_completed in tasks if not is_completed)
+
+    # If user already has 5 or more active tasks, don't overwhelm them with more AI tasks
+    # unless they intentionally requested them (manual regeneration).
+    if active_tasks_count >= 5:
+        return None
+
+    # 2. Get user profile
+    profile_data = ProfileSerializer(user).data
+
+    # 3. The prompt gets a bounded slice (active tasks, then the most recently completed);
+    # duplicates of older tasks are caught locally when saving
+    existing_titles = [title for title, _ in tasks if title]
+    existing_tasks = existing_titles[:settings.TASK_PROMPT_HISTORY]
+
+    # 4. Determine granular stage
+    stage_data = get_current_stage_data(user)
+    application_stage_num = stage_data['application_stage']
+
+    stage_names = {
+        1: "Building Profile (Onboarding)",
+        2: "Discovering Universities (Shortlisting)",
+        3: "Finalizing Universities (Application Selection)",
+        4: "Preparing Applications"
+    }
+
+    current_stage = f"User is at Stage {application_stage_num}: {stage_names.get(application_stage_num, 'Unknown')}"
+
+    return {
+        'profile_data': profile_data,
+        'current_stage': current_stage,
+        'existing_tasks': existing_tasks,
+        'existing_titles': existing_titles,
+        'active_tasks_count': active_tasks_count,
+    }
+
+def save_generated_tasks(user, generated_titles, active_tasks_count, existing_titles=None):
+    """Inserts the generated titles that are not (near) duplicates, in one query."""
+    if existing_titles is None:
+        existing_titles = Task.objects.filter(user=user).values_list('title', flat=True)
+
+    # Final safety check: Don't exceed 7 total active tasks
+    max_to_add = 7 - active_tasks_count
+    titles = TaskTitleIndex(t for t in existing_titles if t).new_titles(generated_titles, max_to_add)
+
+    return Task.objects.bulk_create([Task(user=user, title=title, task_type='PROFILE') for title in titles])
+
 def trigger_ai_task_generation(user):
     """
     Helper function to trigger AI task generation for a specific user.
     Enforces a 5-7 task limit as requested.
     """
     try:
-        # 1. Check current active tasks count
-        active_tasks_count = Task.objects.filter(user=user, is_completed=False).count()
-        
-        # If user already has 5 or more active tasks, don't overwhelm them with more AI tasks
-        # unless they intentionally requested them (manual regeneration).
-        if active_tasks_count >= 5:
+        context = task_generation_context(user)
+        if context is None:
             return []
 
-        # 2. Get user profile
-        profile_data = ProfileSerializer(user).data
-        
-        # 3. Get all existing tasks (completed or not) for context and deduplication
-        existing_tasks = Task.objects.filter(user=user).values_list('title', flat=True)
-        
-        # 4. Determine granular stage
-        stage_data = get_current_stage_data(user)
-        application_stage_num = stage_data['application_stage']
-        
-        stage_names = {
-            1: "Building Profile (Onboarding)",
-            2: "Discovering Universities (Shortlisting)",
-            3: "Finalizing Universities (Application Selection)",
-            4: "Preparing Applications"
-        }
-        
-        current_stage = f"User is at Stage {application_stage_num}: {stage_names.get(application_stage_num, 'Unknown')}"
-        
         # 5. Call AI service - restricted to 3-5 items to stay within 7 total limit
-        # Get locked universities for context
-        locked_unis = ShortlistedUniversity.objects.filter(user=user, is_locked=True).values_list('university_name', flat=True)
-        locked_context = list(locked_unis) if locked_unis else None
-        
-        generated_titles = generate_tasks_for_user(profile_data, current_stage, list(existing_tasks))
-        
-        new_tasks = []
-        # Final safety check: Don't exceed 7 total active tasks
-        max_to_add = 7 - active_tasks_count
-        
-        for title in generated_titles[:max_to_add]:
-            # Avoid exact duplicates
-            if not Task.objects.filter(user=user, title=title).exists():
-                task = Task.objects.create(
-                    user=user,
-                    title=title,
-                    task_type='PROFILE'
-                )
-                new_tasks.append(task)
-        
-        return new_tasks
+        generated_titles = generate_tasks_for_user(context['profile_data'], context['current_stage'], context['existing_tasks'])
+        return save_generated_tasks(user, generated_titles, context['active_tasks_count'], context['existing_titles'])
     except Exception as e:
         return []
 
@@ -649,119 +657,143 @@ def generate_new_tasks_view(request):
 
 
 @api_view(['GET'])
+@authentication_classes([])
 def top_20_universities_view(request):
+    """
+    Public landing-page endpoint. Pages are rendered and compressed once per
+    data-file version; a request only picks the page and the encoding.
+    """
     try:
-        # Construct path to the JSON file
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        file_path = os.path.join(base_dir, 'University_data', 'top_20_famous.json')
-        
-        if not os.path.exists(file_path):
+        try:
+            pages = get_top20_pages()
+        except FileNotFoundError:
              return Response({'error': 'Data file not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        # Pagination
-        page_num = request.GET.get('page', 1)
-        paginator = Paginator(data, 5) # 5 items per page
-        
-        try:
-            page_obj = paginator.page(page_num)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-            
-        return Response({
-            'status': 'success',
-            'data': page_obj.object_list,
-            'pagination': {
-                'current_page': page_obj.number,
-                'total_pages': paginator.num_pages,
-                'total_items': paginator.count,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous()
-            }
-        }, status=status.HTTP_200_OK)
-        
+        page = pages.page(request.GET.get('page', 1))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), page.encoded)
+
+        headers = {
+            'ETag': page.etag_for(encoding),
+            'Last-Modified': pages.last_modified,
+            'Cache-Control': CACHE_CONTROL,
+            'Vary': 'Accept-Encoding',
+        }
+
+        # Conditional requests: any representation of this page is still valid
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            client_etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+            not_modified = '*' in client_etags or bool(client_etags & page.etags)
+        else:
+            not_modified = request.headers.get('If-Modified-Since') == pages.last_modified
+
+        if not_modified:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            body = page.encoded[encoding] if encoding else page.body
+            response = HttpResponse(body, content_type='application/json')
+            response['Content-Length'] = len(body)
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def recommendation_pool(catalog, preferred_countries):
+    """The universities the LLM is asked to classify for `preferred_countries` (free text)."""
+    # Scored locally in one pass; optional LLM text is written in parallel chunks
+    total_pool_size = settings.RECOMMENDATION_POOL_SIZE
+
+    # Resolve every preferred country ("UK, Canada, Germany") via the alias index
+    resolved = catalog.country_resolver.resolve_all(preferred_countries) if preferred_countries else []
+
+    # Rank-merged pool with a fair share per country
+    top_60_unis = catalog.candidate_pool(resolved, total_pool_size)
+
+    # Fallback if empty
+    if not top_60_unis:
+        top_60_unis = catalog.candidate_pool(["United States"], total_pool_size)
+
+        # If still empty, take everything
+        if not top_60_unis:
+            top_60_unis = list(catalog.ranked[:total_pool_size])
+    return top_60_unis
+
+def merge_recommendations(ai_response, top_60_unis, locked_set):
+    """Joins the AI's {category: [{name, reason, ...}]} with catalog data and lock state."""
+    # Create lookup from the top_60_unis
+    uni_lookup = {u.get('name'): u for u in top_60_unis}
+
+    final_recommendations = {'Dream': [], 'Target': [], 'Safe': []}
+
+    for category, items in ai_response.items():
+        if category in final_recommendations:
+            for item in items: # item is now a dict {name, reason, ...}
+                name = item.get('name')
+                # Merge with basic info
+                if name in uni_lookup:
+                    base_info = uni_lookup[name]
+                    # Merge dicts
+                    merged = {**base_info, **item} # AI data overwrites base if conflict (shouldn't be)
+                    merged['is_locked'] = name in locked_set
+                    final_recommendations[category].append(merged)
+    return final_recommendations
+
+def recommendations_pending_response(poll_url):
+    """202 for a request that found another one generating: poll `poll_url` again."""
+    retry_after = 2
+    return JsonResponse(
+        {'status': 'pending', 'poll_url': poll_url, 'retry_after': retry_after},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Retry-After': str(retry_after)},
+    )
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def university_recommendations_view(request):
     try:
         # 1. Provide recommendations based on profile using Groq AI
-        
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        file_path = os.path.join(base_dir, 'University_data', 'university_data_by_rank.json')
-
-        if not os.path.exists(file_path):
+        try:
+            catalog = get_catalog()
+        except FileNotFoundError:
              return Response({'error': 'University data file not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            all_countries_data = json.load(f)
-
-        # Get User's Preferred Country
         user_study_goal = getattr(request.user, 'study_goal', None)
-        preferred_country = "United States" # Default or fallback
-        if user_study_goal:
-             # Basic handling assuming single country or comma separated
-             preferred_country = user_study_goal.preferred_countries.split(',')[0].strip()
-
-        # Flatten list - FILTER BY COUNTRY
-        all_universities = []
-        
-        # KEY: Map common abbreviations to full names matching JSON
-        country_mapping = {
-            "uk": "United Kingdom",
-            "usa": "United States",
-            "us": "United States",
-            "uae": "United Arab Emirates",
-            "korea": "South Korea",
-            "south korea": "South Korea"
-        }
-        
-        normalized_pref = country_mapping.get(preferred_country.lower(), preferred_country)
-
-        # 1. Exact/Fuzzy Match
-        for country_data in all_countries_data:
-            c_name = country_data.get('country', '')
-            # Check normalized name
-            if normalized_pref.lower() in c_name.lower() or c_name.lower() in normalized_pref.lower():
-                 all_universities.extend(country_data.get('universities', []))
-        
-        # 2. Fallback if empty
-        if not all_universities:
-            for country_data in all_countries_data:
-                if "united states" in country_data.get('country', '').lower():
-                    all_universities.extend(country_data.get('universities', []))
-            
-            # If still empty, take everything
-            if not all_universities:
-                 for country_data in all_countries_data:
-                     all_universities.extend(country_data.get('universities', []))
-        
+        top_60_unis = recommendation_pool(catalog, user_study_goal.preferred_countries if user_study_goal else None)
 
         # Pagination params
         page = int(request.query_params.get('page', 1))
         limit = int(request.query_params.get('limit', 12))
-        
-        total_pool_size = 25 # Check top 25 relevant ones (Reduced to prevent AI token overflow)
-        top_60_unis = sorted(all_universities, key=lambda x: x.get('rank', 9999))[:total_pool_size]
 
         # Check Cache
-        cache_obj, created = ProfileAICache.objects.get_or_create(user=request.user)
+        cache_obj = get_ai_cache(request.user)
         
         if not cache_obj.recommendations:
             # Prepare Profile Data
             profile_data = ProfileSerializer(request.user).data
-            # Call AI Service for THE ENTIRE TOP 60 to cache classifications
-            ai_response = get_university_recommendations(profile_data, top_60_unis)
-            cache_obj.recommendations = ai_response
-            cache_obj.save()
-            is_cached = False
+            fingerprint = recommendation_cache_key(profile_data, top_60_unis)
+            token = acquire_recommendations_lease(request.user, fingerprint)
+            if token is None:
+                # Another request is already classifying this profile: share its result
+                ai_response = wait_for_recommendations(request.user, settings.RECOMMENDATION_WAIT_SECONDS)
+                if ai_response is None:
+                    return recommendations_pending_response(request.get_full_path())
+            else:
+                try:
+                    # Call AI Service for THE ENTIRE TOP 60 to cache classifications
+                    ai_response = get_university_recommendations(profile_data, top_60_unis)
+                except Exception:
+                    release_recommendations_lease(request.user, token)
+                    raise
+                complete_recommendations(
+                    request.user, token, ai_response, inputs_fingerprint(profile_data, 'recommendations')
+                )
+            is_cached = token is None
         else:
             ai_response = cache_obj.recommendations
             is_cached = True
@@ -787,22 +819,7 @@ def university_recommendations_view(request):
         locked_set = set(locked_unis)
 
         # Enhance AI response with local data (logo, domains etc) if needed
-        # Create lookup from the top_60_unis
-        uni_lookup = {u.get('name'): u for u in top_60_unis}
-        
-        final_recommendations = {'Dream': [], 'Target': [], 'Safe': []}
-        
-        for category, items in ai_response.items():
-            if category in final_recommendations:
-                for item in items: # item is now a dict {name, reason, ...}
-                    name = item.get('name')
-                    # Merge with basic info
-                    if name in uni_lookup:
-                        base_info = uni_lookup[name]
-                        # Merge dicts
-                        merged = {**base_info, **item} # AI data overwrites base if conflict (shouldn't be)
-                        merged['is_locked'] = name in locked_set
-                        final_recommendations[category].append(merged)
+        final_recommendations = merge_recommendations(ai_response, top_60_unis, locked_set)
 
         return Response({
             'status': 'success',
@@ -900,6 +917,32 @@ def chat_session_detail_view(request, session_id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def get_chat_session(user, session_id):
+    """
+    Returns the user's session, or a new one with a greeting when no id is given.
+    Raises ChatSession.DoesNotExist for an unknown id.
+    """
+    if session_id:
+        return ChatSession.objects.get(id=session_id, user=user)
+
+    session = ChatSession.objects.create(user=user)
+    # Add greeting for sessions created directly via chat endpoint
+    stage_data = get_current_stage_data(user)
+    stage_num = stage_data.get('application_stage', 1)
+    stage_names = {1: "Building Profile", 2: "Discovering Universities", 3: "Finalizing Universities", 4: "Preparing Applications"}
+    stage_name = stage_names.get(stage_num, "Building Profile")
+    user_name = user.first_name or "there"
+    greeting = f"Hi {user_name}! I'm your AI Counselor. Currently, you are at the '{stage_name}' stage of your study abroad journey. I'm here to help you every step of the way. Ready to be a better version of yourself?"
+
+    ChatMessage.objects.create(
+        user=user,
+        session=session,
+        sender='ai',
+        message=greeting,
+        suggested_actions=["Analyze my profile", "Recommend universities"]
+    )
+    return session
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def chat_view(request):
@@ -912,103 +955,16 @@ def chat_view(request):
             
         
         # Get or Create Session
-        session = None
-        if session_id:
-            try:
-                session = ChatSession.objects.get(id=session_id, user=request.user)
-            except ChatSession.DoesNotExist:
-                return Response({'error': 'Invalid Session ID'}, status=status.HTTP_404_NOT_FOUND)
-        else:
-             session = ChatSession.objects.create(user=request.user)
-             # Add greeting for sessions created directly via chat endpoint
-             stage_data = get_current_stage_data(request.user)
-             stage_num = stage_data.get('application_stage', 1)
-             stage_names = {1: "Building Profile", 2: "Discovering Universities", 3: "Finalizing Universities", 4: "Preparing Applications"}
-             stage_name = stage_names.get(stage_num, "Building Profile")
-             user_name = request.user.first_name or "there"
-             greeting = f"Hi {user_name}! I'm your AI Counselor. Currently, you are at the '{stage_name}' stage of your study abroad journey. I'm here to help you every step of the way. Ready to be a better version of yourself?"
-             
-             ChatMessage.objects.create(
-                 user=request.user,
-                 session=session,
-                 sender='ai',
-                 message=greeting,
-                 suggested_actions=["Analyze my profile", "Recommend universities"]
-             )
-
-        # 1. Update Session Title if it's the first USER message and title is default
-        user_msg_count = session.messages.filter(sender='user').count()
-        if user_msg_count == 0 and session.title == "New Chat":
-             new_title = (user_message[:30] + '..') if len(user_message) > 30 else user_message
-             session.title = new_title
-             session.save()
-        
-        # 2. Save User Message
-        new_msg = ChatMessage.objects.create(
-            user=request.user,
-            session=session,
-            sender='user',
-            message=user_message
-        )
-        
-        # 3. Get Context (History, Profile, Stage, Universities)
-        # Exclude the newly created message to avoid "User, User" turn error in AI
-        history_objs = ChatMessage.objects.filter(session=session).exclude(id=new_msg.id).order_by('-created_at')[:10]
-        history = [{"role": msg.sender if msg.sender == 'user' else 'assistant', "content": msg.message} for msg in reversed(history_objs)]
-        
-        profile_data = ProfileSerializer(request.user).data
-        
-        # New Context: Stage and Universities
-        stage_data = get_current_stage_data(request.user)
-        
-        shortlisted_unis = ShortlistedUniversity.objects.filter(user=request.user)
-        locked_unis = [
-            {"name": u.university_name, "country": u.country, "category": u.category} 
-            for u in shortlisted_unis if u.is_locked
-        ]
-        other_shortlisted = [
-            {"name": u.university_name, "country": u.country, "category": u.category} 
-            for u in shortlisted_unis if not u.is_locked
-        ]
-        
-        # Get active tasks
-        active_tasks_qs = Task.objects.filter(user=request.user, is_completed=False)
-        tasks = [{"id": t.id, "title": t.title} for t in active_tasks_qs]
+        try:
+            session = get_chat_session(request.user, session_id)
+        except ChatSession.DoesNotExist:
+            return Response({'error': 'Invalid Session ID'}, status=status.HTTP_404_NOT_FOUND)
+
+        context = load_chat_context(request.user, session, user_message)
 
         # 4. Call AI
-        ai_result = chat_with_counselor(
-            profile_data, 
-            history, 
-            user_message,
-            stage=stage_data.get('application_stage'),
-            locked_unis=locked_unis,
-            shortlisted_unis=other_shortlisted,
-            tasks=tasks
-        )
-        
-        # Handle Task Actions
-        task_action = ai_result.get('task_action')
-        if task_action:
-            if task_action.get('type') == 'create_task':
-                title = task_action.get('title')
-                # Enforce limit of 7
-                if active_tasks_qs.count() < 7:
-                    Task.objects.create(user=request.user, title=title, task_type='PERSONAL')
-            elif task_action.get('type') == 'complete_task':
-                task_id = task_action.get('task_id')
-                Task.objects.filter(id=task_id, user=request.user).update(is_completed=True)
-
-        # 5. Save AI Response
-        ChatMessage.objects.create(
-            user=request.user,
-            session=session,
-            sender='ai',
-            message=ai_result['response'],
-            suggested_actions=ai_result['suggested_actions']
-        )
-        
-        # Update session timestamp
-        session.save() 
+        ai_result = chat_with_counselor(**context)
+        save_chat_turn(request.user, session, user_message, ai_result)
         
         return Response({
             'status': 'success',
@@ -1023,51 +979,94 @@ def chat_view(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def chat_stream_view(request):
+    """
+    Same as chat_view, but the reply is streamed as Server-Sent Events:
+    `session` (id and title), `token` ({"text": ...}) while the answer is generated,
+    then `done` with the final response, suggested_actions and task_action.
+    The turn is saved before `done` is sent.
+    """
+    try:
+        user_message = request.data.get('message')
+        session_id = request.data.get('session_id')
+
+        if not user_message:
+            return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = get_chat_session(request.user, session_id)
+        except ChatSession.DoesNotExist:
+            return Response({'error': 'Invalid Session ID'}, status=status.HTTP_404_NOT_FOUND)
+
+        context = load_chat_context(request.user, session, user_message)
+        user = request.user
+
+        def events():
+            yield sse_event('session', {'session_id': session.id, 'session_title': session.title})
+            try:
+                for kind, payload in stream_chat_with_counselor(**context):
+                    if kind == 'token':
+                        yield sse_event('token', {'text': payload})
+                    else:
+                        message = save_chat_turn(user, session, user_message, payload)
+                        yield sse_event('done', {
+                            'response': payload['response'],
+                            'suggested_actions': payload['suggested_actions'],
+                            'task_action': payload['task_action'],
+                            'message_id': message.id,
+                            'session_id': session.id,
+                            'session_title': session.title
+                        })
+            except Exception as e:
+                yield sse_event('error', {'error': str(e)})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+        return response
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def chat_history_view(request):
+    """
+    One page of a session's messages, oldest first: the newest `limit` by default,
+    older ones with `before=<next_cursor>`, and only new ones with `since=<since_cursor>`.
+    """
     try:
         session_id = request.query_params.get('session_id')
         if not session_id:
              return Response({'error': 'Session ID is required'}, status=status.HTTP_400_BAD_REQUEST)
-             
+
+        try:
+            limit = int(request.query_params.get('limit', settings.CHAT_HISTORY_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, settings.CHAT_HISTORY_MAX_PAGE_SIZE)
+
+        before = request.query_params.get('before')
+        since = request.query_params.get('since')
+        if before and since:
+            return Response({'error': 'Use either before or since, not both'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            before = decode_message_cursor(before) if before else None
+            since = decode_message_cursor(since) if since else None
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         # Verify ownership
         if not ChatSession.objects.filter(id=session_id, user=request.user).exists():
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        messages = ChatMessage.objects.filter(session_id=session_id).order_by('created_at')
-        
-        data = []
-        for msg in messages:
-            data.append({
-                'id': msg.id,
-                'sender': msg.sender,
-                'message': msg.message,
-                'suggested_actions': msg.suggested_actions or [],
-                'timestamp': msg.created_at
-            })
-            
-        return Response({'status': 'success', 'data': data}, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        evaluation = {
-            'university_name': uni_name,
-            'fit_score': 'High',
-            'why_it_fits': [
-                "Strong program matches your study goal.",
-                "Located in a prefered country."
-            ],
-            'key_risks': [
-                "High cost of living area.",
-                "Competitive acceptance rate."
-            ],
-            'cost_level': 'High', # Low, Medium, High
-            'acceptance_chance': 'Medium', # Low, Medium, High
-        }
-        
-        return Response({'status': 'success', 'data': evaluation}, status=status.HTTP_200_OK)
-
+        body = stream_history_page(session_id, before=before, since=since, limit=limit)
+        return StreamingHttpResponse(body, content_type='application/json')
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1076,8 +1075,6 @@ def chat_history_view(request):
 @permission_classes([IsAuthenticated])
 def shortlist_action_view(request):
     try:
-        from .models import ShortlistedUniversity
-        
         action = request.data.get('action') # 'lock', 'unlock'
         uni_name = request.data.get('university_name')
         category = request.data.get('category') # Dream, Target, Safe (needed for lock)
@@ -1086,9 +1083,16 @@ def shortlist_action_view(request):
         if not action or not uni_name:
              return Response({'error': 'Action and university_name are required'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Resolve the catalog row once; everything below joins on the foreign key
+        university = resolve_university(uni_name, country)
+        if university:
+            lookup = {'university': university}
+        else:
+            lookup = {'university__isnull': True, 'university_name': uni_name}
+
         if action == 'lock':
             # Check if user has reached the locking limit (10)
-            locked_count = ShortlistedUniversity.objects.filter(user=request.user, is_locked=True).exclude(university_name=uni_name).count()
+            locked_count = ShortlistedUniversity.objects.filter(user=request.user, is_locked=True).exclude(**lookup).count()
             if locked_count >= 10:
                 return Response({
                     'status': 'error', 
@@ -1096,40 +1100,37 @@ def shortlist_action_view(request):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             # Check if already locked (same one)
-            if ShortlistedUniversity.objects.filter(user=request.user, university_name=uni_name, is_locked=True).exists():
+            if ShortlistedUniversity.objects.filter(user=request.user, is_locked=True, **lookup).exists():
                 return Response({'status': 'success', 'message': 'University already locked'})
             
-            # Create or update
+            # Create or update; keyed on the unique (user, university_name) so concurrent locks cannot duplicate the row
             ShortlistedUniversity.objects.update_or_create(
                 user=request.user,
-                university_name=uni_name,
+                university_name=university.name if university else uni_name,
                 defaults={
+                    'university': university,
                     'category': category,
-                    'country': country,
+                    'country': university.country if university else country,
                     'is_locked': True
                 }
             )
             
-            # LOCK ACTION: This changes the application stage from 2 to 3
-            # We trigger task generation to provide Stage 3 guidance
-            #trigger_ai_task_generation(request.user)
-            # print(trigger_ai_task_generation(request.user))
+            # LOCK ACTION: The first lock moves the user to Stage 4; the stage_changed
+            # event then triggers task generation for that stage
+            refresh_application_stage(request.user)
             
             return Response({'status': 'success', 'message': f'Locked {uni_name}'})
 
         elif action == 'unlock':
              # Unlock logic
-             try:
-                 obj = ShortlistedUniversity.objects.get(user=request.user, university_name=uni_name)
-                 obj.is_locked = False
-                 obj.save()
-                 
-                 # UNLOCK ACTION: This might reset the stage from 3 back to 2
-                 trigger_ai_task_generation(request.user)
-                 
-                 return Response({'status': 'success', 'message': f'Unlocked {uni_name}'})
-             except ShortlistedUniversity.DoesNotExist:
+             updated = ShortlistedUniversity.objects.filter(user=request.user, **lookup).update(is_locked=False)
+             if not updated:
                  return Response({'error': 'University not found in shortlist'}, status=status.HTTP_404_NOT_FOUND)
+
+             # UNLOCK ACTION: This might move the stage back from 4 to 3 (task generation follows the stage)
+             refresh_application_stage(request.user)
+
+             return Response({'status': 'success', 'message': f'Unlocked {uni_name}'})
         
         return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1137,21 +1138,38 @@ def shortlist_action_view(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def resolve_university(name, country=None):
+    """
+    Best-ranked University row for a name posted by the frontend, preferring the given country.
+    Returns None for names that are not in the catalog table.
+    """
+    candidates = University.objects.filter(name=name)
+    if country and country != 'Unknown':
+        match = candidates.filter(country=country).first()
+        if match:
+            return match
+    return candidates.order_by('rank').first()
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def locked_universities_view(request):
     try:
-        from .models import ShortlistedUniversity
-        locked_unis = ShortlistedUniversity.objects.filter(user=request.user, is_locked=True)
+        locked_unis = ShortlistedUniversity.objects.filter(user=request.user, is_locked=True).select_related('university')
         
         data = []
         for uni in locked_unis:
-            data.append({
+            item = {
                 'university_name': uni.university_name,
                 'category': uni.category,
                 'country': uni.country,
                 'locked_at': uni.created_at
-            })
+            }
+            if uni.university:
+                item['university'] = uni.university.as_catalog_dict()
+            elif uni.data:
+                item['university'] = uni.data  # Legacy snapshot of a name the catalog does not have
+            data.append(item)
             
         return Response({'status': 'success', 'data': data}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -1161,59 +1179,69 @@ def locked_universities_view(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def all_universities_view(request):
+    """
+    Explorer listing. Supports `cursor` pagination (preferred for infinite scroll)
+    as well as the legacy `page` parameter, and answers `If-None-Match` with 304.
+    """
     try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        file_path = os.path.join(base_dir, 'University_data', 'university_data_by_rank.json')
-
-        if not os.path.exists(file_path):
+        try:
+            catalog = get_catalog()
+        except FileNotFoundError:
              return Response({'error': 'University data file not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            all_countries_data = json.load(f)
-
         # Filters
-        country_filter = request.query_params.get('country')
+        country_filter = request.query_params.get('country') or ''
         rank_min = int(request.query_params.get('rank_min', 0))
         rank_max = int(request.query_params.get('rank_max', 10000))
-        search_query = request.query_params.get('search', '').lower()
-
-        filtered_universities = []
-        for country_data in all_countries_data:
-            c_name = country_data.get('country')
-            if country_filter and country_filter.lower() not in c_name.lower():
-                continue
-            
-            for uni in country_data.get('universities', []):
-                # Rank Filter
-                rank = uni.get('rank', 9999)
-                if rank < rank_min or rank > rank_max:
-                    continue
-                
-                # Search Filter
-                if search_query and search_query not in uni.get('name', '').lower():
-                    continue
-
-                # Inject country name for UI
-                uni['country'] = c_name
-                filtered_universities.append(uni)
-
-        # Sort by rank
-        filtered_universities.sort(key=lambda x: x.get('rank', 9999))
+        search_query = request.query_params.get('search', '').strip()
 
         # Pagination
+        cursor = request.query_params.get('cursor')
         page = int(request.query_params.get('page', 1))
         limit = int(request.query_params.get('limit', 12))
-        start_idx = (page - 1) * limit
+        if page < 1 or limit < 1:
+            return Response({'error': 'page and limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Precomputed, ordered result set for this filter combination
+        filtered_universities = catalog.filtered(country_filter, rank_min, rank_max, search_query)
+        filters = filter_key(country_filter, rank_min, rank_max, search_query)
+
+        if cursor:
+            try:
+                start_idx = decode_cursor(catalog, filtered_universities, cursor, filters)
+            except InvalidCursor as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            start_idx = (page - 1) * limit
         end_idx = start_idx + limit
 
-        current_batch = filtered_universities[start_idx:end_idx]
         has_next = end_idx < len(filtered_universities)
 
-        # Mark locked
         locked_set = set(ShortlistedUniversity.objects.filter(user=request.user, is_locked=True).values_list('university_name', flat=True))
 
-        for uni in current_batch:
-            uni['is_locked'] = uni['name'] in locked_set
+        # Strong validator over everything the body depends on: catalog, filters, slice,
+        # page numbering (cursor requests have no next_page) and lock state
+        etag_source = json.dumps([
+            catalog.version, filters, start_idx, limit, page, bool(cursor), sorted(locked_set)
+        ])
+        etag = '"%s"' % hashlib.sha256(etag_source.encode()).hexdigest()[:32]
+        cache_headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Authorization'}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            client_etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+            if etag in client_etags or '*' in client_etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+        # Mark locked (copy the shared read-only records)
+        current_batch = [
+            {**uni, 'is_locked': uni['name'] in locked_set}
+            for uni in filtered_universities[start_idx:end_idx]
+        ]
+
+        next_cursor = None
+        if has_next:
+            next_cursor = encode_cursor(catalog, filtered_universities, end_idx, filters)
 
         return Response({
             'status': 'success',
@@ -1222,10 +1250,48 @@ def all_universities_view(request):
             'pagination': {
                 'has_next': has_next,
                 'page': page,
-                'next_page': page + 1 if has_next else None,
-                'total_pages': (len(filtered_universities) + limit - 1) // limit
+                'next_page': page + 1 if has_next and not cursor else None,
+                'total_pages': (len(filtered_universities) + limit - 1) // limit,
+                'next_cursor': next_cursor
             }
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK, headers=cache_headers)
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def university_autocomplete_view(request):
+    """
+    Prefix autocomplete for the explore page search box.
+    Returns the top `limit` universities by rank whose words start with the query terms.
+    """
+    try:
+        try:
+            catalog = get_catalog()
+        except FileNotFoundError:
+             return Response({'error': 'University data file not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 8))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, 50)
+
+        data = [
+            {
+                'name': uni.get('name'),
+                'country': uni.get('country'),
+                'rank': uni.get('rank'),
+                'logo': uni.get('logo'),
+            }
+            for uni in catalog.search_index.autocomplete(query, limit)
+        ]
+        return Response({'status': 'success', 'data': data}, status=status.HTTP_200_OK)
 
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -10,5 +10,21 @@ python manage.py makemigrations api
 echo "Running migrate..."
 python manage.py migrate
 
+echo "Loading university catalog..."
+python manage.py load_universities
+
+# Queued jobs (AI task generation, chat summaries) only run in a `run_jobs` worker.
+# It is restarted if it exits, and stops with the container when the command below does.
+# Set START_JOB_WORKER=False when a separate worker is deployed (docker-compose.yml's `worker` service).
+if [ "${START_JOB_WORKER:-True}" != "False" ]; then
+    echo "Starting background job worker..."
+    (
+        while true; do
+            python manage.py run_jobs || echo "Job worker exited with status $?, restarting in 5s..."
+            sleep 5
+        done
+    ) &
+fi
+
 # Execute the passed command (e.g., gunicorn)
 exec "$@"
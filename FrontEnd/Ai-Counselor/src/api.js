@@ -171,11 +171,26 @@ export const getProfileStrength = () => api.get('/dashboard/strength/');
 
 // University Shortlisting APIs
 let uniRecommendationsCache = null;
+const RECOMMENDATION_POLL_ATTEMPTS = 15;
+
+// 202 means another request (tab) is generating the same recommendations: wait `retry_after` and ask again
+const fetchRecommendations = async (page, limit, attempts = RECOMMENDATION_POLL_ATTEMPTS) => {
+    const response = await api.get(`/universities/recommendations/?page=${page}&limit=${limit}`);
+    if (response.status === 202 && attempts > 1) {
+        const retryAfter = Number(response.data?.retry_after) || 2;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        return fetchRecommendations(page, limit, attempts - 1);
+    }
+    return response;
+};
 
 export const prefetchRecommendations = (page = 1, limit = 12) => {
     // Only cache the first page for now to simplify
     if (page === 1 && !uniRecommendationsCache) {
-        uniRecommendationsCache = api.get(`/universities/recommendations/?page=${page}&limit=${limit}`);
+        uniRecommendationsCache = fetchRecommendations(page, limit).then(response => {
+            if (response.status === 202) uniRecommendationsCache = null; // Still pending: do not cache
+            return response;
+        });
     }
     return uniRecommendationsCache;
 };
@@ -184,7 +199,7 @@ export const getUniversityRecommendations = (page = 1, limit = 12) => {
     if (page === 1 && uniRecommendationsCache) {
         return uniRecommendationsCache;
     }
-    return api.get(`/universities/recommendations/?page=${page}&limit=${limit}`);
+    return fetchRecommendations(page, limit);
 };
 
 export const getAllUniversities = (page = 1, limit = 12, country = '', minRank = 0, maxRank = 10000, search = '') => {
@@ -210,9 +225,10 @@ export const sendChatMessage = async (message, sessionId = null) => {
     }
 };
 
-export const getChatHistory = async (sessionId) => {
+// Newest page by default; pass { before: next_cursor } for older messages or { since: since_cursor } for new ones
+export const getChatHistory = async (sessionId, cursor = {}) => {
     try {
-        const response = await api.get(`chat/history/?session_id=${sessionId}`);
+        const response = await api.get('chat/history/', { params: { session_id: sessionId, ...cursor } });
         return response.data;
     } catch (error) {
         throw error.response ? error.response.data : error;
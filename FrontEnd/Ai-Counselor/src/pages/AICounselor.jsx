@@ -12,6 +12,9 @@ const AICounselor = () => {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
+    const [olderCursor, setOlderCursor] = useState(null); // History is paginated: cursor for the page before the loaded ones
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    const keepScrollRef = useRef(false);
     const [isSidebarOpen, setIsSidebarOpen] = useState(true); // Default open on desktop
     const messagesEndRef = useRef(null);
     const textareaRef = useRef(null);
@@ -34,8 +37,12 @@ const AICounselor = () => {
         }
     }, [currentSessionId]);
 
-    // Scroll to bottom on new messages
+    // Scroll to bottom on new messages (not when older ones are prepended)
     useEffect(() => {
+        if (keepScrollRef.current) {
+            keepScrollRef.current = false;
+            return;
+        }
         scrollToBottom();
     }, [messages]);
 
@@ -72,6 +79,7 @@ const AICounselor = () => {
             setLoading(true);
             const history = await getChatHistory(sessionId);
             setMessages(history.data);
+            setOlderCursor(history.pagination?.next_cursor || null);
         } catch (error) {
             console.error("Failed to load history", error);
         } finally {
@@ -79,6 +87,21 @@ const AICounselor = () => {
         }
     };
 
+    const loadOlderMessages = async () => {
+        if (!olderCursor || !currentSessionId) return;
+        try {
+            setLoadingOlder(true);
+            const history = await getChatHistory(currentSessionId, { before: olderCursor });
+            keepScrollRef.current = true;
+            setMessages(prev => [...history.data, ...prev]);
+            setOlderCursor(history.pagination?.next_cursor || null);
+        } catch (error) {
+            console.error("Failed to load older messages", error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const handleNewChat = async () => {
         try {
             setLoading(true);
@@ -286,8 +309,19 @@ const AICounselor = () => {
                     </div>
                 </header>
                 <div className="flex-1 overflow-y-auto p-4 md:p-6 space-y-6 scroll-smooth">
+                    {olderCursor && (
+                        <div className="flex justify-center">
+                            <button
+                                onClick={loadOlderMessages}
+                                disabled={loadingOlder}
+                                className="text-xs font-medium text-blue-600 dark:text-blue-400 hover:underline disabled:opacity-50"
+                            >
+                                {loadingOlder ? 'Loading...' : 'Load older messages'}
+                            </button>
+                        </div>
+                    )}
                     {messages.map((msg, index) => (
-                        <ChatBubble key={index} message={msg.message} sender={msg.sender} suggestedActions={msg.suggested_actions} onActionClick={handleSend} />
+                        <ChatBubble key={msg.id ?? `new-${index}`} message={msg.message} sender={msg.sender} suggestedActions={msg.suggested_actions} onActionClick={handleSend} />
                     ))}
                     {loading && (
                         <div className="flex items-start animate-pulse">
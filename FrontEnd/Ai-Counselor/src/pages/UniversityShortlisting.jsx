@@ -42,6 +42,8 @@ const UniversityShortlisting = () => {
 
                 setHasMore(pagination?.has_next || false);
                 setPage(pageNum);
+            } else if (response.status === 202) {
+                setError("Your recommendations are still being generated. Please refresh in a moment.");
             }
         } catch (err) {
             // console.error("Failed to fetch recommendations", err);
@@ -83,6 +85,8 @@ const UniversityShortlisting = () => {
                     setLockedUniversities(response.data.locked_universities || []);
                     setHasMore(pagination?.has_next || false);
                     setPage(1);
+                } else if (response.status === 202) {
+                    setError("Your recommendations are still being generated. Please refresh in a moment.");
                 }
             } catch (err) {
                 setError("Initial load failed.");